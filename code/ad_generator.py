@@ -1,49 +1,62 @@
 import os
 import re
-import torch
 import numpy as np
-from PIL import Image
-from gtts import gTTS
-from diffusers import StableVideoDiffusionPipeline
-from moviepy.editor import (
-    VideoFileClip,
-    AudioFileClip,
-    ImageSequenceClip,
-    ImageClip,
-    concatenate_videoclips,
-    TextClip,
-    CompositeVideoClip
-)
-import requests
 from dotenv import load_dotenv
 import subprocess
-
-# Configurer MoviePy pour utiliser ImageMagick (nécessaire pour TextClip)
-import moviepy.config as mpconf
-try:
-    from moviepy.config import get_setting as _get_setting
-    if _get_setting("IMAGEMAGICK_BINARY") is None:
-        # Exemple de chemin possible sous Windows ; modifiez si besoinfr
-        possible_paths = [
-            r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"
-        ]
-        for path in possible_paths:
-            if os.path.exists(path):
-                mpconf.change_settings({"IMAGEMAGICK_BINARY": path})
-                print(f"[DEBUG] ImageMagick trouvé et configuré : {path}")
-                break
-except Exception as e:
-    print(f"[WARNING] Impossible de configurer ImageMagick automatiquement : {e}")
+import uuid
+
+from audio_probe import probe_audio
+from clip_cache import ClipCache
+from dedup import OffsetClip, plan_dedup
+from encoder import StreamingEncoder
+from gemini_client import GeminiError, shared_client
+from ingest import shared_ingestor
+from interpolate import interpolate_frames
+from memory_plan import plan_memory
+from model_manager import FAILED, ModelManager, cuda_available
+from motion import TIER_FAST, TIER_PREVIEW, KenBurnsEngine, SVDEngine
+from timeline import build_timeline
+from tts import Narrator
+from progress import emit_progress, scaled_progress
+from result_cache import ResultCache
+from scheduler import PipelineScheduler
+from shard import create_renderer, load_result, make_task
+from telemetry import span, timed
+from workspace import scratch
+
+# torch, diffusers et MoviePy ne sont importés qu'au moment où une étape en a besoin :
+# importer ce module (ou construire un AdGenerator) reste rapide et léger en mémoire.
+_imagemagick_configured = False
+
+
+def configure_imagemagick():
+    """Configure MoviePy pour utiliser ImageMagick (nécessaire pour TextClip), une seule fois."""
+    global _imagemagick_configured
+    if _imagemagick_configured:
+        return
+    _imagemagick_configured = True
+    try:
+        import moviepy.config as mpconf
+        from moviepy.config import get_setting as _get_setting
+        if _get_setting("IMAGEMAGICK_BINARY") is None:
+            # Exemple de chemin possible sous Windows ; modifiez si besoinfr
+            possible_paths = [
+                r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"
+            ]
+            for path in possible_paths:
+                if os.path.exists(path):
+                    mpconf.change_settings({"IMAGEMAGICK_BINARY": path})
+                    print(f"[DEBUG] ImageMagick trouvé et configuré : {path}")
+                    break
+    except Exception as e:
+        print(f"[WARNING] Impossible de configurer ImageMagick automatiquement : {e}")
 
 # Charger les variables d'environnement
 load_dotenv()
-GEMINI_API_URL = (
-    "https://generativelanguage.googleapis.com/v1beta/models/"
-    "gemini-2.0-flash:generateContent"
-)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 
+# Les étapes du pipeline (@timed) sont chronométrées en spans "AdGenerator.<étape>", voir telemetry.py
 class AdGenerator:
     def __init__(self):
         # Vérifier que ce constructeur est bien exécuté
@@ -73,47 +86,145 @@ class AdGenerator:
         }
         print(f"[DEBUG] prompt_templates définis pour : {list(self.prompt_templates.keys())}")
 
+        # Pipeline SVD partagé entre toutes les images et toutes les requêtes.
+        # SVD_PRELOAD=1 le charge dès le démarrage au lieu de la première génération ;
+        # SVD_WARMUP=1 le charge en arrière-plan et l'échauffe (voir warm_up()).
+        self.model_manager = ModelManager()
+        if os.getenv("SVD_PRELOAD") == "1":
+            self.model_manager.load()
+
+        # Paramètres de diffusion (ils font partie de la clé du cache de clips)
+        self.svd_params = {
+            "num_frames": 14,
+            "num_inference_steps": 25,
+            "decode_chunk_size": 8,
+            "seed": int(os.getenv("SVD_SEED", "42")),
+        }
+        self.clip_cache = ClipCache()
+        # Cadences : SVD produit ses clips à 7 fps, la vidéo finale est livrée à OUTPUT_FPS (24 par défaut)
+        self.clip_fps = 7
+        self.output_fps = int(os.getenv("OUTPUT_FPS", "24"))
+        # Frames intermédiaires entre 7 fps et la cadence de sortie : "linear", "flow" (OpenCV) ou "none"
+        self.interpolation = os.getenv("FRAME_INTERPOLATION", "linear")
+        # "stream" : frames envoyées en mémoire à un seul FFmpeg (vidéo + audio, un encodage)
+        # "moviepy" : export MoviePy sans audio puis second passage FFmpeg pour l'audio
+        self.assembly_mode = os.getenv("ASSEMBLY_MODE", "stream")
+        # Remplissage d'un clip plus court que sa part de narration : "loop" ou "pingpong"
+        self.timeline_mode = os.getenv("TIMELINE_MODE", "loop")
+        self.result_cache = ResultCache()
+        self.gemini = shared_client()
+        # Images décodées et normalisées à l'upload (voir ingest.py), partagées avec le chatbot
+        self.ingestor = shared_ingestor()
+        # Synthèse vocale phrase par phrase (moteur TTS_BACKEND : gtts ou espeak hors ligne)
+        self.narrator = Narrator()
+        # Répartition des animations sur plusieurs processus ou machines (RENDER_SHARDS), sinon None
+        self.renderer = create_renderer()
+        # Paramètres de rendu (plan mémoire compris) rapportés par les workers, par moteur
+        self._shard_params = {}
+
+        # Tier "preview" : basse définition (multiple de 64 pour SVD), moins d'étapes et de
+        # frames, cadence et preset d'encodage allégés
+        self.preview_params = {
+            "width": 576,
+            "height": 320,
+            "num_frames": 8,
+            "num_inference_steps": 10,
+            "decode_chunk_size": 4,
+            "output_fps": 12,
+            "preset": "ultrafast",
+        }
+        preview = self.preview_params
+        preview_svd = {**self.svd_params, "num_frames": preview["num_frames"],
+                       "num_inference_steps": preview["num_inference_steps"],
+                       "decode_chunk_size": preview["decode_chunk_size"],
+                       "width": preview["width"], "height": preview["height"]}
+
+        # Moteurs d'animation : SVD (GPU) ou pan/zoom CPU, choisi par select_motion_engine()
+        self.motion_engines = {
+            "svd": SVDEngine(self.model_manager, self.svd_params),
+            "kenburns": KenBurnsEngine(fps=self.output_fps),
+            "svd_preview": SVDEngine(self.model_manager, preview_svd, name="svd_preview"),
+            "kenburns_preview": KenBurnsEngine(fps=preview["output_fps"], duration=2.0,
+                                               size=(preview["width"], preview["height"]),
+                                               name="kenburns_preview"),
+        }
+        self.warmup_requested = os.getenv("SVD_WARMUP") == "1"
+        if self.warmup_requested:
+            self.warm_up(background=True)
+
+    def needs_model(self):
+        """Vrai si le moteur d'animation par défaut est SVD (pipeline à charger)."""
+        return isinstance(self.select_motion_engine(), SVDEngine)
+
+    @timed("AdGenerator.warm_up")
+    def warm_up(self, background=False):
+        """Charge et échauffe le pipeline SVD s'il sert au moteur par défaut."""
+        if not self.needs_model():
+            print("[INFO] Moteur d'animation sans modèle : pas d'échauffement nécessaire.")
+            return None
+        return self.model_manager.warm_up(background=background)
+
+    def health(self):
+        """État pour /healthz et /readyz. Si un échauffement est demandé, le générateur
+        n'est prêt qu'une fois le pipeline chargé et échauffé : le répartiteur de charge
+        n'envoie de rendus qu'aux workers chauds."""
+        needs_model = self.needs_model()
+        model = self.model_manager.health()
+        ready = model["state"] != FAILED and (not needs_model or not self.warmup_requested or model["ready"])
+        return {"ready": ready, "needs_model": needs_model, "warmup": self.warmup_requested, "model": model}
+
     def setup_gpu(self):
         """Configure GPU settings et vérifie la disponibilité GPU."""
         print("[DEBUG] Vérification de la disponibilité GPU...")
-        if torch.cuda.is_available():
+        if cuda_available():
+            import torch
             vram = torch.cuda.get_device_properties(0).total_memory / (1024 ** 3)
-            print(f"[INFO] VRAM disponible : {vram:.2f} Go")
-            if vram < 8:
-                print("[WARNING] VRAM faible (< 8 Go). Risque d'erreur CUDA out of memory.")
+            print(f"[INFO] VRAM totale : {vram:.2f} Go")
+            plan = self.model_manager.plan or plan_memory("cuda")
+            print(f"[INFO] Plan mémoire SVD : {plan.dtype}, offload {plan.offload}, "
+                  f"decode_chunk_size {plan.decode_chunk_size} (réduit automatiquement en cas d'OOM).")
             return True
         else:
-            print("[WARNING] GPU non disponible, utilisation du CPU (plus lent).")
+            print("[WARNING] GPU non disponible : le moteur d'animation rapide (pan/zoom CPU) sera utilisé.")
             return False
 
+    def select_motion_engine(self, tier=None):
+        """Choisit le moteur d'animation : MOTION_ENGINE s'il est défini, sinon le moteur
+        rapide pour le tier "fast" ou en l'absence de GPU, SVD dans les autres cas.
+        Le tier "preview" prend la variante basse définition du moteur retenu."""
+        name = os.getenv("MOTION_ENGINE")
+        if name:
+            if name not in self.motion_engines:
+                raise ValueError(f"Moteur d'animation inconnu : {name}")
+        elif tier == TIER_FAST or not cuda_available():
+            name = "kenburns"
+        else:
+            name = "svd"
+        if tier == TIER_PREVIEW and f"{name}_preview" in self.motion_engines:
+            name = f"{name}_preview"
+        return self.motion_engines[name]
+
+    def render_options(self, tier=None):
+        """Cadence et preset FFmpeg de l'assemblage pour un tier donné."""
+        if tier == TIER_PREVIEW:
+            return {"output_fps": self.preview_params["output_fps"], "preset": self.preview_params["preset"]}
+        return {"output_fps": self.output_fps, "preset": "medium"}
+
     def call_gemini_api(self, text, langue="fr"):
         """Appelle l'API Gemini pour générer un script publicitaire."""
         if not GEMINI_API_KEY:
             raise ValueError("Clé API Gemini non configurée. Définissez GEMINI_API_KEY dans le fichier .env")
 
         # On sait que prompt_templates existe grâce au _init_
-        prompt = self.prompt_templates.get(langue, self.prompt_templates["fr"]).format(text)
-        print(f"[DEBUG] Prompt envoyé à Gemini (début) : {prompt[:60]}...")
-
-        headers = {"Content-Type": "application/json"}
-        params = {"key": GEMINI_API_KEY}
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {"maxOutputTokens": 200}
-        }
+        template = self.prompt_templates.get(langue, self.prompt_templates["fr"])
+        print(f"[DEBUG] Prompt envoyé à Gemini (début) : {template.format(text)[:60]}...")
 
+        # Client partagé : connexions persistantes, réessais, disjoncteur et cache des réponses
         try:
-            resp = requests.post(GEMINI_API_URL, headers=headers, params=params, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            cb = data["candidates"][0]["content"]
-            if isinstance(cb, dict) and "parts" in cb:
-                result = "".join(p.get("text", "") for p in cb["parts"]).strip()
-            else:
-                result = str(cb).strip()
+            result = self.gemini.generate(template, text, max_output_tokens=200)
             print(f"[INFO] Script généré par Gemini ({len(result.split())} mots).")
             return result
-        except requests.RequestException as e:
+        except GeminiError as e:
             print(f"[ERROR] Erreur lors de l'appel API Gemini : {e}")
             print("[INFO] On retombe sur la méthode de nettoyage simple.")
             return self.clean_text(text)
@@ -141,131 +252,277 @@ class AdGenerator:
         print(f"[DEBUG] Texte nettoyé (début) : {text[:60]}...")
         return text
 
+    @timed("AdGenerator.text_to_speech")
     def text_to_speech(self, text, langue="fr", output_file=None):
-        """Convertit le texte en audio avec gTTS."""
+        """Convertit le texte en audio, phrase par phrase et en parallèle (voir tts.Narrator).
+
+        Retourne (chemin, AudioInfo) : la durée est mesurée sur les en-têtes du fichier
+        produit, sans décodage. Nom de fichier unique si `output_file` n'est pas précisé.
+        """
         if output_file is None:
-            output_file = os.path.join(self.output_dir, "narration.mp3")
+            output_file = os.path.join(self.output_dir,
+                                       f"narration_{uuid.uuid4().hex[:8]}.{self.narrator.backend.ext}")
 
         try:
-            word_count = len(text.split())
-            duration_seconds = (word_count / 140) * 60  # estimation
-            print(f"[INFO] Estimation durée audio : {duration_seconds:.2f}s ({word_count} mots).")
-            tts = gTTS(text=text, lang=langue, slow=False)
-            tts.save(output_file)
-            print(f"[INFO] Audio TTS sauvegardé dans : {output_file}")
-            return output_file, duration_seconds
+            sentences = self.narrator.synthesize(text, langue, output_file)
+            audio = probe_audio(output_file)
+            print(f"[INFO] Audio TTS ({sentences} phrases, moteur {self.narrator.backend.name}, "
+                  f"{audio.duration:.2f}s à {audio.sample_rate} Hz) sauvegardé dans : {output_file}")
+            return output_file, audio
         except Exception as e:
             print(f"[ERROR] Erreur lors de la conversion TTS : {e}")
             raise
 
-    def generate_video_from_image(self, image_path, output_path=None, duration=5):
-        """Génère une vidéo courte (14 frames) à partir d'une image via Stable Video Diffusion."""
-        if output_path is None:
-            output_path = os.path.join(self.output_dir, f"video_{os.path.basename(image_path)}.mp4")
+    def load_image(self, image_path):
+        """Image au format attendu par SVD (1024x576), déjà décodée à l'upload si possible."""
+        image = self.ingestor.load(image_path)
+        print("[DEBUG] Image redimensionnée pour diffusion vidéo.")
+        return image
 
+    def frames_from_image(self, image_path, engine=None, index=0, progress=None):
+        """Anime une image et retourne ses frames en mémoire (N×H×W×3, uint8)."""
+        engine = engine or self.select_motion_engine()
         try:
-            print(f"[INFO] Génération vidéo depuis l'image : {image_path}")
-            pipe = StableVideoDiffusionPipeline.from_pretrained(
-                "stabilityai/stable-video-diffusion-img2vid-xt",
-                torch_dtype=torch.float16,
-                variant="fp16"
-            )
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            pipe.to(device)
-            pipe.enable_model_cpu_offload()
-            print(f"[DEBUG] Modèle chargé sur : {device}")
-
-            image = Image.open(image_path).convert("RGB")
-            image = image.resize((1024, 576))
-            print("[DEBUG] Image redimensionnée pour diffusion vidéo.")
-
-            output = pipe(
-                image,
-                num_frames=14,
-                num_inference_steps=25,
-                decode_chunk_size=8
-            )
-            frames = output.frames[0]
-            frame_arrays = [np.array(frame) for frame in frames]
-            clip = ImageSequenceClip(frame_arrays, fps=7).without_audio()
-            clip.write_videofile(output_path, codec='libx264', fps=7, verbose=False)
-            clip.close()
-            print(f"[INFO] Vidéo générée et sauvegardée dans : {output_path}")
-            return output_path
+            print(f"[INFO] Génération vidéo depuis l'image : {image_path} (moteur {engine.name})")
+            return self.animate_image(self.load_image(image_path), engine, index=index, progress=progress)
         except Exception as e:
             print(f"[ERROR] Erreur lors de la génération vidéo depuis l'image {image_path} : {e}")
             raise
 
-    def create_ad_video(self, image_paths, audio_path, output_path=None, title=None, call_to_action=None):
+    def write_clip(self, frames, output_path, fps=None):
+        """Écrit les frames d'un clip dans un MP4 (à la cadence SVD par défaut)."""
+        configure_imagemagick()
+        from moviepy.editor import ImageSequenceClip
+
+        fps = fps or self.clip_fps
+        clip = ImageSequenceClip(list(frames), fps=fps).without_audio()
+        clip.write_videofile(output_path, codec='libx264', fps=fps, verbose=False)
+        clip.close()
+        return output_path
+
+    def generate_video_from_image(self, image_path, output_path=None, duration=5, progress=None, tier=None):
+        """Génère une vidéo courte à partir d'une image (Stable Video Diffusion ou pan/zoom CPU)."""
+        if output_path is None:
+            output_path = os.path.join(self.output_dir,
+                                       f"video_{uuid.uuid4().hex[:8]}_{os.path.basename(image_path)}.mp4")
+
+        engine = self.select_motion_engine(tier)
+        frames = self.frames_from_image(image_path, engine, progress=progress)
+        self.write_clip(frames, output_path, fps=engine.fps)
+        emit_progress(progress, "clip_encoded", 1.0, path=output_path)
+        print(f"[INFO] Vidéo générée et sauvegardée dans : {output_path}")
+        return output_path
+
+    def animate_image(self, image, engine, index=0, progress=None):
+        """Anime une image 1024x576 avec le moteur donné et retourne ses frames.
+
+        Les clips des moteurs coûteux (SVD) sont mis en cache par contenu : une image
+        déjà traitée avec les mêmes paramètres ne repasse pas par la diffusion.
+        """
+        if not engine.cacheable:
+            return engine.animate(image, index=index, progress=progress)
+
+        frames = self.clip_cache.get(ClipCache.key(image, engine=engine.name, **engine.clip_params()))
+        if frames is not None:
+            emit_progress(progress, "diffusion", 0.9, cached=True)
+            return frames
+        frames = engine.animate(image, index=index, progress=progress)
+        # Clé recalculée : une erreur de mémoire a pu réduire le plan pendant le rendu
+        self.clip_cache.put(ClipCache.key(image, engine=engine.name, **engine.clip_params()), frames)
+        return frames
+
+    @timed("AdGenerator.plan_images")
+    def plan_images(self, image_paths):
+        """Regroupe les images quasi identiques (dHash) : un seul clip est animé par groupe."""
+        plan = plan_dedup([entry.pixels for entry in self.ingestor.ingest(image_paths)])
+        if plan.saved:
+            print(f"[INFO] Déduplication : {plan.saved} animation(s) évitée(s) sur {len(image_paths)} images "
+                  f"(groupes {plan.report()['groups']}).")
+        return plan
+
+    @timed("AdGenerator.generate_clips")
+    def generate_clips(self, image_paths, engine=None, progress=None, plan=None):
+        """Génère les frames de chaque image, en mémoire. Ne dépend ni du script ni de l'audio.
+
+        Les images d'un même groupe de `plan` (voir plan_images) réutilisent le clip de
+        leur représentant, rejoué à partir d'une autre frame.
+        """
+        engine = engine or self.select_motion_engine()
+        plan = plan or self.plan_images(image_paths)
+        emit_progress(progress, "dedup", 0.0, runs=len(plan.groups), runs_saved=plan.saved)
+        representatives = [group[0] for group in plan.groups]
+        if self.renderer is not None and engine.cacheable and len(representatives) > 1:
+            rendered = self.render_sharded(image_paths, representatives, engine, progress)
+        else:
+            rendered = {}
+            count = len(representatives)
+            for g, i in enumerate(representatives):
+                emit_progress(progress, "image", g / count, image=g + 1, images=count)
+                rendered[i] = self.frames_from_image(
+                    image_paths[i],
+                    engine,
+                    index=i,
+                    progress=scaled_progress(progress, g / count, (g + 1) / count, image=g + 1, images=count)
+                )
+
+        clips = [None] * len(image_paths)
+        for group in plan.groups:
+            frames = rendered[group[0]]
+            clips[group[0]] = frames
+            for j in group[1:]:
+                clips[j] = OffsetClip(frames, plan.offset[j])
+        return clips
+
+    def render_sharded(self, image_paths, indexes, engine, progress=None):
+        """Anime les images `indexes` en parallèle sur les workers de self.renderer (voir shard.py).
+
+        Chaque worker renvoie les paramètres (plan mémoire compris) avec lesquels il a
+        réellement rendu le clip, et le clip est mis en cache sous cette clé. Le processus
+        parent ne choisit jamais de plan lui-même (pas de torch ni de contexte CUDA avant
+        les workers GPU) : le cache local n'est consulté qu'avec les paramètres du dernier
+        rendu réparti de ce moteur, et les images absentes partent sur les workers.
+        """
+        rendered, tasks, images = {}, [], {}
+        params = self._shard_params.get(engine.name)
+        for i in indexes:
+            images[i] = self.load_image(image_paths[i])
+            if params is not None:
+                frames = self.clip_cache.get(ClipCache.key(images[i], engine=engine.name, **params))
+                if frames is not None:
+                    rendered[i] = frames
+                    continue
+            with open(image_paths[i], "rb") as f:
+                tasks.append(make_task(i, engine.name, f.read()))
+        print(f"[INFO] Rendu réparti : {len(tasks)} image(s) sur {self.renderer.backend.concurrency} "
+              f"worker(s), {len(rendered)} depuis le cache.")
+
+        count = len(indexes)
+        emit_progress(progress, "image", len(rendered) / count, image=len(rendered), images=count)
+
+        def on_done(done, task):
+            emit_progress(progress, "image", (len(rendered) + done) / count,
+                          image=len(rendered) + done, images=count)
+
+        for task, result in zip(tasks, self.renderer.render(tasks, on_done=on_done)):
+            frames = load_result(result)
+            self._shard_params[engine.name] = result["params"]
+            key = ClipCache.key(images[task["index"]], engine=engine.name, **result["params"])
+            # Les workers locaux partagent déjà ce cache disque
+            if key not in self.clip_cache:
+                self.clip_cache.put(key, frames)
+            rendered[task["index"]] = frames
+        return rendered
+
+    def create_ad_video(self, image_paths, audio_path, output_path=None, title=None, call_to_action=None,
+                        progress=None, tier=None, workspace=None):
+        """Génère les clips de chaque image puis assemble la vidéo finale avec l'audio."""
+        engine = self.select_motion_engine(tier)
+        clips = self.generate_clips(image_paths, engine, progress=scaled_progress(progress, 0.0, 0.8))
+        return self.assemble_ad_video(clips, image_paths, audio_path, output_path, title, call_to_action,
+                                      progress=scaled_progress(progress, 0.8, 1.0), clip_fps=engine.fps,
+                                      workspace=workspace)
+
+    @timed("AdGenerator.assemble_ad_video")
+    def assemble_ad_video(self, clips, image_paths, audio_path, output_path=None, title=None,
+                          call_to_action=None, progress=None, mode=None, clip_fps=None, workspace=None,
+                          audio_duration=None, output_fps=None, preset="medium"):
+        """Assemble les clips déjà générés (frames en mémoire) en une vidéo calée sur la narration.
+
+        `audio_duration` (secondes) évite de relire l'audio quand la durée est déjà connue :
+        la timeline produit exactement autant de frames que la narration en couvre.
+        Les fichiers intermédiaires éventuels vont dans `workspace` (voir workspace.Workspace),
+        ou dans un espace temporaire créé pour l'occasion. `output_fps` et `preset`
+        (voir render_options) règlent la cadence et la vitesse d'encodage.
+        """
         if output_path is None:
             output_path = os.path.join(self.output_dir, "video_publicitaire.mp4")
-        temp_video = os.path.join(self.output_dir, "temp_video_noaudio.mp4")
+        mode = mode or self.assembly_mode
+        clip_fps = clip_fps or self.clip_fps
+        output_fps = output_fps or self.output_fps
 
         try:
-            # 1) Vérifier que l'audio existe
+            # 1) Vérifier que l'audio existe et connaître sa durée exacte (en-têtes seulement)
             if not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Le fichier audio {audio_path} n'existe pas")
-            audio = AudioFileClip(audio_path)
-            total_duration = audio.duration
+            total_duration = audio_duration or probe_audio(audio_path).duration
             print(f"[INFO] Durée de l'audio : {total_duration:.2f}s")
 
-            # 2) Générer une vidéo pour chaque image
-            video_paths = []
-            for img_path in image_paths:
-                vid = self.generate_video_from_image(img_path)
-                video_paths.append(vid)
-
-            # 3) Charger les clips vidéo (sans audio)
-            clips = []
-            for vid_path in video_paths:
-                clip = VideoFileClip(vid_path).without_audio()
-                if clip.duration <= 0:
-                    print(f"[WARNING] Clip {vid_path} durée nulle, fallback sur image statique.")
-                    fallback = ImageClip(img_path).set_duration(2)
-                    clip = fallback
-                clips.append(clip)
-
-            # 4) Calculer durée cible par clip
-            clip_duration = total_duration / len(clips)
-            print(f"[INFO] Chaque clip doit durer ~{clip_duration:.2f}s")
-
-            # 5) Ajuster chaque clip à la durée souhaitée
-            adjusted_clips = []
-            for clip in clips:
-                if clip.duration < clip_duration:
-                    repeats = int(np.ceil(clip_duration / clip.duration))
-                    repeated = concatenate_videoclips([clip] * repeats)
-                    adjusted = repeated.subclip(0, clip_duration)
-                else:
-                    adjusted = clip.subclip(0, min(clip.duration, clip_duration))
-                adjusted_clips.append(adjusted)
-
-            # 6) Concaténer
-            final_clip = concatenate_videoclips(adjusted_clips, method="compose")
-
-            # 7) Ajuster si final_clip est plus court ou plus long que l'audio
-            if final_clip.duration > total_duration:
-                final_clip = final_clip.subclip(0, total_duration)
-            elif final_clip.duration < total_duration:
-                final_clip = final_clip.fx(lambda c: c.set_duration(total_duration))
-
-            # 8) (optionnel) Ajouter titre / CTA si ImageMagick dispo…
-
-            # 9) Exporter la vidéo sans audio
+            # 2) Un clip vide est remplacé par l'image statique (à la taille des autres clips)
+            size = next(((f.shape[2], f.shape[1]) for f in clips if len(f)), None)
+            clips = [
+                frames if len(frames) else np.asarray(self.load_image(img_path).resize(size or (1024, 576)))[None]
+                for frames, img_path in zip(clips, image_paths)
+            ]
+
+            # 3) Interpolation temporelle jusqu'à la cadence de sortie (frames calculées à la demande)
+            source_fps = clip_fps
+            if self.interpolation != "none" and output_fps > clip_fps:
+                clips = [interpolate_frames(frames, clip_fps, output_fps, self.interpolation)
+                         for frames in clips]
+                source_fps = output_fps
+
+            # 4) Table frame de sortie → (clip, frame source) couvrant toute la narration
+            timeline = build_timeline([len(frames) for frames in clips], total_duration,
+                                      source_fps, output_fps, mode=self.timeline_mode)
+            print(f"[INFO] Chaque clip doit durer ~{total_duration / len(clips):.2f}s "
+                  f"({len(timeline)} frames à {output_fps} fps, mode {self.timeline_mode})")
+
+            if mode == "stream":
+                return self._assemble_streaming(clips, timeline, audio_path, output_path, progress, preset)
+            with scratch(workspace) as scratch_space:
+                return self._assemble_moviepy(clips, timeline, audio_path, output_path, progress,
+                                              scratch_space, preset)
+        except Exception as e:
+            print(f"[ERROR] Erreur dans assemble_ad_video : {e}")
+            raise
+
+    def _assemble_streaming(self, clips, timeline, audio_path, output_path, progress, preset="medium"):
+        """Assemblage en un seul encodage : frames envoyées directement à FFmpeg avec l'audio."""
+        height, width = clips[0].shape[1:3]
+
+        print("[INFO] Encodage en flux de la vidéo et de l'audio via FFmpeg…")
+        emit_progress(progress, "encode", 0.0)
+        with StreamingEncoder(output_path, width, height, timeline.fps, audio_path=audio_path,
+                              preset=preset, duration=timeline.duration) as encoder:
+            segments = timeline.segments()
+            for i, (start, end) in enumerate(segments):
+                for frame in timeline.render(clips, start, end):
+                    encoder.write(frame)
+                emit_progress(progress, "encode", end / len(timeline), image=i + 1, images=len(segments))
+        print(f"[INFO] Vidéo finale créée avec audio : {output_path}")
+        emit_progress(progress, "mux", 1.0, path=output_path)
+        return output_path
+
+    def _assemble_moviepy(self, clips, timeline, audio_path, output_path, progress, workspace, preset="medium"):
+        """Assemblage en deux passes : export MoviePy sans audio, puis mux de l'audio par FFmpeg."""
+        configure_imagemagick()
+        from moviepy.editor import VideoClip
+
+        temp_video = workspace.file("temp_video_noaudio.mp4")
+
+        try:
+            # 5) Clip MoviePy lisant directement la table d'indices
+            final_clip = VideoClip(lambda t: timeline.frame_at(clips, t), duration=timeline.duration)
+
+            # 6) Exporter la vidéo sans audio
             print("[INFO] Étape 1 : création de la vidéo sans audio…")
-            final_clip.set_duration(total_duration).write_videofile(
-                temp_video,
-                codec='libx264',
-                fps=24,
-                preset='medium',
-                verbose=False,
-                threads=4,
-                audio=False
-            )
+            emit_progress(progress, "encode", 0.0)
+            with span("moviepy.encode", preset=preset):
+                final_clip.write_videofile(
+                    temp_video,
+                    codec='libx264',
+                    fps=timeline.fps,
+                    preset=preset,
+                    verbose=False,
+                    threads=4,
+                    audio=False
+                )
             print(f"[DEBUG] temp_video_noaudio créé : {temp_video}")
+            workspace.check()
 
-            # 10) Étape 2 : combiner via FFmpeg avec mapping forcé
+            # 7) Étape 2 : combiner via FFmpeg avec mapping forcé
             print("[INFO] Étape 2 : ajout de l'audio via FFmpeg…")
+            emit_progress(progress, "mux", 0.75)
             ffmpeg_cmd = [
                 "ffmpeg",
                 "-y",
@@ -276,34 +533,68 @@ class AdGenerator:
                 "-c:v", "copy",
                 "-c:a", "aac",
                 "-b:a", "192k",
+                # Narration plus courte que la timeline : complétée par du silence (une frame de marge)
+                "-af", f"apad=whole_dur={timeline.duration + 1 / timeline.fps:.3f}",
                 "-shortest",
                 output_path
             ]
             print(f"[DEBUG] Commande FFmpeg : {' '.join(ffmpeg_cmd)}")
-            proc = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            with span("ffmpeg.mux"):
+                proc = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             if proc.returncode != 0:
                 print("[ERROR] FFmpeg a échoué :")
                 print(proc.stdout)
                 print(proc.stderr)
                 raise RuntimeError("FFmpeg n’a pas pu combiner audio et vidéo.")
             print(f"[INFO] Vidéo finale créée avec audio : {output_path}")
+            emit_progress(progress, "mux", 1.0, path=output_path)
 
-            # 11) Supprimer le temporaire
+            # 8) Supprimer le temporaire et fermer les ressources
             if os.path.exists(temp_video):
                 os.remove(temp_video)
-
-            # 12) Fermer les ressources
-            for c in clips + adjusted_clips:
-                c.close()
-            audio.close()
             final_clip.close()
 
             return output_path
 
         except Exception as e:
-            print(f"[ERROR] Erreur dans create_ad_video : {e}")
+            print(f"[ERROR] Erreur dans _assemble_moviepy : {e}")
             raise
 
+    @timed("AdGenerator.write_script")
+    def write_script(self, description, langue="fr"):
+        """Produit le script publicitaire (Gemini, ou nettoyage simple sans clé API)."""
+        if GEMINI_API_KEY:
+            return self.call_gemini_api(description, langue)
+        print("[WARNING] Pas de clé API Gemini, utilisation du nettoyage de texte simple.")
+        return self.clean_text(description)
+
+    def generate_ad(self, description, langue="fr", image_paths=(), output_path=None,
+                    title=None, call_to_action=None, progress=None, tier=None, narration=None):
+        """Exécute tout le pipeline (script, audio, vidéo) et retourne un dict de résultat.
+
+        Le script et l'audio sont produits en parallèle de la diffusion des images
+        (voir PipelineScheduler). `progress` reçoit des événements {"stage", "fraction", ...}.
+        Une demande identique à une publicité déjà rendue (ou en cours de rendu)
+        réutilise ce rendu ; la clé "cached" du résultat l'indique.
+        `tier="fast"` force le moteur d'animation CPU au lieu de SVD ; `tier="preview"` rend
+        un aperçu basse définition dont la narration est conservée (clé "audio_path") :
+        la version finale la réutilise via `narration=(script, audio_path)`.
+        """
+        image_paths = list(image_paths)
+        engine = self.select_motion_engine(tier)
+        render = self.render_options(tier)
+        fingerprint = self.result_cache.fingerprint(
+            description, langue, image_paths, title, call_to_action,
+            engine=engine.name, interpolation=self.interpolation,
+            dedup_threshold=os.getenv("DEDUP_THRESHOLD"), **render, **engine.params()
+        )
+        return self.result_cache.get_or_run(
+            fingerprint,
+            lambda: PipelineScheduler(self).run(description, langue, image_paths, output_path,
+                                                title, call_to_action, progress=progress, engine=engine,
+                                                render=render, narration=narration,
+                                                keep_narration=tier == TIER_PREVIEW)
+        )
 
 def main():
     """Fonction principale pour l’exécution du programme."""
@@ -354,6 +645,7 @@ def main():
     call_to_action = input("Entrez un appel à l'action pour la fin (ou laissez vide) : ").strip()
 
     # Vérifier ImageMagick pour l’utilisateur final
+    configure_imagemagick()
     try:
         from moviepy.config import get_setting
         imagemagick_path = get_setting("IMAGEMAGICK_BINARY")
@@ -366,30 +658,19 @@ def main():
         print(f"[WARNING] Erreur de vérification d'ImageMagick : {e}")
 
     try:
-        # Génération du script
-        print("\n[INFO] Génération du script publicitaire...")
-        if GEMINI_API_KEY:
-            script = generator.call_gemini_api(description, langue)
-        else:
-            print("[WARNING] Pas de clé API Gemini, utilisation du nettoyage de texte simple.")
-            script = generator.clean_text(description)
-
-        print("\n=== Script généré ===")
-        print(script)
-
-        # Conversion en audio
-        print("\n[INFO] Conversion du script en audio...")
-        audio_path, audio_duration = generator.text_to_speech(script, langue)
-
-        # Création de la vidéo
+        # Script et audio sont produits pendant la génération des clips
         print("\n[INFO] Création de la vidéo (cela peut prendre plusieurs minutes)...")
-        output_path = generator.create_ad_video(
+        result = generator.generate_ad(
+            description,
+            langue,
             image_paths,
-            audio_path,
             title=title if title else None,
             call_to_action=call_to_action if call_to_action else None
         )
-        print(f"\n[SUCCESS] Vidéo publicitaire créée avec succès : {output_path}")
+
+        print("\n=== Script généré ===")
+        print(result["script"])
+        print(f"\n[SUCCESS] Vidéo publicitaire créée avec succès : {result['video_path']}")
 
     except Exception as e:
         print(f"\n[ERROR] Erreur inattendue : {e}")
@@ -397,17 +678,11 @@ def main():
         if "ImageMagick" in str(e) and title and call_to_action:
             print("\n[INFO] Réessai sans ajout de textes…")
             try:
-                output_path = generator.create_ad_video(
-                    image_paths,
-                    audio_path,
-                    title=None,
-                    call_to_action=None
-                )
-                print(f"\n[SUCCESS] Vidéo créée sans textes : {output_path}")
+                result = generator.generate_ad(description, langue, image_paths)
+                print(f"\n[SUCCESS] Vidéo créée sans textes : {result['video_path']}")
             except Exception as e2:
                 print(f"[ERROR] Échec de la solution alternative : {e2}")
 
-
 if __name__== "__main__":
     try:
         main()
@@ -1,12 +1,19 @@
 import os
 import logging
+import threading
+import time
 import uuid
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, session, \
+    stream_with_context, g
 from werkzeug.utils import secure_filename
-import time
 
-from ad_generator import AdGenerator
 from chatbot import process_image
+from gemini_client import shared_client
+from ingest import shared_ingestor
+from jobs import JobQueue, QueueFullError, DONE, FAILED, PRIORITY_LOW, make_generation_handler
+from motion import TIER_PREVIEW
+from progress import ProgressBus, format_sse
+from telemetry import COUNTER, GAUGE, METRICS, record_span
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -28,8 +35,34 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULT_FOLDER'] = RESULT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload
 
-# Initialize the ad generator
-ad_generator = AdGenerator()
+# The ad generator (and torch, diffusers and MoviePy behind it) is built by the first
+# generation, so the web and chatbot endpoints start without them. With JOB_WORKERS=0
+# and `python jobs.py worker` processes, this process never builds it at all.
+_ad_generator = None
+_ad_generator_lock = threading.Lock()
+
+
+def get_ad_generator():
+    global _ad_generator
+    with _ad_generator_lock:
+        if _ad_generator is None:
+            from ad_generator import AdGenerator
+            _ad_generator = AdGenerator()
+        return _ad_generator
+
+
+# Background workers running the generations, reporting to the progress bus
+progress_bus = ProgressBus()
+job_queue = JobQueue(make_generation_handler(get_ad_generator, progress_bus)).start()
+
+# SVD_WARMUP=1: build the generator now, in the background, so that it loads and warms
+# the model before /readyz lets the load balancer send render jobs here
+WARMUP = os.environ.get('SVD_WARMUP') == '1'
+if WARMUP and job_queue.workers:
+    threading.Thread(target=get_ad_generator, name='generator-init', daemon=True).start()
+
+# Seconds an SSE watcher waits for an event before sending a keep-alive
+SSE_KEEPALIVE = 15
 
 # Translations dictionary
 translations = {
@@ -48,6 +81,12 @@ translations = {
         'result_title': 'Your Generated Video Ad',
         'download_button': 'Download Video',
         'create_new': 'Create Another Ad',
+        'render_label': 'Render Mode',
+        'render_full': 'Full quality',
+        'render_preview': 'Quick preview first',
+        'preview_badge': 'Preview',
+        'approve_button': 'Approve & Render Full Quality',
+        'upgrading': 'Rendering the full-quality version...',
         'error_title': 'Error',
         'chat_title': 'Chat with AI Assistant',
         'chat_placeholder': 'Ask anything about ad creation...',
@@ -58,6 +97,8 @@ translations = {
         'step3': 'Processing images',
         'step4': 'Creating video',
         'step5': 'Finalizing',
+        'step_dedup': 'Grouping similar images',
+        'step_motion': 'Animating images',
         'footer': '© 2023 VisuaLux',
         'how_it_works': 'How It Works',
         'testimonials_title': 'What Our Clients Say',
@@ -88,6 +129,12 @@ translations = {
         'result_title': 'Votre Vidéo Publicitaire Générée',
         'download_button': 'Télécharger la Vidéo',
         'create_new': 'Créer une Autre Pub',
+        'render_label': 'Mode de Rendu',
+        'render_full': 'Qualité maximale',
+        'render_preview': 'Aperçu rapide d\'abord',
+        'preview_badge': 'Aperçu',
+        'approve_button': 'Valider et Rendre en Haute Qualité',
+        'upgrading': 'Rendu de la version haute qualité en cours...',
         'error_title': 'Erreur',
         'chat_title': 'Discuter avec l\'Assistant IA',
         'chat_placeholder': 'Posez des questions sur la création de pubs...',
@@ -98,6 +145,8 @@ translations = {
         'step3': 'Traitement des images',
         'step4': 'Création de la vidéo',
         'step5': 'Finalisation',
+        'step_dedup': 'Regroupement des images similaires',
+        'step_motion': 'Animation des images',
         'footer': '© 2023 VisuaLux',
         'faq_title': 'Questions Fréquentes',
         'faq_q1': 'Quels types de publicités puis-je créer avec VisuaLux ?',
@@ -126,6 +175,12 @@ translations = {
         'result_title': 'الفيديو الإعلاني الذي تم إنشاؤه',
         'download_button': 'تنزيل الفيديو',
         'create_new': 'إنشاء إعلان آخر',
+        'render_label': 'وضع العرض',
+        'render_full': 'جودة كاملة',
+        'render_preview': 'معاينة سريعة أولاً',
+        'preview_badge': 'معاينة',
+        'approve_button': 'الموافقة وإنشاء النسخة عالية الجودة',
+        'upgrading': 'جارٍ إنشاء النسخة عالية الجودة...',
         'error_title': 'خطأ',
         'chat_title': 'الدردشة مع مساعد الذكاء الاصطناعي',
         'chat_placeholder': 'اسأل أي شيء عن إنشاء الإعلانات...',
@@ -136,6 +191,8 @@ translations = {
         'step3': 'معالجة الصور',
         'step4': 'إنشاء الفيديو',
         'step5': 'الانتهاء',
+        'step_dedup': 'تجميع الصور المتشابهة',
+        'step_motion': 'تحريك الصور',
         'footer': '© 2023 فيجوالوكس',
         'faq_title': 'الأسئلة الشائعة',
         'faq_q1': 'ما هي أنواع الإعلانات التي يمكنني إنشاؤها باستخدام فيجوالوكس؟',
@@ -166,6 +223,54 @@ def get_translation(key):
 def inject_translations():
     return dict(t=get_translation, current_lang=get_language())
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+def _record_request(status):
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    record_span(f'{request.method} {route}', start, time.perf_counter(), 'ok' if status < 500 else 'error')
+    METRICS.inc('http_requests_total', route=route, method=request.method, status=status)
+
+@app.after_request
+def record_request(response):
+    _record_request(response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request(exc):
+    # after_request is skipped when a view raises
+    if exc is not None:
+        _record_request(500)
+
+def collect_metrics():
+    """Queue depth, cache hit/miss counts and model state, read at scrape time."""
+    yield 'jobs_queued', GAUGE, 'Jobs waiting for a worker', {}, job_queue.store.count_queued()
+    gemini = shared_client().stats()
+    for result, key in (('ok', 'successes'), ('cache_hit', 'cache_hits'), ('failed', 'failures'),
+                        ('rejected', 'rejected')):
+        yield 'gemini_requests_total', COUNTER, 'Gemini script requests by outcome', {'result': result}, gemini[key]
+    yield 'gemini_http_attempts_total', COUNTER, 'Gemini HTTP attempts, retries included', {}, gemini['calls']
+    yield 'gemini_retries_total', COUNTER, 'Gemini HTTP retries', {}, gemini['retried']
+    caches = {'images': shared_ingestor().store.stats()}
+    generator = _ad_generator
+    if generator is not None:
+        results = generator.result_cache.stats()
+        caches['clips'] = generator.clip_cache.stats()
+        caches['results'] = dict(results, hits=results['hits'] + results['attached'])
+        caches['tts'] = generator.narrator.cache.stats()
+        model = generator.model_manager
+        yield 'model_loaded', GAUGE, 'Whether the SVD pipeline is in memory', {}, int(model.is_loaded)
+        yield 'model_oom_total', COUNTER, 'Out-of-memory errors during diffusion', {}, model.oom_count
+    for cache, stats in caches.items():
+        yield 'cache_hits_total', COUNTER, 'Cache hits', {'cache': cache}, stats['hits']
+        yield 'cache_misses_total', COUNTER, 'Cache misses', {'cache': cache}, stats['misses']
+
+METRICS.register_collector(collect_metrics)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -185,6 +290,8 @@ def upload():
     files = request.files.getlist('images')
     description = request.form.get('description', '')
     language = request.form.get('language', 'en')
+    # 'fast' renders with the CPU motion engine, 'preview' renders a quick low-resolution draft
+    tier = request.form.get('tier')
     
     # Validate inputs
     if not description:
@@ -200,6 +307,7 @@ def upload():
     session['current_session'] = session_id
     session['description'] = description
     session['language'] = language
+    session['tier'] = tier
     
     # Save uploaded images
     image_paths = []
@@ -210,6 +318,15 @@ def upload():
             file.save(filepath)
             image_paths.append(filepath)
     
+    # Decode, normalise and hash every upload now, in parallel, so the generator and the
+    # chatbot reuse the results instead of decoding the originals again
+    try:
+        shared_ingestor().ingest(image_paths)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Image ingestion failed: {e}")
+        flash(f'Invalid image: {e}')
+        return redirect(url_for('index'))
+    
     session['image_paths'] = image_paths
     
     # Redirect to generation page
@@ -227,58 +344,156 @@ def process_generation():
     if 'current_session' not in session:
         return jsonify({'error': 'No active session'}), 400
     
+    session_id = session['current_session']
+    suffix = 'preview' if session.get('tier') == TIER_PREVIEW else 'video'
+    params = {
+        'description': session['description'],
+        'language': session['language'],
+        'image_paths': session['image_paths'],
+        'output_path': os.path.join(app.config['RESULT_FOLDER'], f"{session_id}_{suffix}.mp4"),
+        'title': None,  # Optional title for the video
+        'call_to_action': None,  # Optional CTA for the video
+        'tier': session.get('tier'),
+        'session_id': session_id,  # Owner of the job, checked by the /jobs/<id> routes
+    }
+    
     try:
-        session_id = session['current_session']
-        description = session['description']
-        language = session['language']
-        image_paths = session['image_paths']
-        
-        # Update progress
-        time.sleep(1)  # Simulate initial processing
-        progress_update(10, get_translation('step1'))
-        
-        # Process script with Gemini API
-        script = ad_generator.call_gemini_api(description, language)
-        progress_update(30, get_translation('step2'))
-        
-        # Generate audio from script
-        audio_path, duration = ad_generator.text_to_speech(script, language)
-        progress_update(50, get_translation('step3'))
-        
-        # Generate video from images
-        output_video = os.path.join(app.config['RESULT_FOLDER'], f"{session_id}_video.mp4")
-        title = None  # Optional title for the video
-        call_to_action = None  # Optional CTA for the video
-        
-        # Process images and create video
-        progress_update(70, get_translation('step4'))
-        ad_generator.create_ad_video(image_paths, audio_path, output_video, title, call_to_action)
-        progress_update(90, get_translation('step5'))
-        
-        # Clean up temp files (keep uploads for now)
-        # os.remove(audio_path)
-        
-        # Save result path to session
-        session['result_video'] = output_video
-        
-        time.sleep(1)  # Give time for progress to be seen
-        progress_update(100, "Complete")
-        
-        return jsonify({
-            'success': True,
-            'redirect': url_for('result')
-        })
-        
-    except Exception as e:
-        logger.exception(f"Error during video generation: {str(e)}")
-        return jsonify({
-            'error': str(e)
-        }), 500
+        job_id = job_queue.submit(params)
+    except QueueFullError as e:
+        logger.warning(f"Generation rejected: {str(e)}")
+        response = jsonify({'error': 'The server is busy, please retry in a moment.'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    session['job_id'] = job_id
+    progress_bus.publish(job_id, {'stage': 'queued', 'fraction': 0.0})
+    return jsonify(job_links(job_id)), 202
+
+def job_links(job_id):
+    return {
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id)
+    }
+
+def owned_job(job_id):
+    """Return the job if it belongs to the current session, None otherwise.
+
+    Jobs of other sessions are reported as unknown, so job ids cannot be probed.
+    """
+    job = job_queue.status(job_id)
+    if job is None or job['params'].get('session_id') != session.get('current_session'):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'error': job['error'],
+        'queue_depth': job['queue_depth'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'progress': progress_bus.latest(job_id)
+    })
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream the job's progress events as Server-Sent Events."""
+    if owned_job(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_id = 0
+    
+    def stream(last_id):
+        yield 'retry: 3000\n\n'
+        while True:
+            events, finished = progress_bus.wait(job_id, last_id, timeout=SSE_KEEPALIVE)
+            for event in events:
+                last_id = event['id']
+                yield format_sse(event)
+            if finished:
+                return
+            if not events:
+                # External workers (`python jobs.py worker`) publish on their own bus: the
+                # end of the job is then only visible in the job store
+                job = job_queue.status(job_id)
+                if job is None:
+                    return
+                if job['status'] == DONE:
+                    progress_bus.finish(job_id, {'stage': 'done', 'fraction': 1.0})
+                elif job['status'] == FAILED:
+                    progress_bus.finish(job_id, {'stage': 'error', 'fraction': 1.0, 'message': job['error']})
+                else:
+                    yield ': keep-alive\n\n'
+    
+    return Response(stream_with_context(stream(last_id)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != DONE:
+        return jsonify({'status': job['status']}), 409
+    
+    # Save result path to session
+    session['result_video'] = job['result']['video_path']
+    if job['params'].get('tier') == TIER_PREVIEW:
+        session['preview_job_id'] = job_id
+    else:
+        session.pop('preview_job_id', None)
+    return jsonify({
+        'success': True,
+        'video_url': '/' + job['result']['video_path'],
+        'redirect': url_for('result')
+    })
+
+@app.route('/jobs/<job_id>/approve', methods=['POST'])
+def approve_preview(job_id):
+    """Queue the full-quality render of an approved preview at low priority.
 
-def progress_update(percent, status):
-    """Helper function to update progress via Server-Sent Events in a real app.
-    For this implementation, we'll just log it."""
-    logger.info(f"Progress: {percent}% - {status}")
+    The preview's script and narration are reused, so only the video is rendered again.
+    """
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['params'].get('tier') != TIER_PREVIEW or job['status'] != DONE:
+        return jsonify({'error': 'Only a finished preview can be approved'}), 409
+    
+    preview = job['result']
+    params = dict(job['params'])
+    params['tier'] = None
+    params['output_path'] = params['output_path'].replace('_preview.mp4', '_video.mp4')
+    if preview.get('script') and preview.get('audio_path'):
+        params['narration'] = [preview['script'], preview['audio_path']]
+    
+    try:
+        full_job_id = job_queue.submit(params, priority=PRIORITY_LOW)
+    except QueueFullError as e:
+        logger.warning(f"Full render rejected: {str(e)}")
+        response = jsonify({'error': 'The server is busy, please retry in a moment.'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    session['job_id'] = full_job_id
+    progress_bus.publish(full_job_id, {'stage': 'queued', 'fraction': 0.0})
+    return jsonify(job_links(full_job_id)), 202
 
 @app.route('/result')
 def result():
@@ -288,7 +503,9 @@ def result():
     video_path = session['result_video']
     video_url = '/' + video_path
     
-    return render_template('result.html', video_url=video_url)
+    preview_job_id = session.get('preview_job_id')
+    approve_url = url_for('approve_preview', job_id=preview_job_id) if preview_job_id else None
+    return render_template('result.html', video_url=video_url, approve_url=approve_url)
 
 @app.route('/reset')
 def reset():
@@ -297,9 +514,66 @@ def reset():
     session.pop('description', None)
     session.pop('image_paths', None)
     session.pop('result_video', None)
+    session.pop('job_id', None)
+    session.pop('preview_job_id', None)
+    session.pop('tier', None)
     
     return redirect(url_for('index'))
 
+def generator_health():
+    """Readiness of this process for render jobs, and the model state behind it."""
+    generator = _ad_generator
+    report = {'render_workers': job_queue.workers, 'queue_depth': job_queue.store.count_queued()}
+    if generator is None:
+        # Without warm-up the generator is built by the first job; with it, not ready yet
+        ready = not (WARMUP and job_queue.workers)
+        return ready, dict(report, generator_started=False, model={'state': 'cold', 'ready': False})
+    health = generator.health()
+    ready = health.pop('ready') or not job_queue.workers
+    return ready, dict(report, generator_started=True, **health)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the process answers; the model state is included for diagnostics."""
+    _, report = generator_health()
+    return jsonify({'status': 'ok', **report})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 503 until a requested warm-up has finished."""
+    ready, report = generator_health()
+    return jsonify({'ready': ready, **report}), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage timings, peak memory per stage, counters."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/model/stats')
+def model_stats():
+    if _ad_generator is None:
+        return jsonify({'loaded': False, 'generator_started': False})
+    return jsonify(_ad_generator.model_manager.stats())
+
+@app.route('/model/unload', methods=['POST'])
+def model_unload():
+    if _ad_generator is None:
+        return jsonify({'unloaded': False, 'loaded': False, 'generator_started': False})
+    unloaded = _ad_generator.model_manager.unload()
+    return jsonify({'unloaded': unloaded, **_ad_generator.model_manager.stats()})
+
+@app.route('/cache/stats')
+def cache_stats():
+    # Caches owned by the generator only exist once it has been built
+    generator = _ad_generator
+    return jsonify({
+        'clips': generator.clip_cache.stats() if generator else None,
+        'results': generator.result_cache.stats() if generator else None,
+        'gemini': shared_client().stats(),
+        'tts': generator.narrator.cache.stats() if generator else None,
+        'images': shared_ingestor().store.stats()
+    })
+
 @app.route('/chatbot', methods=['POST'])
 def chatbot():
     try:
@@ -338,6 +612,10 @@ def upload_chat_image():
         filename = secure_filename(f"chat_{uuid.uuid4()}_{file.filename}")
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
+        try:
+            shared_ingestor().ingest([filepath])
+        except (OSError, ValueError) as e:
+            return jsonify({'error': f'Invalid image: {e}'}), 400
         
         return jsonify({
             'success': True,
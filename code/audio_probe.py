@@ -0,0 +1,142 @@
+import json
+import shutil
+import subprocess
+import wave
+from collections import namedtuple
+
+# Métadonnées d'un fichier audio ; `method` indique comment elles ont été obtenues
+AudioInfo = namedtuple("AudioInfo", "duration sample_rate channels codec method")
+
+_BITRATES = {  # kbit/s, MPEG-1 / MPEG-2(.5) couche III
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def id3v2_size(data):
+    """Taille de l'étiquette ID3v2 en tête de `data` (0 s'il n'y en a pas)."""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(header):
+    """(taille en octets, échantillons, fréquence, canaux) d'une trame MPEG couche III,
+    ou None si les 4 octets ne forment pas un en-tête valide."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version == 1 or (header[1] >> 1) & 0x3 != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    samples = 1152 if version == 3 else 576
+    length = samples // 8 * bitrate // sample_rate + ((header[2] >> 1) & 0x1)
+    channels = 1 if (header[3] >> 6) == 3 else 2
+    return length, samples, sample_rate, channels
+
+
+def is_info_frame(data, start):
+    """Vrai si la trame en `start` est une trame d'info Xing/LAME (sans audio)."""
+    window = data[start:start + 64]
+    return b"Xing" in window or b"Info" in window
+
+
+def lame_gapless(data, start, length):
+    """(délai encodeur, remplissage final) en échantillons, lus dans l'étiquette LAME de la
+    trame d'info en `start` (LAME et FFmpeg l'écrivent) ; (0, 0) si elle est absente."""
+    window = data[start:start + length]
+    marker = max(window.find(b"Xing"), window.find(b"Info"))
+    if marker < 0 or marker + 8 > len(window):
+        return 0, 0
+    flags = int.from_bytes(window[marker + 4:marker + 8], "big")
+    # Champs optionnels de l'en-tête Xing : trames, octets, table TOC, qualité
+    tag = marker + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) + 4 * bool(flags & 8)
+    if tag + 24 > len(window):
+        return 0, 0
+    b0, b1, b2 = window[tag + 21:tag + 24]
+    return (b0 << 4) | (b1 >> 4), ((b1 & 0x0F) << 8) | b2
+
+
+def probe_mp3(path):
+    """Durée exacte d'un MP3 par parcours des en-têtes de trames, sans décoder l'audio.
+
+    Le fichier est lu d'un bloc (quelques centaines de Ko pour une narration) et seuls
+    les 4 octets d'en-tête de chaque trame sont examinés. Le délai et le remplissage
+    déclarés par l'encodeur (étiquette LAME) sont retirés, comme le fait FFmpeg.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = id3v2_size(data)
+    end = len(data)
+    if end - pos >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+
+    total_samples = 0
+    trimmed = 0
+    sample_rate = channels = None
+    first = True
+    while pos + 4 <= end:
+        frame = parse_frame_header(data[pos:pos + 4])
+        if frame is None:
+            # Octets parasites entre trames : on resynchronise sur le prochain 0xFF
+            nxt = data.find(b"\xff", pos + 1, end)
+            if nxt < 0:
+                break
+            pos = nxt
+            continue
+        length, samples, rate, chans = frame
+        if first and is_info_frame(data, pos):
+            trimmed = sum(lame_gapless(data, pos, length))
+        else:
+            total_samples += samples
+            sample_rate, channels = rate, chans
+        first = False
+        pos += length
+
+    if not sample_rate:
+        raise ValueError(f"Aucune trame MP3 trouvée dans {path}")
+    total_samples = max(total_samples - trimmed, 0)
+    return AudioInfo(total_samples / sample_rate, sample_rate, channels, "mp3", "frames")
+
+
+def probe_wav(path):
+    with wave.open(path, "rb") as w:
+        rate = w.getframerate()
+        return AudioInfo(w.getnframes() / rate, rate, w.getnchannels(), "pcm", "wave")
+
+
+def probe_ffprobe(path):
+    """Repli générique via ffprobe (lit l'en-tête du conteneur, ne décode pas le flux)."""
+    binary = shutil.which("ffprobe")
+    if binary is None:
+        raise RuntimeError("ffprobe introuvable pour analyser " + path)
+    proc = subprocess.run(
+        [binary, "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "format=duration:stream=sample_rate,channels,codec_name", "-of", "json", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe a échoué sur {path} : {proc.stderr.strip()}")
+    data = json.loads(proc.stdout)
+    stream = (data.get("streams") or [{}])[0]
+    return AudioInfo(float(data["format"]["duration"]), int(stream.get("sample_rate", 0)),
+                     int(stream.get("channels", 0)), stream.get("codec_name"), "ffprobe")
+
+
+def probe_audio(path):
+    """Durée et format d'un fichier audio : lecture d'en-têtes (WAV, MP3), sinon ffprobe."""
+    lower = path.lower()
+    try:
+        if lower.endswith(".wav"):
+            return probe_wav(path)
+        if lower.endswith(".mp3"):
+            return probe_mp3(path)
+    except (ValueError, wave.Error, EOFError) as e:
+        print(f"[WARNING] Analyse rapide de {path} impossible ({e}), repli sur ffprobe.")
+    return probe_ffprobe(path)
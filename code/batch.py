@@ -0,0 +1,260 @@
+"""Headless batch rendering of many ads from a manifest.
+
+    python batch.py campaigns.json --out-dir output/batch --report report.json
+
+The manifest is a JSON list of objects (or {"items": [...]}) or a CSV file
+with the same columns:
+
+    id, description, langue, images, title, call_to_action, tier, output
+
+`images` is a list in JSON and a ';'-separated string in CSV; relative paths
+are resolved against the manifest's directory. Only `description` and
+`images` are required; `id` defaults to a hash of the item's content and
+`output` to <out-dir>/<id>.mp4.
+
+A single AdGenerator serves the whole batch, so the diffusion model is
+loaded once. Items are rendered one after the other on the device while the
+network-bound stages of the next items (Gemini script, speech synthesis)
+and their image decoding run ahead in a small thread pool.
+
+Videos are written under a temporary name and renamed when complete, so an
+existing output always is a finished render: items whose output exists are
+skipped. Every finished item is appended to a journal (JSON lines, flushed
+to disk); narrations prepared ahead are kept until their item is done. After
+a crash, running the same command again picks up where the batch stopped.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import trace_job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH = 2
+SKIPPED = 'skipped'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _item_id(item):
+    content = json.dumps([item['description'], item['langue'], item['images'], item.get('title'),
+                          item.get('call_to_action'), item.get('tier')], ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+
+def load_manifest(path, out_dir):
+    """Read a JSON or CSV manifest into normalized item dicts."""
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['images'] = [p.strip() for p in (row.get('images') or '').split(';') if p.strip()]
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get('items', [])
+
+    items = []
+    seen = set()
+    for n, row in enumerate(rows):
+        if not row.get('description') or not row.get('images'):
+            raise ValueError(f'Manifest item {n} needs a description and at least one image')
+        item = {
+            'description': row['description'].strip(),
+            'langue': (row.get('langue') or row.get('language') or 'fr').strip(),
+            'images': [p if os.path.isabs(p) else os.path.join(base, p) for p in row['images']],
+            'title': row.get('title') or None,
+            'call_to_action': row.get('call_to_action') or None,
+            'tier': row.get('tier') or None,
+        }
+        item['id'] = str(row.get('id') or _item_id(item))
+        if item['id'] in seen:
+            raise ValueError(f"Duplicate manifest item id: {item['id']}")
+        seen.add(item['id'])
+        item['output'] = row.get('output') or os.path.join(out_dir, f"{item['id']}.mp4")
+        items.append(item)
+    return items
+
+
+class Journal:
+    """Append-only JSON-lines record of finished items, flushed after every write."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Latest record per item id."""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # line cut short by a crash
+                records[record['id']] = record
+        return records
+
+    def append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BatchRunner:
+    """Render manifest items in order on one generator, preparing narrations ahead."""
+
+    def __init__(self, generator, out_dir, prefetch=DEFAULT_PREFETCH, force=False):
+        self.generator = generator
+        self.out_dir = out_dir
+        self.prefetch = prefetch
+        self.force = force
+        self.narration_dir = os.path.join(out_dir, '.narration')
+        os.makedirs(self.narration_dir, exist_ok=True)
+        self.journal = Journal(os.path.join(out_dir, 'batch_journal.jsonl'))
+
+    def _narration_paths(self, item):
+        ext = self.generator.narrator.backend.ext
+        base = os.path.join(self.narration_dir, item['id'])
+        return f'{base}.txt', f'{base}.{ext}'
+
+    def prepare(self, item):
+        """Script and narration audio of an item (network-bound); reused if already on disk."""
+        script_path, audio_path = self._narration_paths(item)
+        if os.path.exists(script_path) and os.path.exists(audio_path):
+            with open(script_path, encoding='utf-8') as f:
+                return f.read(), audio_path
+        self.generator.ingestor.submit(item['images'])
+        script = self.generator.write_script(item['description'], item['langue'])
+        self.generator.text_to_speech(script, item['langue'], output_file=audio_path)
+        # The script is written last: both files present means the narration is complete
+        with open(f'{script_path}.tmp', 'w', encoding='utf-8') as f:
+            f.write(script)
+        os.replace(f'{script_path}.tmp', script_path)
+        return script, audio_path
+
+    def render(self, item, narration):
+        output = item['output']
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        partial = f'{os.path.splitext(output)[0]}.partial.mp4'
+        try:
+            with trace_job(item['id']):
+                result = self.generator.generate_ad(
+                    item['description'], item['langue'], item['images'], output_path=partial,
+                    title=item['title'], call_to_action=item['call_to_action'], tier=item['tier'],
+                    narration=narration,
+                )
+        except Exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        if os.path.abspath(result['video_path']) == os.path.abspath(partial):
+            os.replace(partial, output)
+            # The result cache recorded the temporary name: point it at the final video
+            self.generator.result_cache.relocate(partial, output)
+        else:
+            # Identical ad already rendered elsewhere (result cache)
+            shutil.copyfile(result['video_path'], output)
+        return result
+
+    def _discard_narration(self, item):
+        for path in self._narration_paths(item):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self, items):
+        """Render all items; returns the report dict."""
+        started = time.time()
+        previous = self.journal.load()
+        todo = []
+        records = {}
+        for item in items:
+            if not self.force and os.path.exists(item['output']):
+                records[item['id']] = dict(previous.get(item['id'], {}), id=item['id'], status=SKIPPED,
+                                           output=item['output'])
+            else:
+                todo.append(item)
+        logger.info(f'{len(items)} items, {len(items) - len(todo)} already rendered, {len(todo)} to render')
+
+        with ThreadPoolExecutor(max_workers=max(self.prefetch, 1), thread_name_prefix='prefetch') as pool:
+            # Narration of item n + prefetch is prepared while item n renders
+            futures = [pool.submit(self.prepare, item) for item in todo[:self.prefetch + 1]]
+            for n, item in enumerate(todo):
+                if n + self.prefetch + 1 < len(todo):
+                    futures.append(pool.submit(self.prepare, todo[n + self.prefetch + 1]))
+                future = futures[n]
+                record = {'id': item['id'], 'output': item['output'],
+                          'attempt': previous.get(item['id'], {}).get('attempt', 0) + 1}
+                start = time.perf_counter()
+                try:
+                    narration = future.result()
+                    record['narration_wait_seconds'] = round(time.perf_counter() - start, 3)
+                    render_start = time.perf_counter()
+                    result = self.render(item, narration)
+                    record['render_seconds'] = round(time.perf_counter() - render_start, 3)
+                    record.update(status=DONE, cached=bool(result.get('cached')),
+                                  audio_duration=result.get('audio_duration'),
+                                  runs_saved=result.get('dedup', {}).get('runs_saved'))
+                    self._discard_narration(item)
+                except Exception as e:
+                    logger.exception(f"Item {item['id']} failed")
+                    record.update(status=FAILED, error=f'{type(e).__name__}: {e}')
+                record['seconds'] = round(time.perf_counter() - start, 3)
+                record['finished_at'] = time.time()
+                self.journal.append(record)
+                records[item['id']] = record
+                logger.info(f"[{n + 1}/{len(todo)}] {item['id']}: {record['status']} in {record['seconds']}s")
+
+        ordered = [records[item['id']] for item in items]
+        counts = {status: sum(r['status'] == status for r in ordered) for status in (DONE, FAILED, SKIPPED)}
+        elapsed = time.time() - started
+        return {
+            'started_at': started,
+            'elapsed_seconds': round(elapsed, 3),
+            'counts': counts,
+            'items_per_hour': round(counts[DONE] / elapsed * 3600, 1) if elapsed else None,
+            'items': ordered,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render ads from a JSON or CSV manifest without interaction.')
+    parser.add_argument('manifest')
+    parser.add_argument('--out-dir', default=os.path.join('output', 'batch'))
+    parser.add_argument('--report', help='Where to write the JSON report (default: <out-dir>/report.json)')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help='Items whose script and narration are prepared ahead of the render')
+    parser.add_argument('--force', action='store_true', help='Render items even if their output exists')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    os.makedirs(args.out_dir, exist_ok=True)
+    items = load_manifest(args.manifest, args.out_dir)
+
+    from ad_generator import AdGenerator
+    generator = AdGenerator()
+    generator.setup_gpu()
+
+    report = BatchRunner(generator, args.out_dir, prefetch=args.prefetch, force=args.force).run(items)
+    report['manifest'] = os.path.abspath(args.manifest)
+    report_path = args.report or os.path.join(args.out_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"Report written to {report_path}: {report['counts']}")
+    return 1 if report['counts'][FAILED] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Benchmark de l'assemblage final : flux FFmpeg unique vs. MoviePy vs. chemin d'origine.
+
+Les clips sont synthétiques (aucune diffusion) et la narration est une sinusoïde
+générée par FFmpeg : seul le coût d'assemblage et d'encodage est mesuré. Le mode
+"legacy" est la référence : copie fidèle de l'assemblage d'avant la timeline (chaque
+clip écrit en MP4 puis relu, bouclage par concaténation MoviePy, export sans audio
+puis multiplexage FFmpeg) ; les accélérations sont données par rapport à lui.
+
+    python benchmarks/bench_assembly.py --images 5 --duration 30
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("stream", "moviepy", "legacy")
+
+
+def synthetic_clips(count, frames=14, height=576, width=1024):
+    """Clips en mouvement (dégradé qui défile) pour que l'encodeur ait du travail réel."""
+    y, x = np.mgrid[0:height, 0:width]
+    clips = []
+    for c in range(count):
+        clip = np.empty((frames, height, width, 3), dtype=np.uint8)
+        for f in range(frames):
+            shift = f * 8 + c * 40
+            clip[f, ..., 0] = (x + shift) % 256
+            clip[f, ..., 1] = (y + shift) % 256
+            clip[f, ..., 2] = (x + y + c * 64) % 256
+        clips.append(clip)
+    return clips
+
+
+def synthetic_audio(path, duration):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+         "-c:a", "libmp3lame", "-b:a", "32k", path],
+        check=True
+    )
+    return path
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def legacy_assembly(clips, audio_path, output_path, workdir):
+    """Assemblage d'origine (create_ad_video d'avant la timeline), à partir des frames des clips."""
+    from ad_generator import configure_imagemagick
+    configure_imagemagick()
+    from moviepy.editor import AudioFileClip, ImageSequenceClip, VideoFileClip, concatenate_videoclips
+
+    audio = AudioFileClip(audio_path)
+    total_duration = audio.duration
+
+    # Chaque clip était écrit sur disque à la sortie de la diffusion...
+    video_paths = []
+    for i, frames in enumerate(clips):
+        path = os.path.join(workdir, f"video_image_{i}.jpg.mp4")
+        clip = ImageSequenceClip([np.array(frame) for frame in frames], fps=7).without_audio()
+        clip.write_videofile(path, codec='libx264', fps=7, verbose=False, logger=None)
+        clip.close()
+        video_paths.append(path)
+
+    # ... puis relu, bouclé et tronqué à sa part de la narration
+    loaded = [VideoFileClip(path).without_audio() for path in video_paths]
+    clip_duration = total_duration / len(loaded)
+    adjusted = []
+    for clip in loaded:
+        if clip.duration < clip_duration:
+            repeats = int(np.ceil(clip_duration / clip.duration))
+            adjusted.append(concatenate_videoclips([clip] * repeats).subclip(0, clip_duration))
+        else:
+            adjusted.append(clip.subclip(0, min(clip.duration, clip_duration)))
+    final_clip = concatenate_videoclips(adjusted, method="compose")
+    if final_clip.duration > total_duration:
+        final_clip = final_clip.subclip(0, total_duration)
+    elif final_clip.duration < total_duration:
+        final_clip = final_clip.fx(lambda c: c.set_duration(total_duration))
+
+    temp_video = os.path.join(workdir, "temp_video_noaudio.mp4")
+    final_clip.set_duration(total_duration).write_videofile(
+        temp_video, codec='libx264', fps=24, preset='medium', verbose=False, threads=4, audio=False, logger=None
+    )
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", temp_video, "-i", audio_path, "-map", "0:v", "-map", "1:a",
+         "-c:v", "copy", "-c:a", "aac", "-b:a", "192k", "-shortest", output_path],
+        check=True
+    )
+    os.remove(temp_video)
+    for c in loaded + adjusted:
+        c.close()
+    audio.close()
+    final_clip.close()
+    return output_path
+
+
+def run_child(mode, images, duration):
+    from ad_generator import AdGenerator
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    try:
+        generator = AdGenerator()
+        generator.output_dir = workdir
+        audio_path = synthetic_audio(os.path.join(workdir, "narration.mp3"), duration)
+        clips = synthetic_clips(images)
+        image_paths = [f"image_{i}.jpg" for i in range(images)]
+        output_path = os.path.join(workdir, "final.mp4")
+        before = directory_bytes(workdir)
+
+        start = time.perf_counter()
+        if mode == "legacy":
+            legacy_assembly(clips, audio_path, output_path, workdir)
+        else:
+            generator.assemble_ad_video(clips, image_paths, audio_path, output_path, mode=mode)
+        elapsed = time.perf_counter() - start
+
+        final_bytes = os.path.getsize(output_path)
+        return {
+            "mode": mode,
+            "images": images,
+            "duration_s": duration,
+            "seconds": round(elapsed, 3),
+            "output_frames_per_s": round(duration * generator.output_fps / elapsed, 1),
+            "final_bytes": final_bytes,
+            "intermediate_bytes_left": directory_bytes(workdir) - before - final_bytes,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=30.0, help="durée de la narration (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.images, args.duration)))
+        return
+
+    results = []
+    for mode in MODES:
+        runs = []
+        for _ in range(args.repeat):
+            # Un processus par mesure : le pic RSS n'est pas pollué par l'autre mode
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode,
+                 "--images", str(args.images), "--duration", str(args.duration)],
+                check=True, stdout=subprocess.PIPE, text=True
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r["seconds"])
+        results.append(best)
+        print(f"{mode:8s} {best['seconds']:8.2f}s  {best['output_frames_per_s']:7.1f} fps  "
+              f"rss {best['peak_rss_mb']:7.1f} Mo  sortie {best['final_bytes'] / 1e6:6.2f} Mo  "
+              f"intermédiaires {best['intermediate_bytes_left'] / 1e6:6.2f} Mo")
+
+    reference = results[MODES.index("legacy")]
+    for result in results:
+        if result is not reference:
+            print(f"Accélération du mode {result['mode']} par rapport au chemin d'origine : "
+                  f"x{reference['seconds'] / result['seconds']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark de l'interpolation temporelle 7 fps → 24/30 fps, en frames produites par seconde.
+
+    python benchmarks/bench_interpolation.py --clips 5 --fps 24 30
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_assembly import synthetic_clips  # noqa: E402
+from interpolate import FLOW, LINEAR, InterpolatedClip, opencv  # noqa: E402
+
+SRC_FPS = 7
+
+
+def bench(clips, dst_fps, mode, lazy):
+    produced = 0
+    start = time.perf_counter()
+    for frames in clips:
+        clip = InterpolatedClip(frames, SRC_FPS, dst_fps, mode)
+        if lazy:
+            # Accès frame par frame, comme le fait la timeline pendant l'encodage
+            for n in range(len(clip)):
+                clip[n]
+        else:
+            clip.to_array()
+        produced += len(clip)
+    elapsed = time.perf_counter() - start
+    return produced, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=5)
+    parser.add_argument("--fps", type=int, nargs="+", default=[24, 30])
+    args = parser.parse_args()
+
+    clips = synthetic_clips(args.clips)
+    cases = [(LINEAR, False), (LINEAR, True)]
+    if opencv() is not None:
+        cases.append((FLOW, True))
+    else:
+        print("OpenCV absent : mode flow non mesuré.")
+
+    for dst_fps in args.fps:
+        for mode, lazy in cases:
+            produced, elapsed = bench(clips, dst_fps, mode, lazy)
+            access = "à la demande" if lazy else "to_array"
+            print(f"{SRC_FPS}→{dst_fps} fps  {mode:6s} {access:13s} {produced:5d} frames  "
+                  f"{elapsed:7.2f}s  {produced / elapsed:8.1f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Test de charge des endpoints Flask avec un générateur et un chatbot simulés.
+
+L'application réelle (sessions, upload et ingestion des images, file de jobs, suivi
+de progression) tourne sur un serveur local ; seuls AdGenerator et process_image sont
+remplacés par des doubles à latence réglable. Des utilisateurs simulés enchaînent le
+parcours complet :
+
+    /upload -> /process-generation -> /jobs/<id> (jusqu'à la fin) -> /jobs/<id>/result
+    -> /upload-chat-image -> /chatbot
+
+à des niveaux de concurrence croissants. Pour chaque niveau et chaque endpoint : p50,
+p95 et p99 de latence, débit (requêtes/s) et taux d'erreur ; "parcours" mesure le
+parcours entier, attente du rendu comprise.
+
+    python benchmarks/bench_load.py --concurrency 1 4 16 --duration 20 --generation-latency 2
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import DONE, FAILED
+
+DEFAULT_CONCURRENCY = (1, 2, 4, 8, 16)
+PERCENTILES = (50, 95, 99)
+FLOW = "parcours"
+# Ordre d'affichage des endpoints
+ENDPOINTS = ("/upload", "/process-generation", "/jobs/<id>", "/jobs/<id>/result",
+             "/upload-chat-image", "/chatbot", FLOW)
+
+
+class FakeGenerator:
+    """Double d'AdGenerator : attend `latency` s (± `jitter`), publie sa progression, écrit un MP4 factice.
+
+    Une part `fail_rate` des générations lève une erreur, pour vérifier que les échecs
+    remontent proprement jusqu'au client.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.2, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self._random.uniform(1 - self.jitter, 1 + self.jitter), self._random.random()
+
+    def generate_ad(self, description, langue="fr", image_paths=(), output_path=None, title=None,
+                    call_to_action=None, progress=None, tier=None, narration=None):
+        scale, draw = self._draw()
+        steps = 5
+        for step in range(steps):
+            time.sleep(self.latency * scale / steps)
+            if progress is not None:
+                progress({"stage": "image", "fraction": (step + 1) / steps})
+        if draw < self.fail_rate:
+            raise RuntimeError("échec simulé du générateur")
+        with open(output_path, "wb") as f:
+            f.write(b"\x00" * 1024)
+        return {"video_path": output_path, "script": description, "audio_duration": 10.0}
+
+
+def fake_process_image(latency, jitter=0.2):
+    """Double de chatbot.process_image : répond après `latency` s (± `jitter`)."""
+    def process_image(image_path, query):
+        time.sleep(latency * random.uniform(1 - jitter, 1 + jitter))
+        return {"answer": f"Réponse simulée à : {query}"}
+    return process_image
+
+
+def synthetic_jpeg(seed, size=(800, 450)):
+    width, height = size
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (height // 25 + 1, width // 25 + 1, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels.repeat(25, 0).repeat(25, 1)[:height, :width])
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def percentile(values, p):
+    """Percentile au rang le plus proche d'une liste triée."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+class Recorder:
+    """Latences et erreurs par endpoint, partagées par les utilisateurs simulés."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint, seconds, error=None):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if error is not None:
+                self.errors[endpoint][error] += 1
+
+    def summary(self, elapsed):
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in self.latencies.items()}
+            errors = {name: dict(counts) for name, counts in self.errors.items()}
+        summary = {}
+        for name in ENDPOINTS:
+            values = latencies.get(name, [])
+            if not values:
+                continue
+            failed = sum(errors.get(name, {}).values())
+            summary[name] = {
+                "requests": len(values),
+                "per_s": round(len(values) / elapsed, 2),
+                "error_rate": round(failed / len(values), 4),
+                "errors": errors.get(name, {}),
+                **{f"p{p}_ms": round(percentile(values, p) * 1000, 1) for p in PERCENTILES},
+            }
+        return summary
+
+
+class SimulatedUser:
+    """Un navigateur : sa propre session (cookies), qui répète le parcours complet."""
+
+    def __init__(self, base_url, recorder, images, image_bytes, poll_interval, job_timeout):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.images = images
+        self.image_bytes = image_bytes
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.session = requests.Session()
+
+    def _call(self, endpoint, method, path, expected, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                            timeout=60, **kwargs)
+        except requests.RequestException as e:
+            self.recorder.add(endpoint, time.perf_counter() - start, type(e).__name__)
+            return None
+        error = None if response.status_code in expected else f"HTTP {response.status_code}"
+        self.recorder.add(endpoint, time.perf_counter() - start, error)
+        return response if error is None else None
+
+    def flow(self):
+        """Parcours complet ; retourne None s'il a abouti, sinon l'étape qui a échoué."""
+        files = [("images", (f"photo_{i}.jpg", self.image_bytes[i], "image/jpeg")) for i in range(self.images)]
+        if self._call("/upload", "POST", "/upload", (302,), files=files,
+                      data={"description": "Montre connectée étanche, autonomie de 10 jours.",
+                            "language": "fr"}) is None:
+            return "/upload"
+
+        response = self._call("/process-generation", "POST", "/process-generation", (202,))
+        if response is None:
+            return "/process-generation"
+        links = response.json()
+
+        deadline = time.monotonic() + self.job_timeout
+        while True:
+            response = self._call("/jobs/<id>", "GET", links["status_url"], (200,))
+            if response is None:
+                return "/jobs/<id>"
+            status = response.json()["status"]
+            if status in (DONE, FAILED):
+                break
+            if time.monotonic() > deadline:
+                return "timeout"
+            time.sleep(self.poll_interval)
+        if self._call("/jobs/<id>/result", "GET", links["result_url"], (200,)) is None:
+            return "/jobs/<id>/result"
+
+        response = self._call("/upload-chat-image", "POST", "/upload-chat-image", (200,),
+                              files={"image": ("chat.jpg", self.image_bytes[0], "image/jpeg")})
+        if response is None:
+            return "/upload-chat-image"
+        if self._call("/chatbot", "POST", "/chatbot", (200,),
+                      json={"query": "Quel slogan pour ce produit ?",
+                            "image_path": response.json()["image_path"]}) is None:
+            return "/chatbot"
+        return None
+
+    def run(self, stop_at):
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            failed_at = self.flow()
+            self.recorder.add(FLOW, time.perf_counter() - start, failed_at)
+
+
+def start_server(args):
+    """Importe l'application avec ses doubles et la sert sur un port libre ; retourne (serveur, url)."""
+    # Les uploads et résultats vont dans un répertoire temporaire
+    os.environ["JOB_WORKERS"] = str(args.job_workers)
+    os.environ["JOB_QUEUE_SIZE"] = str(args.queue_size)
+    os.environ.pop("SVD_WARMUP", None)
+    os.chdir(tempfile.mkdtemp(prefix="bench_load_"))
+
+    import app as web
+    from werkzeug.serving import make_server
+
+    # Les rejets et échecs attendus sont comptés dans le rapport, pas journalisés
+    level = logging.DEBUG if args.verbose else logging.CRITICAL
+    logging.getLogger().setLevel(level)
+    logging.getLogger("werkzeug").setLevel(level)
+    web._ad_generator = FakeGenerator(args.generation_latency, fail_rate=args.fail_rate)
+    web.process_image = fake_process_image(args.chat_latency)
+
+    server = make_server("127.0.0.1", 0, web.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_level(base_url, concurrency, args, image_bytes):
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.duration
+    users = [SimulatedUser(base_url, recorder, args.images, image_bytes, args.poll_interval, args.job_timeout)
+             for _ in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(user.run, stop_at) for user in users]:
+            future.result()
+    return recorder.summary(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY),
+                        help="nombres d'utilisateurs simultanés, un palier chacun")
+    parser.add_argument("--duration", type=float, default=20.0, help="durée de chaque palier (s)")
+    parser.add_argument("--images", type=int, default=3, help="images par upload")
+    parser.add_argument("--generation-latency", type=float, default=2.0, help="durée d'une génération simulée (s)")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="durée d'une réponse du chatbot (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="part des générations qui échouent")
+    parser.add_argument("--job-workers", type=int, default=int(os.environ.get("JOB_WORKERS", "1")))
+    parser.add_argument("--queue-size", type=int, default=int(os.environ.get("JOB_QUEUE_SIZE", "8")))
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="intervalle de suivi d'un job (s)")
+    parser.add_argument("--job-timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="écrit aussi les résultats dans ce fichier")
+    parser.add_argument("--verbose", action="store_true", help="affiche les journaux de l'application")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    server, base_url = start_server(args)
+    image_bytes = [synthetic_jpeg(i) for i in range(args.images)]
+    print(f"Application sur {base_url} : {args.job_workers} worker(s) de rendu, file de {args.queue_size} jobs")
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            summary = run_level(base_url, concurrency, args, image_bytes)
+            results.append({"concurrency": concurrency, "endpoints": summary})
+            print(f"\n== {concurrency} utilisateur(s) ==")
+            print(f"{'endpoint':20s} {'requêtes':>8s} {'req/s':>7s} {'erreurs':>8s} "
+                  + " ".join(f"{f'p{p} (ms)':>10s}" for p in PERCENTILES))
+            for name, stats in summary.items():
+                print(f"{name:20s} {stats['requests']:8d} {stats['per_s']:7.2f} {stats['error_rate']:8.1%} "
+                      + " ".join(f"{stats[f'p{p}_ms']:10.1f}" for p in PERCENTILES)
+                      + (f"  {stats['errors']}" if stats["errors"] else ""))
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
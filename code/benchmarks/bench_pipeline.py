@@ -0,0 +1,264 @@
+"""Benchmark de bout en bout de generate_ad, hors ligne, avec Gemini, gTTS et SVD simulés.
+
+Gemini est servi par benchmarks/gemini_stub.py, la synthèse vocale et le pipeline SVD
+par benchmarks/stubs.py : sorties déterministes, latences fixées, ni GPU ni réseau.
+Tout le reste (ingestion, déduplication, caches, timeline, interpolation, encodage
+FFmpeg) est le code réel. Pour chaque scénario (1, 5, 10 images) on mesure la latence
+de bout en bout, le débit des étapes (images/s ingérées, images/s animées, frames/s
+encodées), le détail des étapes, le pic RSS et les octets écrits sur disque.
+
+Les résultats sont comparés à une référence enregistrée sur la même machine
+(benchmarks/baseline_pipeline.json par défaut, non versionnée : à créer avec
+--save-baseline) ; le code de sortie vaut 1 si une métrique se dégrade au-delà de
+la tolérance, et un avertissement signale l'absence de référence.
+
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline_pipeline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline_pipeline.json --tolerance 0.1
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+DEFAULT_SCENARIOS = (1, 5, 10)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline_pipeline.json")
+DESCRIPTION = "Sac à dos de randonnée léger et imperméable, {} photos du produit sous tous les angles."
+# Étapes reportées dans le tableau (noms des spans de telemetry)
+STAGES = ("AdGenerator.plan_images", "AdGenerator.write_script", "AdGenerator.text_to_speech",
+          "AdGenerator.generate_clips", "AdGenerator.assemble_ad_video")
+# Métriques comparées à la référence : (clé, sens) ; +1 = plus grand est meilleur
+COMPARED = (("seconds", -1), ("ingest_images_per_s", +1), ("animate_images_per_s", +1),
+            ("encode_frames_per_s", +1), ("peak_rss_mb", -1), ("disk_bytes_written", -1))
+DISK_SAMPLE_INTERVAL = 0.05
+
+
+def synthetic_images(directory, count, size=(1600, 900)):
+    """Photos JPEG distinctes et reproductibles (dégradé + bruit tiré d'une graine par image)."""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    paths = []
+    for i in range(count):
+        rng = np.random.default_rng(1000 + i)
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[..., 0] = (x * 255 // width + i * 37) % 256
+        pixels[..., 1] = (y * 255 // height + i * 71) % 256
+        pixels[..., 2] = rng.integers(0, 256, (height // 30 + 1, width // 30 + 1)).repeat(30, 0).repeat(30, 1)[
+            :height, :width]
+        path = os.path.join(directory, f"photo_{i}.jpg")
+        Image.fromarray(pixels).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+class DiskSampler:
+    """Pic de la taille d'un répertoire (espaces de travail temporaires), échantillonné en continu."""
+
+    def __init__(self, path):
+        self.path = path
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        from workspace import directory_bytes
+
+        while not self._stop.is_set():
+            self.peak = max(self.peak, directory_bytes(self.path))
+            self._stop.wait(DISK_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def stage_seconds():
+    from telemetry import METRICS
+
+    return {dict(key)["stage"]: total
+            for key, (total, _) in METRICS.histogram_totals("stage_duration_seconds").items()}
+
+
+def run_child(images, args):
+    root = tempfile.mkdtemp(prefix=f"bench_pipeline_{images}_")
+    try:
+        from gemini_stub import GeminiStub
+
+        gemini = GeminiStub(latency=args.gemini_latency).start()
+        # Tout ce que le pipeline écrit (caches, espaces de travail, sortie) reste sous `root`
+        os.environ.update({
+            "GEMINI_API_KEY": "stub",
+            "GEMINI_API_URL": gemini.url,
+            "MOTION_ENGINE": "svd",
+            "RENDER_SHARDS": "",
+            "WORKSPACE_ROOT": os.path.join(root, "work"),
+        })
+        os.environ.pop("SVD_WARMUP", None)
+        os.makedirs(os.path.join(root, "work"))
+        os.makedirs(os.path.join(root, "images"))
+        os.makedirs(os.path.join(root, "output"))
+        os.chdir(root)
+        paths = synthetic_images(os.path.join(root, "images"), images)
+        inputs = sum(os.path.getsize(p) for p in paths)
+
+        from ingest import ImageIngestor, ImageStore
+        from stubs import install_stubs
+        from workspace import directory_bytes
+
+        # Ingestion seule, sur un magasin vide : le pipeline ci-dessous ingère à froid lui aussi
+        ingestor = ImageIngestor(store=ImageStore())
+        start = time.perf_counter()
+        ingestor.ingest(paths)
+        ingest_seconds = time.perf_counter() - start
+
+        from ad_generator import AdGenerator
+
+        generator = AdGenerator()
+        generator.output_dir = os.path.join(root, "output")
+        install_stubs(generator, step_latency=args.step_latency, decode_latency=args.decode_latency,
+                      tts_latency=args.tts_latency)
+
+        with DiskSampler(os.path.join(root, "work")) as scratch:
+            start = time.perf_counter()
+            result = generator.generate_ad(DESCRIPTION.format(images), "fr", paths,
+                                           output_path=os.path.join(root, "output", "ad.mp4"))
+            elapsed = time.perf_counter() - start
+        gemini.stop()
+
+        stages = stage_seconds()
+        frames = round(result["audio_duration"] * generator.output_fps)
+        encode = stages.get("AdGenerator.assemble_ad_video")
+        animate = stages.get("AdGenerator.generate_clips")
+        return {
+            "images": images,
+            "seconds": round(elapsed, 3),
+            "audio_duration": round(result["audio_duration"], 2),
+            "ingest_images_per_s": round(images / ingest_seconds, 1),
+            "animate_images_per_s": round(images / animate, 2) if animate else None,
+            "encode_frames_per_s": round(frames / encode, 1) if encode else None,
+            "frames_encoded": frames,
+            "stages": {name: round(stages[name], 3) for name in STAGES if name in stages},
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            # Sortie, caches et index : tout ce qui reste sur disque hors images d'entrée
+            "disk_bytes_written": directory_bytes(root) - inputs,
+            "peak_scratch_bytes": scratch.peak,
+            "output_bytes": os.path.getsize(result["video_path"]),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def measure(images, args):
+    runs = []
+    for _ in range(args.repeat):
+        # Un processus par mesure : pic RSS, caches et registre de métriques repartent de zéro
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(images),
+             "--step-latency", str(args.step_latency), "--decode-latency", str(args.decode_latency),
+             "--tts-latency", str(args.tts_latency), "--gemini-latency", str(args.gemini_latency)],
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+
+def compare(results, baseline, tolerance):
+    """Régressions de `results` par rapport à `baseline` au-delà de `tolerance` (fraction)."""
+    reference = {r["images"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        ref = reference.get(result["images"])
+        if ref is None:
+            continue
+        for key, direction in COMPARED:
+            new, old = result.get(key), ref.get(key)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if direction * change < -tolerance:
+                regressions.append(f"{result['images']} image(s) : {key} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", type=int, nargs="+", default=list(DEFAULT_SCENARIOS),
+                        help="nombres d'images à tester")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--step-latency", type=float, default=0.02, help="durée d'une étape de diffusion (s)")
+    parser.add_argument("--decode-latency", type=float, default=0.01, help="durée d'un lot de décodage VAE (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="durée de synthèse d'une phrase (s)")
+    parser.add_argument("--gemini-latency", type=float, default=0.2, help="durée d'un appel Gemini (s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="référence à comparer")
+    parser.add_argument("--save-baseline", help="enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="dégradation tolérée (fraction)")
+    parser.add_argument("--json", help="écrit aussi les résultats dans ce fichier")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args)))
+        return 0
+    if shutil.which("ffmpeg") is None:
+        print("[ERROR] ffmpeg introuvable dans le PATH : l'assemblage ne peut pas être mesuré.")
+        return 2
+
+    results = []
+    for images in args.scenarios:
+        best = measure(images, args)
+        results.append(best)
+        print(f"{images:3d} image(s) {best['seconds']:8.2f}s  ingestion {best['ingest_images_per_s']:6.1f} img/s  "
+              f"animation {best['animate_images_per_s']:5.2f} img/s  encodage {best['encode_frames_per_s']:6.1f} fps  "
+              f"rss {best['peak_rss_mb']:7.1f} Mo  disque {best['disk_bytes_written'] / 1e6:6.2f} Mo "
+              f"(travail {best['peak_scratch_bytes'] / 1e6:.2f} Mo)")
+        print("      " + "  ".join(f"{name.split('.')[-1]} {seconds:.2f}s" for name, seconds in best["stages"].items()))
+
+    report = {"created_at": time.time(), "settings": {
+        "step_latency": args.step_latency, "decode_latency": args.decode_latency,
+        "tts_latency": args.tts_latency, "gemini_latency": args.gemini_latency}, "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Référence enregistrée dans {args.save_baseline}")
+
+    baseline_path = args.baseline
+    if os.path.abspath(baseline_path) == os.path.abspath(args.save_baseline or ""):
+        return 0
+    if not os.path.exists(baseline_path):
+        # La référence dépend de la machine : elle n'est pas versionnée, chacun crée la sienne
+        print(f"[WARNING] Aucune référence dans {baseline_path} : résultats NON comparés.\n"
+              f"[WARNING] Pour en créer une sur cette machine (à partir d'une version saine) :\n"
+              f"[WARNING]     python benchmarks/bench_pipeline.py --save-baseline {baseline_path}")
+        return 2 if baseline_path != DEFAULT_BASELINE else 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("[WARNING] Latences simulées différentes de celles de la référence : comparaison indicative.")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"[RÉGRESSION] {regression}")
+    if not regressions:
+        print(f"Aucune régression au-delà de {args.tolerance:.0%} par rapport à {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
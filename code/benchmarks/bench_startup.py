@@ -0,0 +1,113 @@
+"""Benchmark du démarrage : temps d'import et mémoire résidente des points d'entrée.
+
+Chaque cible est importée dans un interpréteur neuf ; on mesure le temps d'import,
+la RSS obtenue et les modules lourds (torch, diffusers, MoviePy, OpenCV) qui ont été
+chargés au passage. Le front web (app) doit démarrer sans aucun d'eux et sous le
+budget donné ; le code de sortie vaut 1 sinon, pour servir de garde-fou en CI.
+
+    python benchmarks/bench_startup.py --budget 1.0
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+HEAVY_MODULES = ("torch", "diffusers", "moviepy", "cv2", "transformers")
+# (nom, instruction mesurée) ; "generator" inclut la construction d'un AdGenerator
+TARGETS = {
+    "app": "import app",
+    "chatbot": "import chatbot",
+    "ad_generator": "import ad_generator",
+    "generator": "import ad_generator; ad_generator.AdGenerator()",
+}
+# Cibles qui ne doivent charger aucun module lourd
+LIGHT_TARGETS = ("app", "chatbot", "ad_generator", "generator")
+
+
+def rss_bytes():
+    """RSS courante (Linux), sinon pic RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_child(target):
+    # Les pools de threads et la file de jobs ne doivent pas garder le processus en vie
+    os.environ.setdefault("JOB_WORKERS", "0")
+    os.chdir(CODE_DIR)
+    before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        exec(TARGETS[target], {})
+        error = None
+    except ImportError as e:
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    return {
+        "target": target,
+        "seconds": round(elapsed, 3),
+        "rss_mb": round(rss_bytes() / 1024 ** 2, 1),
+        "rss_added_mb": round((rss_bytes() - before) / 1024 ** 2, 1),
+        "heavy_modules": sorted({name.split(".")[0] for name in sys.modules} & set(HEAVY_MODULES)),
+        "error": error,
+    }
+
+
+def measure(target, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, __file__, "--child", target],
+                             check=True, stdout=subprocess.PIPE, text=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="temps d'import maximal de app (s)")
+    parser.add_argument("--json", help="écrit aussi les résultats dans ce fichier")
+    parser.add_argument("--child", choices=list(TARGETS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child)))
+        return 0
+
+    failures = []
+    results = []
+    for target in args.targets:
+        best = measure(target, args.repeat)
+        results.append(best)
+        if best["error"]:
+            print(f"{target:13s} non mesurable ici ({best['error']})")
+            continue
+        print(f"{target:13s} {best['seconds']:7.3f}s  rss {best['rss_mb']:7.1f} Mo "
+              f"(+{best['rss_added_mb']:.1f})  lourds : {', '.join(best['heavy_modules']) or 'aucun'}")
+        if target in LIGHT_TARGETS and best["heavy_modules"]:
+            failures.append(f"{target} importe {', '.join(best['heavy_modules'])}")
+        if target == "app" and best["seconds"] > args.budget:
+            failures.append(f"app démarre en {best['seconds']:.2f}s (budget {args.budget:.2f}s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"[ÉCHEC] {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
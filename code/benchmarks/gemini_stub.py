@@ -0,0 +1,107 @@
+"""Serveur HTTP local imitant l'endpoint generateContent de Gemini, pour tester le client.
+
+La réponse est déterministe (dérivée du prompt), avec une latence et des échecs
+configurables. Utilisable en ligne de commande ou depuis un script :
+
+    python benchmarks/gemini_stub.py --port 8765 --latency 0.2 --fail-every 3
+    GEMINI_API_URL=http://127.0.0.1:8765/generate GEMINI_API_KEY=stub python app.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("découvrez", "notre", "nouveau", "produit", "unique", "qualité", "style", "confort",
+         "idéal", "pour", "vous", "aujourd'hui", "offre", "exclusive", "élégant", "pratique")
+
+
+def scripted_reply(prompt, words=40):
+    """Texte pseudo-publicitaire stable pour un prompt donné."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return " ".join(WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(words)).capitalize() + "."
+
+
+class GeminiStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, fail_every=0, fail_status=503, host="127.0.0.1"):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/generate"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme l'API réelle
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server._lock:
+            self.server.requests += 1
+            count = self.server.requests
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.fail_every and count % self.server.fail_every == 0:
+            self._reply(self.server.fail_status, {"error": {"message": "stub failure"}})
+            return
+        try:
+            prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            self._reply(400, {"error": {"message": "bad request"}})
+            return
+        self._reply(200, {"candidates": [{"content": {"parts": [{"text": scripted_reply(prompt)}]}}]})
+
+    def _reply(self, status, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="délai par requête (s)")
+    parser.add_argument("--fail-every", type=int, default=0, help="échoue une requête sur N (0 = jamais)")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = GeminiStub(args.port, args.latency, args.fail_every, args.fail_status)
+    print(f"Stub Gemini sur {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Remplaçants déterministes des moteurs coûteux : synthèse vocale et pipeline SVD.
+
+Avec benchmarks/gemini_stub.py, ils permettent d'exécuter tout le pipeline de
+generate_ad sur une machine sans GPU ni réseau : les sorties ne dépendent que des
+entrées, et les latences sont fixées par les paramètres.
+
+    generator = AdGenerator()
+    install_stubs(generator, step_latency=0.02, tts_root="cache/tts")
+"""
+import hashlib
+import math
+import os
+import sys
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_plan import plan_memory
+from model_manager import ModelManager
+from tts import Narrator, PhraseCache, TTSBackend
+
+SAMPLE_RATE = 16000
+SECONDS_PER_WORD = 0.35
+
+
+class StubTTSBackend(TTSBackend):
+    """Écrit un WAV mono de ~0,35 s par mot (tonalité dérivée du texte), avec une latence fixe."""
+
+    name = "stub"
+    ext = "wav"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def synthesize(self, text, langue, path):
+        if self.latency:
+            time.sleep(self.latency)
+        frequency = 200 + hashlib.sha256(text.encode("utf-8")).digest()[0] * 2
+        samples = int(max(len(text.split()), 1) * SECONDS_PER_WORD * SAMPLE_RATE)
+        t = np.arange(samples) / SAMPLE_RATE
+        pcm = (np.sin(2 * math.pi * frequency * t) * 8000).astype("<i2")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            out.writeframes(pcm.tobytes())
+
+
+class StubPipeline:
+    """Imite StableVideoDiffusionPipeline.__call__ : une pause par étape, puis des frames synthétiques.
+
+    Les frames sont l'image d'entrée redimensionnée puis décalée de quelques pixels à
+    chaque frame : même entrée, mêmes frames, et un contenu qui bouge pour l'encodeur.
+    """
+
+    def __init__(self, step_latency=0.0, decode_latency=0.0):
+        self.step_latency = step_latency
+        self.decode_latency = decode_latency
+        self.calls = 0
+
+    def __call__(self, image, height=576, width=1024, num_frames=14, num_inference_steps=25,
+                 decode_chunk_size=8, generator=None, callback_on_step_end=None):
+        self.calls += 1
+        for step in range(num_inference_steps):
+            if self.step_latency:
+                time.sleep(self.step_latency)
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, step, num_inference_steps - step, {})
+        if self.decode_latency:
+            time.sleep(self.decode_latency * num_frames / max(decode_chunk_size, 1))
+        base = np.asarray(image.convert("RGB").resize((width, height)))
+        frames = [Image.fromarray(np.roll(base, 6 * f, axis=1)) for f in range(num_frames)]
+        return SimpleNamespace(frames=[frames])
+
+
+class StubModelManager(ModelManager):
+    """ModelManager dont le « modèle » est un StubPipeline : ni torch, ni diffusers, ni GPU."""
+
+    def __init__(self, step_latency=0.0, decode_latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.stub = StubPipeline(step_latency, decode_latency)
+
+    @property
+    def device(self):
+        return "cpu"
+
+    def _load(self):
+        if self.plan is None:
+            self.plan = plan_memory(self.device)
+        self._pipe = self.stub
+        self.load_count += 1
+        self.last_load_seconds = 0.0
+        self._last_used = time.monotonic()
+        return self._pipe
+
+    def seeded_generator(self, seed):
+        return seed
+
+
+def install_stubs(generator, step_latency=0.0, decode_latency=0.0, tts_latency=0.0, tts_root=None):
+    """Branche les remplaçants sur un AdGenerator : SVD simulé et narration synthétique.
+
+    Gemini n'est pas concerné : pointer GEMINI_API_URL vers un GeminiStub avant
+    d'importer ad_generator.
+    """
+    manager = StubModelManager(step_latency, decode_latency)
+    generator.model_manager = manager
+    for engine in generator.motion_engines.values():
+        if hasattr(engine, "model_manager"):
+            engine.model_manager = manager
+    generator.narrator = Narrator(backend=StubTTSBackend(tts_latency), cache=PhraseCache(root=tts_root))
+    return generator
@@ -1,7 +1,6 @@
 import base64 #encode l'image en base64 pour transmission via l'API.
 import requests #envoie des requêtes HTTP à l'API
-import io #gère des flux en mémoire (pour lire l'image depuis un buffer)
-from PIL import Image #Ouvre et vérifie la validité de l'image.
+from ingest import shared_ingestor #images déjà décodées et validées à l'upload
 from dotenv import load_dotenv # charge des variables d'environnement depuis un fichier .env
 import os
 import logging #affiche des logs (informations, erreurs, etc.).
@@ -35,17 +34,16 @@ def process_image(image_path, query):
     
     #Read and encode the image
     try:
-        with open(image_path, "rb") as image_file:
-            image_content = image_file.read()
-            encoded_image = base64.b64encode(image_content).decode("utf-8")
-        
-        # Verify image is valid
+        # The image was decoded and validated when it was uploaded: no second decode here.
+        # The original bytes are sent, so the analysis sees full resolution
         try:  
-            img = Image.open(io.BytesIO(image_content))
-            img.verify()
-        except Exception as e:
+            shared_ingestor().get(image_path)
+        except (OSError, ValueError) as e:
             logger.error(f"Invalid image format: {str(e)}")
             return {"error": f"Invalid image format: {str(e)}"} 
+        with open(image_path, "rb") as image_file:
+            encoded_image = base64.b64encode(image_file.read()).decode("utf-8")
+        mime_type = "image/png" if image_path.lower().endswith(".png") else "image/jpeg"
         
         # Create message structure for API with:
         # - text query
@@ -55,7 +53,7 @@ def process_image(image_path, query):
                 "role": "user",
                 "content": [
                     {"type": "text", "text": query},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}}
+                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_image}"}}
                 ]
             }
         ]
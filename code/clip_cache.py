@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "clips")
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+# Un fichier temporaire plus vieux que ça provient d'un worker mort en cours d'écriture
+STALE_TMP_SECONDS = 3600
+
+
+class ClipCache:
+    """Cache disque des frames générées par SVD, adressé par contenu.
+
+    La clé est un hash des pixels décodés et redimensionnés de l'image source et
+    des paramètres de génération : deux uploads du même visuel (même sous un autre
+    nom de fichier) partagent la même entrée. Les écritures passent par un fichier
+    temporaire renommé atomiquement, donc un lecteur concurrent ne voit jamais une
+    entrée partielle. La taille totale est bornée par une éviction LRU (mtime).
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or os.getenv("CLIP_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("CLIP_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(image, **params):
+        """Clé de cache : SHA-256 des pixels RGB de `image` (PIL ou ndarray) et des paramètres."""
+        pixels = np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+        digest = hashlib.sha256()
+        digest.update(repr(pixels.shape).encode())
+        digest.update(pixels.tobytes())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def __contains__(self, key):
+        return self.enabled and os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Retourne les frames (ndarray N×H×W×3) ou None si absentes."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            frames = np.load(path)
+            # Marquer l'entrée comme récemment utilisée pour l'éviction LRU
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        print(f"[INFO] Clip trouvé dans le cache ({key[:12]}…).")
+        return frames
+
+    def put(self, key, frames):
+        """Enregistre les frames de façon atomique puis applique la limite de taille."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), f".{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(frames, dtype=np.uint8))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARNING] Écriture du cache de clips impossible : {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self.writes += 1
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - st.st_mtime > STALE_TMP_SECONDS:
+                        self._remove(path)
+                    continue
+                if name.endswith(".npy"):
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            # Déjà supprimée par un autre worker
+            return False
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                with self._lock:
+                    self.evictions += 1
+            total -= size
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+# Distance de Hamming maximale (sur 64 bits) pour considérer deux images comme quasi identiques
+DEFAULT_THRESHOLD = 6
+HASH_SIZE = 8
+
+
+def _block_means(gray, rows, cols):
+    """Moyenne de `gray` sur une grille rows×cols de blocs (presque) égaux, sans boucle Python."""
+    height, width = gray.shape
+    row_starts = (np.arange(rows) * height) // rows
+    col_starts = (np.arange(cols) * width) // cols
+    sums = np.add.reduceat(np.add.reduceat(gray, row_starts, axis=0), col_starts, axis=1)
+    counts = np.outer(np.diff(np.append(row_starts, height)), np.diff(np.append(col_starts, width)))
+    return sums / counts
+
+
+def dhash(pixels, size=HASH_SIZE):
+    """Hash de différence (dHash) d'une image RGB uint8 : entier de size² bits.
+
+    L'image est réduite en niveaux de gris sur une grille size×(size+1) ; chaque bit
+    indique si un bloc est plus lumineux que son voisin de droite. Recadrage léger,
+    recompression ou retouche de couleur ne changent que quelques bits.
+    """
+    gray = np.asarray(pixels, dtype=np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    blocks = _block_means(gray, size, size + 1)
+    bits = (blocks[:, 1:] > blocks[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_matrix(hashes):
+    """Distances de Hamming entre tous les hashes (matrice n×n), calculées d'un bloc."""
+    as_bytes = np.array([h.to_bytes(HASH_SIZE * HASH_SIZE // 8, "big") for h in hashes], dtype="S8")
+    bits = np.unpackbits(np.frombuffer(as_bytes.tobytes(), dtype=np.uint8).reshape(len(hashes), -1), axis=1)
+    return (bits[:, None, :] != bits[None, :, :]).sum(axis=2)
+
+
+class DedupPlan:
+    """Regroupement des images d'une génération autour de représentants.
+
+    `representative[i]` est l'indice de l'image dont le clip sert à l'image i (i
+    lui-même pour un représentant) ; `offset[i]` est la fraction du clip à partir de
+    laquelle le rejouer, pour que deux plans identiques ne soient pas synchrones.
+    """
+
+    def __init__(self, hashes, representative, threshold):
+        self.hashes = hashes
+        self.representative = representative
+        self.threshold = threshold
+        self.offset = [0.0] * len(representative)
+        members = {}
+        for i, rep in enumerate(representative):
+            members.setdefault(rep, []).append(i)
+        for group in members.values():
+            for rank, i in enumerate(group):
+                self.offset[i] = rank / len(group)
+        self.groups = list(members.values())
+
+    @property
+    def saved(self):
+        """Nombre d'animations (diffusions SVD) évitées."""
+        return len(self.representative) - len(self.groups)
+
+    def report(self):
+        return {
+            "images": len(self.representative),
+            "groups": [group for group in self.groups if len(group) > 1],
+            "runs": len(self.groups),
+            "runs_saved": self.saved,
+            "threshold": self.threshold,
+        }
+
+
+def plan_dedup(images, threshold=None):
+    """Regroupe les images (tableaux RGB) dont les dHash diffèrent d'au plus `threshold` bits.
+
+    Chaque image rejoint le groupe du représentant le plus proche sous le seuil, sinon
+    en devient un ; un seuil négatif désactive la déduplication.
+    """
+    if threshold is None:
+        threshold = int(os.getenv("DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+    hashes = [dhash(pixels) for pixels in images]
+    representative = list(range(len(hashes)))
+    if threshold >= 0 and len(hashes) > 1:
+        distances = hamming_matrix(hashes)
+        reps = []
+        for i in range(len(hashes)):
+            close = [r for r in reps if distances[i, r] <= threshold]
+            if close:
+                representative[i] = min(close, key=lambda r: distances[i, r])
+            else:
+                reps.append(i)
+    return DedupPlan(hashes, representative, threshold)
+
+
+class OffsetClip:
+    """Clip existant rejoué à partir d'une autre frame (rotation), sans copie des frames."""
+
+    def __init__(self, frames, offset):
+        self.frames = frames
+        self.start = int(round(offset * len(frames))) % max(len(frames), 1)
+
+    @property
+    def shape(self):
+        return self.frames.shape
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        return self.frames[(n + self.start) % len(self.frames)]
+
+    def __array__(self, dtype=None):
+        frames = self.frames.to_array() if hasattr(self.frames, "to_array") else np.asarray(self.frames)
+        frames = np.roll(frames, -self.start, axis=0)
+        return frames if dtype is None else frames.astype(dtype)
@@ -0,0 +1,121 @@
+import subprocess
+import tempfile
+
+import numpy as np
+
+
+class StreamingEncoder:
+    """Encode des frames RGB envoyées en mémoire vers un seul processus FFmpeg.
+
+    Les frames sont écrites une par une sur l'entrée standard de FFmpeg (rawvideo),
+    la narration est lue en parallèle et le fichier final est produit en un seul
+    encodage : pas de clip intermédiaire par image, pas de vidéo muette à remuxer.
+    La mémoire utilisée ne dépend pas de la durée de la vidéo.
+
+        with StreamingEncoder("out.mp4", 1024, 576, 24, audio_path="narration.mp3") as enc:
+            for frame in frames:
+                enc.write(frame)
+    """
+
+    def __init__(self, output_path, width, height, fps, audio_path=None, preset="medium",
+                 crf=None, threads=4, audio_bitrate="192k", duration=None):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = audio_path
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.audio_bitrate = audio_bitrate
+        # Durée prévue de la vidéo : une narration plus courte est complétée par du silence
+        self.duration = duration
+        self.frames_written = 0
+        self._proc = None
+        self._stderr = None
+
+    def command(self):
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-s", f"{self.width}x{self.height}",
+            "-r", str(self.fps),
+            "-i", "-",
+        ]
+        if self.audio_path:
+            cmd += ["-i", self.audio_path]
+        cmd += ["-map", "0:v"]
+        if self.audio_path:
+            cmd += ["-map", "1:a"]
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", self.preset,
+            "-pix_fmt", "yuv420p",
+            "-threads", str(self.threads),
+        ]
+        if self.crf is not None:
+            cmd += ["-crf", str(self.crf)]
+        if self.audio_path:
+            cmd += ["-c:a", "aac", "-b:a", self.audio_bitrate]
+            if self.duration is not None:
+                # Une frame de marge : -shortest s'arrête à la fin de l'audio
+                cmd += ["-af", f"apad=whole_dur={self.duration + 1 / self.fps:.3f}"]
+            cmd += ["-shortest"]
+        cmd += ["-movflags", "+faststart", self.output_path]
+        return cmd
+
+    def open(self):
+        cmd = self.command()
+        print(f"[DEBUG] Commande FFmpeg (flux) : {' '.join(cmd)}")
+        # stderr vers un fichier : un pipe non lu pourrait bloquer FFmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                      stderr=self._stderr)
+        return self
+
+    def write(self, frame):
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape != (self.height, self.width, 3):
+            raise ValueError(f"Frame de taille {frame.shape}, attendu {(self.height, self.width, 3)}")
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+        except BrokenPipeError:
+            # FFmpeg s'est arrêté : close() remontera son message d'erreur
+            self.close()
+            raise
+        self.frames_written += 1
+
+    def close(self):
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = proc.wait()
+        self._stderr.seek(0)
+        errors = self._stderr.read().decode(errors="replace")
+        self._stderr.close()
+        if returncode != 0:
+            print("[ERROR] FFmpeg a échoué :")
+            print(errors)
+            raise RuntimeError("FFmpeg n'a pas pu encoder la vidéo.")
+
+    def abort(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+            self._stderr.close()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = (
+    "https://generativelanguage.googleapis.com/v1beta/models/"
+    "gemini-2.0-flash:generateContent"
+)
+# Codes HTTP transitoires : on réessaie ; les autres erreurs (400, 401, 403…) échouent tout de suite
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class GeminiError(Exception):
+    """Échec d'un appel Gemini (réseau, HTTP ou réponse illisible) après les réessais."""
+
+
+class CircuitOpenError(GeminiError):
+    """Le disjoncteur est ouvert : l'appel n'est même pas tenté."""
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après `ttl` secondes."""
+
+    def __init__(self, max_entries=256, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CircuitBreaker:
+    """Disjoncteur : après `threshold` échecs transitoires consécutifs, les appels sont
+    refusés pendant `reset_timeout` secondes, puis un seul appel d'essai est autorisé."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """Client Gemini partagé : connexions HTTP persistantes, délais, réessais et cache.
+
+    Une seule `requests.Session` (pool keep-alive) sert tous les appels, ce qui évite
+    une poignée de main TLS par requête. Les erreurs transitoires sont réessayées avec
+    un backoff exponentiel ; après trop d'échecs transitoires consécutifs (réseau, 429,
+5xx) le disjoncteur s'ouvre et
+    les appels échouent immédiatement (CircuitOpenError), ce qui laisse l'appelant
+    basculer sans attendre sur son repli. Les réponses sont mises en cache par
+    (gabarit de prompt, texte d'entrée, paramètres de génération).
+
+    `api_url` pointe par défaut sur l'API Google ; GEMINI_API_URL permet de viser un
+    serveur local (voir benchmarks/gemini_stub.py).
+    """
+
+    def __init__(self, api_key=None, api_url=None, connect_timeout=None, read_timeout=None,
+                 retries=None, backoff=None, breaker_threshold=None, breaker_reset=None,
+                 cache_size=None, cache_ttl=None, pool_size=None):
+        env = os.getenv
+        self.api_key = api_key if api_key is not None else env("GEMINI_API_KEY")
+        self.api_url = api_url or env("GEMINI_API_URL", DEFAULT_API_URL)
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else float(env("GEMINI_CONNECT_TIMEOUT", 5)),
+            read_timeout if read_timeout is not None else float(env("GEMINI_READ_TIMEOUT", 30)),
+        )
+        self.retries = retries if retries is not None else int(env("GEMINI_RETRIES", 3))
+        self.backoff = backoff if backoff is not None else float(env("GEMINI_BACKOFF", 0.5))
+        self.breaker = CircuitBreaker(
+            breaker_threshold if breaker_threshold is not None else int(env("GEMINI_BREAKER_THRESHOLD", 5)),
+            breaker_reset if breaker_reset is not None else float(env("GEMINI_BREAKER_RESET", 30)),
+        )
+        self.cache = TTLCache(
+            cache_size if cache_size is not None else int(env("GEMINI_CACHE_SIZE", 256)),
+            cache_ttl if cache_ttl is not None else float(env("GEMINI_CACHE_TTL", 3600)),
+        )
+        pool_size = pool_size or int(env("GEMINI_POOL_SIZE", 8))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="gemini")
+
+        self._lock = threading.Lock()
+        # `calls` compte les tentatives HTTP (réessais compris), `successes` les requêtes abouties
+        self.calls = 0
+        self.successes = 0
+        self.cache_hits = 0
+        self.retried = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @staticmethod
+    def cache_key(template, text, **params):
+        payload = json.dumps([template, text, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generate(self, template, text, max_output_tokens=200):
+        """Texte généré pour `template.format(text)`. Lève GeminiError en cas d'échec."""
+        key = self.cache_key(template, text, max_output_tokens=max_output_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return cached
+
+        result = self._post(template.format(text), max_output_tokens)
+        self.cache.put(key, result)
+        return result
+
+    async def agenerate(self, template, text, max_output_tokens=200):
+        """Version asyncio de generate(), exécutée sur le pool du client."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate, template, text, max_output_tokens)
+
+    async def agenerate_many(self, requests_, max_output_tokens=200, return_exceptions=True):
+        """Lance en parallèle une liste de (gabarit, texte) ; les erreurs sont retournées
+        à leur place dans la liste plutôt que levées (sauf `return_exceptions=False`)."""
+        return await asyncio.gather(
+            *(self.agenerate(template, text, max_output_tokens) for template, text in requests_),
+            return_exceptions=return_exceptions,
+        )
+
+    def generate_many(self, requests_, max_output_tokens=200):
+        """Équivalent synchrone d'agenerate_many, pour le code qui n'a pas de boucle asyncio."""
+        return asyncio.run(self.agenerate_many(requests_, max_output_tokens))
+
+    def _post(self, prompt, max_output_tokens):
+        if not self.api_key:
+            raise GeminiError("Clé API Gemini non configurée. Définissez GEMINI_API_KEY dans le fichier .env")
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("Disjoncteur Gemini ouvert : trop d'échecs récents")
+
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"maxOutputTokens": max_output_tokens}
+        }
+        last_error = None
+        transient = True
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self._delay(attempt, last_error))
+            with self._lock:
+                self.calls += 1
+            try:
+                resp = self.session.post(self.api_url, params={"key": self.api_key}, json=payload,
+                                         timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                continue
+            if resp.status_code in RETRY_STATUSES:
+                last_error = resp
+                continue
+            try:
+                resp.raise_for_status()
+                result = self._parse(resp.json())
+            except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+                # Erreur non transitoire : inutile de réessayer
+                last_error = e
+                transient = False
+                break
+            self.breaker.success()
+            with self._lock:
+                self.successes += 1
+            return result
+
+        if transient:
+            self.breaker.failure()
+        else:
+            # Le service a répondu : une requête refusée (400, blocage de sécurité…) ne dit rien
+            # de sa disponibilité et ne doit pas bloquer les autres utilisateurs
+            self.breaker.success()
+        with self._lock:
+            self.failures += 1
+        if isinstance(last_error, requests.Response):
+            raise GeminiError(f"HTTP {last_error.status_code} après {self.retries + 1} tentatives")
+        raise GeminiError(str(last_error)) from last_error
+
+    def _delay(self, attempt, last_error):
+        """Backoff exponentiel avec gigue ; un Retry-After du serveur est respecté."""
+        retry_after = None
+        if isinstance(last_error, requests.Response):
+            retry_after = last_error.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.timeout[1])
+            except ValueError:
+                pass
+        return self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _parse(data):
+        cb = data["candidates"][0]["content"]
+        if isinstance(cb, dict) and "parts" in cb:
+            return "".join(p.get("text", "") for p in cb["parts"]).strip()
+        return str(cb).strip()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "successes": self.successes,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self.cache),
+                "retried": self.retried,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "breaker": self.breaker.state,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """Client unique du processus (pool de connexions et cache communs à tous les appelants)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = GeminiClient()
+        return _shared
@@ -0,0 +1,141 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Format attendu par SVD et par tous les moteurs d'animation
+TARGET_SIZE = (1024, 576)
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+DEFAULT_WORKERS = 4
+# Au-delà, l'image est refusée avant décodage (une image PNG ne peut pas être décodée en réduction)
+DEFAULT_MAX_PIXELS = 64 * 1000 ** 2
+
+# Résultat de l'ingestion d'un fichier : tout ce dont les étapes suivantes ont besoin
+IngestedImage = namedtuple("IngestedImage", "path sha256 pixels original_size")
+
+
+def decode(data, size=TARGET_SIZE):
+    """Décode une image en tableau RGB uint8 de taille `size`.
+
+    Pour un JPEG, le mode draft demande au décodeur une réduction DCT (1/2, 1/4, 1/8)
+    qui reste au-dessus de la taille cible : une photo de 12 Mpx n'est jamais
+    décompressée en pleine résolution, ce qui divise temps et mémoire de décodage.
+    Retourne aussi la taille d'origine.
+    """
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    max_pixels = int(os.getenv("INGEST_MAX_PIXELS", DEFAULT_MAX_PIXELS))
+    if original_size[0] * original_size[1] > max_pixels:
+        raise ValueError(f"Image trop grande : {original_size[0]}x{original_size[1]} pixels")
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    pixels = np.asarray(image.resize(size))
+    return pixels, original_size
+
+
+class ImageStore:
+    """Images déjà ingérées, en mémoire, indexées par chemin de fichier.
+
+    La mémoire occupée par les pixels est bornée par `max_bytes` ; au-delà, les
+    entrées les moins récemment utilisées sont oubliées et seront simplement
+    redécodées à la demande.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv("INGEST_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(entry):
+        return entry.pixels.nbytes
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(os.path.abspath(path))
+            self.hits += 1
+            return entry
+
+    def put(self, entry):
+        if self._size(entry) > self.max_bytes:
+            return
+        key = os.path.abspath(entry.path)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(previous)
+            self._entries[key] = entry
+            self._bytes += self._size(entry)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+class ImageIngestor:
+    """Étape d'ingestion : décode, normalise et hache les images en parallèle.
+
+    Chaque fichier est lu une seule fois ; le hash porte sur ses octets et les pixels
+    sont au format 1024x576. Le nombre de décodages
+    simultanés est borné par `workers`, ce qui borne aussi la mémoire de pointe.
+    """
+
+    def __init__(self, store=None, workers=None):
+        self.store = store or ImageStore()
+        self.workers = workers or int(os.getenv("INGEST_WORKERS", DEFAULT_WORKERS))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+
+    def process(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        pixels, original_size = decode(data)
+        entry = IngestedImage(path, hashlib.sha256(data).hexdigest(), pixels, original_size)
+        self.store.put(entry)
+        return entry
+
+    def get(self, path):
+        """Image ingérée (depuis le magasin, sinon ingérée maintenant)."""
+        return self.store.get(path) or self.process(path)
+
+    def ingest(self, paths):
+        """Ingère les fichiers en parallèle ; retourne les entrées dans l'ordre de `paths`."""
+        return list(self._pool.map(self.get, paths))
+
+    def submit(self, paths):
+        """Lance l'ingestion en arrière-plan et retourne aussitôt (futures)."""
+        return [self._pool.submit(self.get, path) for path in paths]
+
+    def load(self, path):
+        """Image PIL 1024x576 prête pour la diffusion."""
+        return Image.fromarray(self.get(path).pixels)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_ingestor():
+    """Ingesteur unique du processus : l'upload, le générateur et le chatbot partagent son magasin."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ImageIngestor()
+        return _shared
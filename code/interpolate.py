@@ -0,0 +1,144 @@
+import numpy as np
+
+NONE = "none"
+LINEAR = "linear"
+FLOW = "flow"
+MODES = (NONE, LINEAR, FLOW)
+
+# Les flux optiques sont calculés à cette échelle puis agrandis (coût ÷ 4 en surface)
+FLOW_SCALE = 0.5
+
+_cv2 = False
+
+
+def opencv():
+    """Module cv2, importé au premier besoin (None si OpenCV est absent).
+
+    OpenCV est optionnel et lourd à importer : seul le mode "flow" en a besoin.
+    """
+    global _cv2
+    if _cv2 is False:
+        try:
+            import cv2
+        except ImportError:
+            cv2 = None
+        _cv2 = cv2
+    return _cv2
+
+
+def _positions(n_frames, src_fps, dst_fps):
+    """Positions (fractionnaires) dans le clip source de chaque frame de sortie."""
+    if n_frames < 2:
+        return np.zeros(n_frames, dtype=np.float64)
+    n_out = int(np.floor((n_frames - 1) * dst_fps / src_fps + 1e-9)) + 1
+    return np.minimum(np.arange(n_out) * (src_fps / dst_fps), n_frames - 1)
+
+
+def blend_frames(a, b, weights):
+    """Mélange a et b (uint8) avec des poids dans [0, 1], en arithmétique entière 8 bits."""
+    w = np.round(np.asarray(weights) * 256).astype(np.uint16)
+    w = w.reshape(w.shape + (1,) * (a.ndim - w.ndim))
+    out = a.astype(np.uint16) * (256 - w) + b.astype(np.uint16) * w + 128
+    return (out >> 8).astype(np.uint8)
+
+
+class InterpolatedClip:
+    """Clip rééchantillonné de src_fps à dst_fps, calculé à la demande.
+
+    Se comporte comme une séquence de frames (len() et indexation), ce qui permet à
+    la timeline de l'utiliser sans matérialiser toutes les frames intermédiaires.
+    """
+
+    def __init__(self, frames, src_fps, dst_fps, mode=LINEAR):
+        if mode not in MODES:
+            raise ValueError(f"Mode d'interpolation inconnu : {mode} (attendu : {', '.join(MODES)})")
+        if mode == FLOW and opencv() is None:
+            print("[WARNING] OpenCV absent, interpolation par flux optique remplacée par un fondu linéaire.")
+            mode = LINEAR
+        self.frames = np.asarray(frames)
+        self.src_fps = src_fps
+        self.dst_fps = dst_fps
+        self.mode = mode
+        self.positions = _positions(len(self.frames), src_fps, dst_fps)
+        self._flows = {}
+
+    @property
+    def shape(self):
+        return (len(self),) + self.frames.shape[1:]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, n):
+        position = self.positions[n]
+        i = int(position)
+        weight = position - i
+        if weight < 1e-6 or i + 1 >= len(self.frames):
+            return self.frames[i]
+        if self.mode == FLOW:
+            return self._flow_frame(i, weight)
+        return blend_frames(self.frames[i], self.frames[i + 1], weight)
+
+    def to_array(self):
+        """Toutes les frames de sortie (N×H×W×3), écrites une à une dans un tableau alloué d'avance.
+
+        Le fondu linéaire réutilise deux tampons 16 bits d'une frame (opérations `out=`) :
+        aucun temporaire n'est alloué par frame, contrairement à l'indexation par paquets.
+        """
+        out = np.empty(self.shape, dtype=np.uint8)
+        if self.mode == FLOW:
+            for n in range(len(self)):
+                out[n] = self[n]
+            return out
+        acc = np.empty(self.frames.shape[1:], dtype=np.uint16)
+        tmp = np.empty_like(acc)
+        for n, position in enumerate(self.positions):
+            i = int(position)
+            weight = position - i
+            if weight < 1e-6 or i + 1 >= len(self.frames):
+                out[n] = self.frames[i]
+                continue
+            # Même arithmétique que blend_frames : (a * (256 - w) + b * w + 128) >> 8
+            w = np.uint16(round(weight * 256))
+            np.multiply(self.frames[i], np.uint16(256) - w, out=acc)
+            np.multiply(self.frames[i + 1], w, out=tmp)
+            np.add(acc, tmp, out=acc)
+            np.add(acc, np.uint16(128), out=acc)
+            np.right_shift(acc, 8, out=acc)
+            out[n] = acc
+        return out
+
+    def _flow(self, i):
+        """Flux optique (Farneback) de la frame i vers i+1, à échelle réduite, mis en cache."""
+        flow = self._flows.get(i)
+        if flow is None:
+            cv2 = opencv()
+            a = cv2.cvtColor(self.frames[i], cv2.COLOR_RGB2GRAY)
+            b = cv2.cvtColor(self.frames[i + 1], cv2.COLOR_RGB2GRAY)
+            a = cv2.resize(a, None, fx=FLOW_SCALE, fy=FLOW_SCALE, interpolation=cv2.INTER_AREA)
+            b = cv2.resize(b, None, fx=FLOW_SCALE, fy=FLOW_SCALE, interpolation=cv2.INTER_AREA)
+            flow = cv2.calcOpticalFlowFarneback(a, b, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            self._flows[i] = flow
+        return flow
+
+    def _flow_frame(self, i, weight):
+        cv2 = opencv()
+        height, width = self.frames.shape[1:3]
+        flow = cv2.resize(self._flow(i), (width, height)) / FLOW_SCALE
+        grid_y, grid_x = np.mgrid[0:height, 0:width].astype(np.float32)
+        # cv2.remap n'accepte que des cartes float32 : un poids float64 les promouvrait (NumPy 2)
+        weight = np.float32(weight)
+        # Chaque frame source est déplacée vers l'instant intermédiaire puis les deux sont fondues
+        prev = cv2.remap(self.frames[i], grid_x - weight * flow[..., 0], grid_y - weight * flow[..., 1],
+                         cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        nxt = cv2.remap(self.frames[i + 1], grid_x + (1 - weight) * flow[..., 0],
+                        grid_y + (1 - weight) * flow[..., 1], cv2.INTER_LINEAR,
+                        borderMode=cv2.BORDER_REPLICATE)
+        return blend_frames(prev, nxt, weight)
+
+
+def interpolate_frames(frames, src_fps, dst_fps, mode=LINEAR):
+    """Rééchantillonne un clip vers dst_fps. Retourne le clip tel quel en mode "none"."""
+    if mode == NONE or dst_fps <= src_fps:
+        return frames
+    return InterpolatedClip(frames, src_fps, dst_fps, mode)
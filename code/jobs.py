@@ -0,0 +1,357 @@
+"""Background job queue for video generation.
+
+Jobs are accepted immediately and executed by a pool of workers so that a
+render never ties up a Flask request. Two storage backends are available:
+
+- ``memory``: in-process queue drained by worker threads (default).
+- ``sqlite``: jobs persisted in a SQLite file, which can also be drained by
+  separate worker processes (``python jobs.py worker --db jobs.db``).
+
+Configuration comes from the environment: JOB_BACKEND, JOB_WORKERS,
+JOB_QUEUE_SIZE and JOB_DB_PATH.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from telemetry import METRICS, trace_job
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Lower value = picked first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+class QueueFullError(Exception):
+    """Raised when the queue has reached its capacity (backpressure)."""
+
+
+def _new_job(params, priority):
+    return {
+        'id': str(uuid.uuid4()),
+        'status': QUEUED,
+        'params': params,
+        'priority': priority,
+        'result': None,
+        'error': None,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+    }
+
+
+class MemoryJobStore:
+    """Thread-safe in-process job store."""
+
+    def __init__(self, max_queue):
+        self.max_queue = max_queue
+        self._jobs = {}
+        self._queues = {}
+        self._cond = threading.Condition()
+
+    def add(self, params, priority=PRIORITY_NORMAL):
+        with self._cond:
+            if self.count_queued() >= self.max_queue:
+                raise QueueFullError(f'Job queue is full ({self.max_queue} pending jobs)')
+            job = _new_job(params, priority)
+            self._jobs[job['id']] = job
+            self._queues.setdefault(priority, deque()).append(job['id'])
+            self._cond.notify()
+            return dict(job)
+
+    def claim(self, timeout=None):
+        """Pop the next queued job and mark it running; None on timeout."""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                for priority in sorted(self._queues):
+                    queue = self._queues[priority]
+                    if queue:
+                        job = self._jobs[queue.popleft()]
+                        job['status'] = RUNNING
+                        job['started_at'] = time.time()
+                        return dict(job)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def update(self, job_id, **fields):
+        with self._cond:
+            self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def count_queued(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class SQLiteJobStore:
+    """Job store persisted in SQLite, shareable between processes."""
+
+    poll_interval = 0.5
+
+    def __init__(self, path, max_queue):
+        self.path = path
+        self.max_queue = max_queue
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL,'
+                ' priority INTEGER NOT NULL, result TEXT, error TEXT,'
+                ' created_at REAL, started_at REAL, finished_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def add(self, params, priority=PRIORITY_NORMAL):
+        job = _new_job(params, priority)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queue:
+                raise QueueFullError(f'Job queue is full ({self.max_queue} pending jobs)')
+            conn.execute(
+                'INSERT INTO jobs (id, status, params, priority, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job['id'], QUEUED, json.dumps(params), priority, job['created_at'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return job
+
+    def claim(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        conn = self._connect()
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT * FROM jobs WHERE status = ? ORDER BY priority, created_at LIMIT 1',
+                    (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    started = time.time()
+                    conn.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                                 (RUNNING, started, row['id']))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if row is not None:
+                job = self._row_to_job(row)
+                job['status'] = RUNNING
+                job['started_at'] = started
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._connect().execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def count_queued(self):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def requeue_stale(self):
+        """Put jobs left 'running' by a crashed worker back in the queue."""
+        self._connect().execute('UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?',
+                                (QUEUED, RUNNING))
+
+    def wake_all(self):
+        pass
+
+
+def create_store(backend=None, max_queue=None, db_path=None):
+    backend = backend or os.environ.get('JOB_BACKEND', 'memory')
+    max_queue = max_queue or int(os.environ.get('JOB_QUEUE_SIZE', '8'))
+    if backend == 'memory':
+        return MemoryJobStore(max_queue)
+    if backend == 'sqlite':
+        return SQLiteJobStore(db_path or os.environ.get('JOB_DB_PATH', 'jobs.db'), max_queue)
+    raise ValueError(f'Unknown job backend: {backend}')
+
+
+class JobQueue:
+    """Accepts jobs and runs them on a pool of worker threads.
+
+    ``handler(params, job_id)`` is called for every job; its return value (a
+    JSON-serialisable dict) becomes the job result.
+    """
+
+    def __init__(self, handler, store=None, workers=None):
+        self.handler = handler
+        self.store = store or create_store()
+        self.workers = workers if workers is not None else int(os.environ.get('JOB_WORKERS', '1'))
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f'Job queue started with {self.workers} worker(s)')
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self.store.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, params, priority=PRIORITY_NORMAL):
+        """Enqueue a job and return its id. Raises QueueFullError when saturated."""
+        job = self.store.add(params, priority)
+        logger.info(f"Job {job['id']} queued")
+        return job['id']
+
+    def status(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job['queue_depth'] = self.store.count_queued()
+        return job
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            job = self.store.claim(timeout=1.0)
+            if job is not None:
+                run_job(self.store, self.handler, job)
+
+
+def run_job(store, handler, job):
+    logger.info(f"Job {job['id']} started")
+    start = time.perf_counter()
+    try:
+        result = handler(job['params'], job['id'])
+        store.update(job['id'], status=DONE, result=result, finished_at=time.time())
+        logger.info(f"Job {job['id']} finished")
+        status = DONE
+    except Exception as e:
+        logger.exception(f"Job {job['id']} failed: {str(e)}")
+        store.update(job['id'], status=FAILED, error=str(e), finished_at=time.time())
+        status = FAILED
+    METRICS.inc('jobs_total', status=status)
+    METRICS.observe('job_duration_seconds', time.perf_counter() - start, status=status)
+
+
+def make_generation_handler(generator, bus=None):
+    """Build a job handler running AdGenerator.generate_ad on the given params.
+
+    ``generator`` is an AdGenerator or a zero-argument callable returning
+    one, called when the first job runs (so a web process that never renders
+    never builds it). When a ProgressBus is given, the generator's progress
+    events are published on a channel named after the job id.
+    """
+    get_generator = generator if not hasattr(generator, 'generate_ad') else (lambda: generator)
+
+    def handler(params, job_id):
+        progress = bus.reporter(job_id) if bus is not None else None
+        try:
+            with trace_job(job_id):
+                result = get_generator().generate_ad(
+                    params['description'],
+                    params.get('language', 'en'),
+                    params['image_paths'],
+                    params['output_path'],
+                    params.get('title'),
+                    params.get('call_to_action'),
+                    progress=progress,
+                    tier=params.get('tier'),
+                    narration=params.get('narration'),
+                )
+        except Exception as e:
+            if bus is not None:
+                bus.publish(job_id, {'stage': 'error', 'fraction': 1.0, 'message': str(e)})
+            raise
+        if bus is not None:
+            bus.publish(job_id, {'stage': 'done', 'fraction': 1.0})
+        return {
+            'video_path': result['video_path'],
+            'script': result.get('script'),
+            'audio_path': result.get('audio_path'),
+        }
+    return handler
+
+
+def _worker_process(db_path, max_queue):
+    from ad_generator import AdGenerator
+
+    store = SQLiteJobStore(db_path, max_queue)
+    handler = make_generation_handler(AdGenerator())
+    while True:
+        job = store.claim(timeout=None)
+        run_job(store, handler, job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run generation workers against a SQLite job queue.')
+    parser.add_argument('command', choices=['worker'])
+    parser.add_argument('--db', default=os.environ.get('JOB_DB_PATH', 'jobs.db'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKERS', '1')))
+    parser.add_argument('--queue-size', type=int, default=int(os.environ.get('JOB_QUEUE_SIZE', '8')))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    SQLiteJobStore(args.db, args.queue_size).requeue_stale()
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(args.db, args.queue_size), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+from collections import namedtuple
+
+# Configuration d'exécution de la diffusion. `offload` : "none" (tout sur le device),
+# "model" (un composant à la fois sur le GPU) ou "sequential" (couche par couche) ;
+# `forward_chunking` découpe le passage feed-forward de l'UNet pour réduire les activations.
+MemoryPlan = namedtuple("MemoryPlan", "device dtype offload decode_chunk_size forward_chunking level")
+
+GB = 1024 ** 3
+# Part de la mémoire libre que l'on s'autorise à viser (fragmentation, autres processus)
+SAFETY_MARGIN = 0.85
+
+# Ordres de grandeur mesurés pour SVD-XT en demi-précision à 1024x576, 14 frames :
+# poids (UNet ~3 Go, encodeur d'image ~1,3 Go, VAE ~0,2 Go), activations du débruitage,
+# et décodage VAE par frame. Ils ne servent qu'à choisir un point de départ : une erreur
+# de mémoire insuffisante fait de toute façon redescendre d'un cran.
+_WEIGHTS_FP16 = {"none": 4.5 * GB, "model": 3.1 * GB, "sequential": 0.6 * GB}
+_DENOISE_FP16 = 3.0 * GB
+_DECODE_FRAME_FP16 = 1.1 * GB
+_REFERENCE_PIXELS = 1024 * 576
+_REFERENCE_FRAMES = 14
+
+# Échelles, de la plus confortable à la plus économe : (dtype, offload, decode_chunk_size, forward_chunking)
+_GPU_LADDER = [
+    ("float16", "none", 8, False),
+    ("float16", "model", 8, False),
+    ("float16", "model", 4, False),
+    ("float16", "model", 2, True),
+    ("float16", "sequential", 1, True),
+]
+_CPU_LADDER = [
+    ("float32", "none", 8, False),
+    ("float32", "none", 4, False),
+    ("float32", "none", 2, True),
+    ("bfloat16", "none", 4, False),
+    ("bfloat16", "none", 2, True),
+    ("bfloat16", "none", 1, True),
+]
+_DTYPE_BYTES = {"float16": 2, "bfloat16": 2, "float32": 4}
+
+
+def available_memory(device):
+    """Mémoire disponible en octets : VRAM libre du GPU, sinon RAM disponible de l'hôte.
+
+    SVD_MEMORY_BUDGET_GB remplace la mesure (machine partagée, tests).
+    """
+    budget = os.getenv("SVD_MEMORY_BUDGET_GB")
+    if budget:
+        return int(float(budget) * GB)
+    if device == "cuda":
+        import torch
+        free, _ = torch.cuda.mem_get_info()
+        return free
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_bytes(plan, num_frames=_REFERENCE_FRAMES, width=1024, height=576):
+    """Pic mémoire estimé d'une génération avec `plan` (voir les constantes ci-dessus)."""
+    scale = _DTYPE_BYTES[plan.dtype] / 2
+    pixels = width * height / _REFERENCE_PIXELS
+    denoise = _DENOISE_FP16 * pixels * num_frames / _REFERENCE_FRAMES
+    if plan.forward_chunking:
+        denoise /= 2
+    decode = _DECODE_FRAME_FP16 * pixels * min(plan.decode_chunk_size, num_frames)
+    return scale * (_WEIGHTS_FP16[plan.offload] + denoise + decode)
+
+
+def _ladder(device):
+    return _GPU_LADDER if device == "cuda" else _CPU_LADDER
+
+
+def _make_plan(device, level):
+    dtype, offload, chunk, forward_chunking = _ladder(device)[level]
+    return MemoryPlan(device, dtype, offload, chunk, forward_chunking, level)
+
+
+def plan_memory(device, free_bytes=None, num_frames=_REFERENCE_FRAMES, width=1024, height=576):
+    """Configuration la plus confortable dont le pic estimé tient dans la mémoire disponible.
+
+    fp16 sur GPU ; fp32 sur CPU tant qu'il tient, bf16 sinon. SVD_DTYPE impose la
+    précision. Sans configuration qui tienne, la plus économe est retenue.
+    """
+    if free_bytes is None:
+        free_bytes = available_memory(device)
+    forced_dtype = os.getenv("SVD_DTYPE")
+    levels = [level for level, rung in enumerate(_ladder(device))
+              if forced_dtype is None or rung[0] == forced_dtype]
+    if not levels:
+        raise ValueError(f"Précision SVD_DTYPE inconnue pour {device} : {forced_dtype}")
+    for level in levels:
+        plan = _make_plan(device, level)
+        if free_bytes is None or estimate_bytes(plan, num_frames, width, height) <= free_bytes * SAFETY_MARGIN:
+            return plan
+    print(f"[WARNING] Mémoire disponible faible ({free_bytes / GB:.1f} Go) : configuration la plus économe.")
+    return _make_plan(device, levels[-1])
+
+
+def smaller_plan(plan):
+    """Cran suivant, plus économe, de l'échelle (même précision si SVD_DTYPE est imposé) ; None au bout."""
+    forced_dtype = os.getenv("SVD_DTYPE")
+    ladder = _ladder(plan.device)
+    for level in range(plan.level + 1, len(ladder)):
+        if forced_dtype is None or ladder[level][0] == forced_dtype:
+            return _make_plan(plan.device, level)
+    return None
+
+
+def is_out_of_memory(error):
+    """Vrai pour une erreur d'allocation CUDA ou CPU levée par PyTorch."""
+    # Si torch n'a jamais été importé, l'erreur ne peut pas venir de lui
+    torch = sys.modules.get("torch")
+    oom_type = getattr(torch.cuda, "OutOfMemoryError", None) if torch is not None else None
+    if isinstance(error, MemoryError) or (oom_type is not None and isinstance(error, oom_type)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
@@ -0,0 +1,373 @@
+import os
+import threading
+import time
+
+from memory_plan import plan_memory, smaller_plan
+from telemetry import span
+
+SVD_MODEL_ID = "stabilityai/stable-video-diffusion-img2vid-xt"
+
+# États du pipeline exposés par health() (/healthz, /readyz)
+COLD = "cold"
+LOADING = "loading"
+LOADED = "loaded"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+# Inférence d'échauffement : image minuscule (multiple de 64), 2 frames, 1 étape
+WARMUP_SIZE = (256, 128)
+WARMUP_FRAMES = 2
+
+
+def _resident_memory_bytes():
+    """Retourne la mémoire résidente (RSS) du processus courant en octets."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            # ru_maxrss est en Ko sous Linux : c'est un pic, pas la valeur courante
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return None
+
+
+_cuda_available = None
+
+
+def cuda_available():
+    """Vrai si un GPU CUDA est utilisable. torch n'est importé qu'à la première question."""
+    global _cuda_available
+    if _cuda_available is None:
+        import torch
+        _cuda_available = torch.cuda.is_available()
+    return _cuda_available
+
+
+class ModelManager:
+    """Garde un seul StableVideoDiffusionPipeline résident et le partage entre les appels.
+
+    Le pipeline est chargé une fois (à la demande ou au démarrage via load()), réutilisé
+    pour toutes les images et toutes les requêtes web, puis libéré explicitement avec
+    unload() ou automatiquement après idle_timeout secondes sans utilisation.
+
+    La précision, le déchargement CPU et la taille de décodage VAE viennent d'un
+    MemoryPlan choisi au premier chargement d'après la mémoire disponible ; après une
+    erreur de mémoire insuffisante, degrade() passe au cran plus économe. `plan` est
+    toujours celui du pipeline résident : un plan qui exige un rechargement alors que le
+    pipeline est en cours d'utilisation attend dans `pending_plan` le prochain chargement.
+    """
+
+    def __init__(self, model_id=SVD_MODEL_ID, idle_timeout=None):
+        self.model_id = model_id
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv("SVD_IDLE_TIMEOUT", "0") or 0)
+        self.idle_timeout = idle_timeout
+
+        self._pipe = None
+        self.plan = None
+        self.pending_plan = None
+        # RLock : acquire() peut déclencher load() alors que le verrou est déjà détenu
+        self._lock = threading.RLock()
+        # Le pipeline n'est pas réentrant : une seule inférence à la fois sur le device
+        self._inference_lock = threading.Lock()
+        self._in_use = 0
+        self._last_used = None
+        self._evict_timer = None
+
+        self.load_count = 0
+        self.last_load_seconds = None
+        self.total_load_seconds = 0.0
+        self.reuse_count = 0
+        self.memory_before_load = None
+        self.memory_after_load = None
+        self.gpu_memory_after_load = None
+        self.oom_count = 0
+
+        self._loading = False
+        self._warming = False
+        # Vrai dès qu'une inférence (échauffement ou génération) a abouti sur le pipeline chargé
+        self._warm = False
+        self.warmup_seconds = None
+        self.warmup_error = None
+
+    @property
+    def device(self):
+        return "cuda" if cuda_available() else "cpu"
+
+    @property
+    def is_loaded(self):
+        return self._pipe is not None
+
+    @property
+    def state(self):
+        if self.warmup_error is not None:
+            return FAILED
+        if self._loading:
+            return LOADING
+        if self._pipe is None:
+            return COLD
+        if self._warming:
+            return WARMING
+        return READY if self._warm else LOADED
+
+    def load(self):
+        """Charge le pipeline s'il n'est pas déjà en mémoire et le retourne."""
+        with self._lock:
+            if self._pipe is not None:
+                return self._pipe
+
+            if self.pending_plan is not None:
+                self.plan, self.pending_plan = self.pending_plan, None
+            self._loading = True
+            try:
+                with span("model.load", model_id=self.model_id):
+                    return self._load()
+            finally:
+                self._loading = False
+
+    def _load(self):
+        import torch
+        from diffusers import StableVideoDiffusionPipeline
+
+        if self.plan is None:
+            self.plan = plan_memory(self.device)
+        plan = self.plan
+        print(f"[INFO] Chargement du modèle {self.model_id} sur {self.device} ({plan.dtype}, "
+              f"offload {plan.offload}, decode_chunk_size {plan.decode_chunk_size})...")
+        self.memory_before_load = _resident_memory_bytes()
+        start = time.perf_counter()
+        # Les poids fp16 sont convertis à la précision du plan au chargement
+        pipe = StableVideoDiffusionPipeline.from_pretrained(
+            self.model_id,
+            torch_dtype=getattr(torch, plan.dtype),
+            variant="fp16"
+        )
+        if plan.offload == "model":
+            pipe.enable_model_cpu_offload()
+        elif plan.offload == "sequential":
+            pipe.enable_sequential_cpu_offload()
+        else:
+            pipe.to(self.device)
+        if plan.forward_chunking:
+            pipe.unet.enable_forward_chunking()
+        elapsed = time.perf_counter() - start
+
+        self._pipe = pipe
+        self.load_count += 1
+        self.last_load_seconds = elapsed
+        self.total_load_seconds += elapsed
+        self.memory_after_load = _resident_memory_bytes()
+        if self.device == "cuda":
+            self.gpu_memory_after_load = torch.cuda.memory_allocated()
+        self._last_used = time.monotonic()
+        print(f"[INFO] Modèle chargé en {elapsed:.1f}s (chargement n°{self.load_count}).")
+        self._schedule_eviction()
+        return pipe
+
+    def unload(self):
+        """Libère le pipeline et la mémoire GPU associée. Retourne True si un modèle a été libéré."""
+        with self._lock:
+            if self._evict_timer is not None:
+                self._evict_timer.cancel()
+                self._evict_timer = None
+            if self._pipe is None:
+                return False
+            if self._in_use:
+                print("[WARNING] Déchargement refusé : le modèle est en cours d'utilisation.")
+                return False
+            self._pipe = None
+            self._warm = False
+            if self.device == "cuda":
+                import torch
+                torch.cuda.empty_cache()
+            print("[INFO] Modèle SVD déchargé de la mémoire.")
+            return True
+
+    def current_plan(self):
+        """Plan mémoire en vigueur ; choisi dès maintenant si le modèle n'a pas encore été chargé."""
+        with self._lock:
+            if self.plan is None:
+                self.plan = plan_memory(self.device)
+            return self.plan
+
+    def seeded_generator(self, seed):
+        """Générateur aléatoire torch initialisé avec `seed` (diffusions reproductibles)."""
+        import torch
+        return torch.manual_seed(seed)
+
+    def warm_up(self, background=False):
+        """Charge le pipeline puis exécute une inférence minuscule.
+
+        La première inférence paie la création du contexte CUDA, l'initialisation des
+        allocateurs et le choix des noyaux : faite au démarrage du worker, elle n'est
+        plus à la charge de la première requête. `background=True` lance l'échauffement
+        dans un thread et retourne aussitôt ce thread.
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="svd-warmup", daemon=True)
+            thread.start()
+            return thread
+
+        from PIL import Image
+
+        start = time.perf_counter()
+        self.warmup_error = None
+        try:
+            self.load()
+            self._warming = True
+            width, height = WARMUP_SIZE
+            with self.pipeline() as pipe, span("model.warmup"):
+                pipe(
+                    Image.new("RGB", WARMUP_SIZE),
+                    height=height,
+                    width=width,
+                    num_frames=WARMUP_FRAMES,
+                    num_inference_steps=1,
+                    decode_chunk_size=1,
+                    generator=self.seeded_generator(0),
+                )
+            if self.device == "cuda":
+                import torch
+                torch.cuda.synchronize()
+        except Exception as e:
+            self.warmup_error = f"{type(e).__name__}: {e}"
+            print(f"[ERROR] Échauffement du modèle impossible : {e}")
+            return False
+        finally:
+            self._warming = False
+        self.warmup_seconds = time.perf_counter() - start
+        print(f"[INFO] Modèle prêt : chargement et échauffement en {self.warmup_seconds:.1f}s.")
+        return True
+
+    def health(self):
+        """État du pipeline pour les sondes /healthz et /readyz."""
+        state = self.state
+        return {
+            "state": state,
+            "ready": state == READY,
+            "device": self.device if self._pipe is not None else None,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.warmup_error,
+        }
+
+    def degrade(self):
+        """Passe au plan mémoire plus économe après une erreur de mémoire insuffisante.
+
+        Le pipeline est rechargé si la précision ou le déchargement changent ; s'il est
+        en cours d'utilisation, le plan attend dans `pending_plan` et s'applique au
+        rechargement qui suit la fin des inférences en cours. Retourne False s'il n'existe
+        pas de plan plus économe (l'erreur doit alors remonter).
+        """
+        with self._lock:
+            self.oom_count += 1
+            if self.device == "cuda":
+                import torch
+                torch.cuda.empty_cache()
+            current = self.pending_plan or self.plan or plan_memory(self.device)
+            plan = smaller_plan(current)
+            if plan is None:
+                return False
+            print(f"[WARNING] Mémoire insuffisante : passage à {plan.dtype}, offload {plan.offload}, "
+                  f"decode_chunk_size {plan.decode_chunk_size}.")
+            resident = self.plan or current
+            if self._pipe is not None and (plan.dtype, plan.offload, plan.forward_chunking) != (
+                    resident.dtype, resident.offload, resident.forward_chunking):
+                if not self.unload():
+                    print("[INFO] Plan réduit appliqué au prochain chargement du modèle.")
+                    self.pending_plan = plan
+                    return True
+            self.plan = plan
+            self.pending_plan = None
+            return True
+
+    def acquire(self):
+        """Retourne le pipeline en le marquant comme utilisé (à associer à release())."""
+        with self._lock:
+            was_loaded = self._pipe is not None
+            pipe = self.load()
+            if was_loaded:
+                self.reuse_count += 1
+            self._in_use += 1
+            return pipe
+
+    def release(self):
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+            self._last_used = time.monotonic()
+            if self.pending_plan is not None and not self._in_use:
+                # Dernière inférence terminée : le plan réduit peut enfin être chargé
+                self.unload()
+            self._schedule_eviction()
+
+    def pipeline(self):
+        """Gestionnaire de contexte : `with manager.pipeline() as pipe: ...`"""
+        return _PipelineLease(self)
+
+    def _schedule_eviction(self):
+        if not self.idle_timeout or self.idle_timeout <= 0:
+            return
+        if self._evict_timer is not None:
+            self._evict_timer.cancel()
+        self._evict_timer = threading.Timer(self.idle_timeout, self._evict_if_idle)
+        self._evict_timer.daemon = True
+        self._evict_timer.start()
+
+    def _evict_if_idle(self):
+        with self._lock:
+            self._evict_timer = None
+            if self._pipe is None or self._in_use:
+                return
+            idle = time.monotonic() - (self._last_used or 0)
+            if idle < self.idle_timeout:
+                self._schedule_eviction()
+                return
+            print(f"[INFO] Modèle inutilisé depuis {idle:.0f}s, libération.")
+            self.unload()
+
+    def stats(self):
+        """Statistiques de chargement et de mémoire résidente."""
+        with self._lock:
+            return {
+                "model_id": self.model_id,
+                "device": self.device,
+                "loaded": self._pipe is not None,
+                "in_use": self._in_use,
+                "load_count": self.load_count,
+                "reuse_count": self.reuse_count,
+                "last_load_seconds": self.last_load_seconds,
+                "total_load_seconds": self.total_load_seconds,
+                "rss_before_load_bytes": self.memory_before_load,
+                "rss_after_load_bytes": self.memory_after_load,
+                "rss_current_bytes": _resident_memory_bytes(),
+                "gpu_allocated_after_load_bytes": self.gpu_memory_after_load,
+                "idle_timeout": self.idle_timeout,
+                "memory_plan": self.plan._asdict() if self.plan else None,
+                "pending_memory_plan": self.pending_plan._asdict() if self.pending_plan else None,
+                "oom_count": self.oom_count,
+                "state": self.state,
+                "warmup_seconds": self.warmup_seconds,
+            }
+
+
+class _PipelineLease:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def __enter__(self):
+        self.manager._inference_lock.acquire()
+        try:
+            return self.manager.acquire()
+        except Exception:
+            self.manager._inference_lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.manager._warm = True
+            self.manager.warmup_error = None
+        self.manager.release()
+        self.manager._inference_lock.release()
+        return False
@@ -0,0 +1,208 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+from interpolate import blend_frames
+from memory_plan import is_out_of_memory
+from telemetry import METRICS, record_span
+from progress import emit_progress
+
+# Qualité demandée par la requête : "fast" force le moteur CPU, "quality" privilégie SVD,
+# "preview" produit un aperçu basse définition en une fraction du temps
+TIER_FAST = "fast"
+TIER_QUALITY = "quality"
+TIER_PREVIEW = "preview"
+
+
+class MotionEngine:
+    """Transforme une image fixe (PIL, 1024x576) en clip animé.
+
+    `animate()` retourne une séquence de frames RGB uint8 (ndarray ou objet
+    indexable avec len()), produite à la cadence `fps` du moteur.
+    """
+
+    name = None
+    fps = None
+    # Les moteurs coûteux voient leurs clips mis en cache disque (voir ClipCache)
+    cacheable = False
+
+    def params(self):
+        """Paramètres qui déterminent le résultat (ils entrent dans les clés de cache)."""
+        return {}
+
+    def clip_params(self):
+        """Paramètres effectifs du prochain rendu, pour les clés du cache de clips.
+
+        Par défaut ceux de params() ; un moteur dont le rendu dépend aussi de l'état du
+        device (précision, découpage) les y ajoute.
+        """
+        return self.params()
+
+    def animate(self, image, index=0, progress=None):
+        raise NotImplementedError
+
+
+class SVDEngine(MotionEngine):
+    """Stable Video Diffusion via le pipeline résident du ModelManager.
+
+    `decode_chunk_size` est un plafond : le plan mémoire du ModelManager peut le
+    réduire. Une erreur de mémoire insuffisante relance l'image avec un plan plus économe.
+    """
+
+    name = "svd"
+    fps = 7
+    cacheable = True
+
+    def __init__(self, model_manager, svd_params, name=None):
+        self.model_manager = model_manager
+        self.svd_params = svd_params
+        self.name = name or self.name
+
+    def params(self):
+        return {"model_id": self.model_manager.model_id, **self.svd_params}
+
+    def clip_params(self):
+        # Après une erreur de mémoire, le plan réduit change la précision et le découpage
+        # du décodage VAE (temporel) : ses clips ne doivent pas servir pour le plan complet
+        plan = self.model_manager.current_plan()
+        return dict(self.params(), dtype=plan.dtype,
+                    decode_chunk_size=min(self.svd_params["decode_chunk_size"], plan.decode_chunk_size))
+
+    def animate(self, image, index=0, progress=None):
+        params = self.svd_params
+        num_inference_steps = params["num_inference_steps"]
+        # Horodatages pour séparer le débruitage (jusqu'à la dernière étape) du décodage VAE
+        timings = {}
+
+        def on_step_end(pipeline, step, timestep, callback_kwargs):
+            now = time.perf_counter()
+            METRICS.observe("diffusion_step_seconds", now - timings["last_step"])
+            timings["last_step"] = now
+            # La diffusion représente ~90 % du temps d'une image, le décodage le reste
+            emit_progress(progress, "diffusion", 0.9 * (step + 1) / num_inference_steps,
+                          step=step + 1, steps=num_inference_steps)
+            return callback_kwargs
+
+        while True:
+            emit_progress(progress, "diffusion", 0.0, step=0, steps=num_inference_steps)
+            try:
+                with self.model_manager.pipeline() as pipe:
+                    timings["start"] = timings["last_step"] = time.perf_counter()
+                    output = pipe(
+                        image,
+                        height=params.get("height", 576),
+                        width=params.get("width", 1024),
+                        num_frames=params["num_frames"],
+                        num_inference_steps=num_inference_steps,
+                        decode_chunk_size=min(params["decode_chunk_size"],
+                                              self.model_manager.current_plan().decode_chunk_size),
+                        generator=self.model_manager.seeded_generator(params["seed"]),
+                        callback_on_step_end=on_step_end
+                    )
+                    end = time.perf_counter()
+                record_span("svd.diffusion", timings["start"], timings["last_step"], steps=num_inference_steps)
+                record_span("svd.vae_decode", timings["last_step"], end)
+                break
+            except Exception as e:
+                # Le verrou du pipeline est rendu : degrade() peut le recharger
+                if not is_out_of_memory(e) or not self.model_manager.degrade():
+                    raise
+                METRICS.inc("oom_retries_total")
+                print(f"[WARNING] Image {index} : mémoire insuffisante, nouvel essai avec un plan réduit.")
+        return np.stack([np.array(frame) for frame in output.frames[0]])
+
+
+class KenBurnsClip:
+    """Clip pan/zoom calculé à la demande à partir d'une seule image.
+
+    Chaque frame est un recadrage + redimensionnement (transformation affine sans
+    rotation, faite par PIL en une passe séparable) de l'image source ; la fin du clip
+    se fond dans la première frame pour que la timeline puisse le boucler sans saut.
+    """
+
+    def __init__(self, image, motion, num_frames, fps, zoom, crossfade_frames):
+        self.image = image
+        self.motion = motion
+        self.num_frames = num_frames
+        self.fps = fps
+        self.zoom = zoom
+        self.crossfade_frames = min(crossfade_frames, num_frames // 2)
+        self.size = image.size
+        self._first = None
+
+    @property
+    def shape(self):
+        width, height = self.size
+        return (self.num_frames, height, width, 3)
+
+    def __len__(self):
+        return self.num_frames
+
+    def _box(self, t):
+        """Zone source (gauche, haut, droite, bas) affichée au temps normalisé t ∈ [0, 1]."""
+        width, height = self.size
+        # Courbe douce (ease-in-out) pour éviter un démarrage saccadé
+        t = t * t * (3 - 2 * t)
+        if self.motion == "zoom_in":
+            scale, dx, dy = 1 + (self.zoom - 1) * t, 0.5, 0.5
+        elif self.motion == "zoom_out":
+            scale, dx, dy = self.zoom - (self.zoom - 1) * t, 0.5, 0.5
+        elif self.motion == "pan_right":
+            scale, dx, dy = self.zoom, t, 0.5
+        else:  # pan_left
+            scale, dx, dy = self.zoom, 1 - t, 0.5
+        crop_w, crop_h = width / scale, height / scale
+        left = (width - crop_w) * dx
+        top = (height - crop_h) * dy
+        return (left, top, left + crop_w, top + crop_h)
+
+    def _render(self, n):
+        t = n / max(self.num_frames - 1, 1)
+        return np.asarray(self.image.resize(self.size, Image.BILINEAR, box=self._box(t)))
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self.num_frames
+        if not 0 <= n < self.num_frames:
+            raise IndexError(n)
+        frame = self._render(n)
+        fade_start = self.num_frames - self.crossfade_frames
+        if self.crossfade_frames and n >= fade_start:
+            if self._first is None:
+                self._first = self._render(0)
+            weight = (n - fade_start + 1) / (self.crossfade_frames + 1)
+            frame = blend_frames(frame, self._first, weight)
+        return frame
+
+    def to_array(self):
+        return np.stack([self[n] for n in range(self.num_frames)])
+
+
+class KenBurnsEngine(MotionEngine):
+    """Moteur CPU rapide : pan, zoom et fondu enchaîné, sans modèle ni GPU."""
+
+    name = "kenburns"
+    motions = ("zoom_in", "pan_right", "zoom_out", "pan_left")
+
+    def __init__(self, fps=24, duration=2.5, zoom=1.12, crossfade=0.5, size=None, name=None):
+        self.fps = fps
+        self.duration = duration
+        self.zoom = zoom
+        self.crossfade = crossfade
+        # Taille de sortie (largeur, hauteur) ; None garde celle de l'image source
+        self.size = size
+        self.name = name or self.name
+
+    def params(self):
+        return {"fps": self.fps, "duration": self.duration, "zoom": self.zoom, "crossfade": self.crossfade,
+                "size": self.size}
+
+    def animate(self, image, index=0, progress=None):
+        if self.size and image.size != tuple(self.size):
+            image = image.resize(self.size)
+        motion = self.motions[index % len(self.motions)]
+        clip = KenBurnsClip(image, motion, int(round(self.duration * self.fps)), self.fps, self.zoom,
+                            int(round(self.crossfade * self.fps)))
+        emit_progress(progress, "motion", 0.9, engine=self.name, motion=motion)
+        return clip
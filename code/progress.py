@@ -0,0 +1,154 @@
+"""Lightweight in-process pub/sub for generation progress events.
+
+Publishers (the job workers) never block: an event is appended to a bounded
+per-channel history and waiting subscribers are notified. Subscribers long-poll
+a channel with `wait()`, which is what the SSE endpoint uses to stream events
+to the browser. Each channel has its own condition variable so that an event
+on one job only wakes the watchers of that job.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STAGES = ('done', 'error')
+
+
+class _Channel:
+    def __init__(self, history):
+        self.events = deque(maxlen=history)
+        self.cond = threading.Condition(threading.Lock())
+        self.next_id = 1
+        self.closed = False
+        self.updated_at = time.monotonic()
+
+
+class ProgressBus:
+
+    def __init__(self, history=200, retention=3600):
+        self.history = history
+        self.retention = retention
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, name):
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                self._purge_expired()
+                channel = self._channels[name] = _Channel(self.history)
+            return channel
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        expired = [name for name, channel in self._channels.items()
+                   if channel.closed and now - channel.updated_at > self.retention]
+        for name in expired:
+            del self._channels[name]
+
+    def publish(self, name, event):
+        """Append an event to a channel and wake its subscribers. Returns the event id."""
+        channel = self._channel(name)
+        with channel.cond:
+            return self._append(channel, event)
+
+    @staticmethod
+    def _append(channel, event):
+        event = dict(event, id=channel.next_id, time=time.time())
+        channel.next_id += 1
+        channel.events.append(event)
+        channel.updated_at = time.monotonic()
+        if event.get('stage') in TERMINAL_STAGES:
+            channel.closed = True
+        channel.cond.notify_all()
+        return event['id']
+
+    def finish(self, name, event):
+        """Publish a terminal event unless the channel already has one. Returns True if published.
+
+        Used when the end of a job is learned from the job store rather than from the
+        worker (external worker processes publish on their own bus, not on this one).
+        """
+        channel = self._channel(name)
+        with channel.cond:
+            if channel.closed:
+                return False
+            self._append(channel, event)
+            return True
+
+    def wait(self, name, last_id=0, timeout=15.0):
+        """Return the events newer than last_id, blocking up to timeout if there are none.
+
+        The second value tells whether the channel is finished (a terminal
+        event was published), so the caller can stop watching.
+        """
+        channel = self._channel(name)
+        with channel.cond:
+            if not channel.closed and (not channel.events or channel.events[-1]['id'] <= last_id):
+                channel.cond.wait(timeout)
+            events = [event for event in channel.events if event['id'] > last_id]
+            return events, channel.closed
+
+    def latest(self, name):
+        channel = self._channel(name)
+        with channel.cond:
+            return dict(channel.events[-1]) if channel.events else None
+
+    def reporter(self, name):
+        """Callable suitable as an AdGenerator `progress` callback for this channel."""
+        return lambda event: self.publish(name, event)
+
+
+def emit_progress(progress, stage, fraction, message=None, **data):
+    """Send a structured progress event to an optional callback.
+
+    `fraction` is the completion (0..1) of the stage reporting it; callers
+    composing several stages rescale it with `scaled_progress`.
+    """
+    if progress is None:
+        return
+    event = {'stage': stage, 'fraction': max(0.0, min(1.0, fraction))}
+    if message:
+        event['message'] = message
+    event.update(data)
+    try:
+        progress(event)
+    except Exception as e:
+        # A broken watcher must never fail the render
+        logger.warning(f'Progress callback failed: {str(e)}')
+
+
+def scaled_progress(progress, start, end, **extra):
+    """Wrap a callback so that a sub-stage's 0..1 fraction maps onto [start, end]."""
+    if progress is None:
+        return None
+
+    def report(event):
+        fraction = start + (end - start) * event.get('fraction', 0.0)
+        progress(dict(event, **extra, fraction=fraction))
+    return report
+
+
+def monotonic_progress(progress):
+    """Wrap a callback so that the reported fraction never goes backwards.
+
+    Needed when stages run concurrently and report on overlapping ranges.
+    """
+    if progress is None:
+        return None
+    lock = threading.Lock()
+    highest = [0.0]
+
+    def report(event):
+        with lock:
+            highest[0] = max(highest[0], event.get('fraction', 0.0))
+            fraction = highest[0]
+        progress(dict(event, fraction=fraction))
+    return report
+
+def format_sse(event):
+    """Serialise an event for a text/event-stream response."""
+    return f"id: {event['id']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+
+DEFAULT_INDEX_PATH = os.path.join("cache", "results.json")
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class _InFlight:
+    """Rendu en cours auquel d'autres requêtes identiques peuvent se rattacher."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    """Cache des publicités complètes, pour une génération idempotente.
+
+    Une requête est identifiée par une empreinte canonique (description normalisée,
+    langue, contenu des images dans l'ordre, textes et paramètres de génération).
+    Si une vidéo existe déjà pour cette empreinte, elle est renvoyée immédiatement ;
+    si un rendu identique est en cours, la requête attend ce rendu au lieu d'en
+    lancer un second.
+
+    L'index garde au plus `max_entries` entrées (les plus anciennes partent en
+    premier) ; une entrée dont la vidéo a été supprimée est retirée à la consultation.
+    """
+
+    def __init__(self, index_path=None, max_entries=None):
+        self.index_path = index_path or os.getenv("RESULT_CACHE_INDEX", DEFAULT_INDEX_PATH)
+        if max_entries is None:
+            max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._index_mtime = None
+        self._index = self._load_index()
+
+        self.hits = 0
+        self.misses = 0
+        self.attached = 0
+        self.bytes_saved = 0
+
+    def _mtime(self):
+        try:
+            return os.stat(self.index_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_index(self):
+        self._index_mtime = self._mtime()
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _refresh(self):
+        """Relit l'index seulement si un autre processus l'a modifié depuis la dernière lecture."""
+        if self._mtime() != self._index_mtime:
+            self._index = self._load_index()
+
+    def _save_index(self):
+        # Ordre d'insertion = ancienneté : les entrées en trop les plus anciennes partent
+        for fingerprint in list(self._index)[:max(len(self._index) - self.max_entries, 0)]:
+            del self._index[fingerprint]
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = self._mtime()
+
+    @staticmethod
+    def fingerprint(description, langue, image_paths, title=None, call_to_action=None, **params):
+        """Empreinte SHA-256 canonique d'une demande de génération."""
+        digest = hashlib.sha256()
+        canonical = {
+            "description": re.sub(r"\s+", " ", description or "").strip(),
+            "langue": (langue or "").lower(),
+            "title": title or None,
+            "call_to_action": call_to_action or None,
+            "params": params,
+        }
+        digest.update(json.dumps(canonical, sort_keys=True, default=str).encode())
+        for path in image_paths:
+            file_digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    file_digest.update(chunk)
+            digest.update(file_digest.digest())
+        return digest.hexdigest()
+
+    def lookup(self, fingerprint):
+        """Résultat déjà rendu pour cette empreinte, ou None si la vidéo n'existe plus."""
+        with self._lock:
+            entry = self._index.get(fingerprint)
+            if entry is None:
+                # Un autre processus a peut-être rendu cette publicité entre-temps
+                self._refresh()
+                entry = self._index.get(fingerprint)
+            if entry is None:
+                return None
+            if os.path.exists(entry["video_path"]):
+                entry = dict(entry)
+                # Narration conservée puis supprimée : la vidéo reste valable sans elle
+                if entry.get("audio_path") and not os.path.exists(entry["audio_path"]):
+                    del entry["audio_path"]
+                return entry
+            # Vidéo supprimée : l'entrée ne servira plus
+            self._refresh()
+            self._index.pop(fingerprint, None)
+            self._save_index()
+            return None
+
+    def store(self, fingerprint, result):
+        with self._lock:
+            self._refresh()
+            self._index.pop(fingerprint, None)
+            self._index[fingerprint] = result
+            self._save_index()
+
+    def relocate(self, old_path, new_path):
+        """Fait suivre les entrées dont la vidéo a été déplacée (renommage d'un fichier temporaire)."""
+        old_path = os.path.abspath(old_path)
+        with self._lock:
+            self._refresh()
+            moved = [entry for entry in self._index.values() if os.path.abspath(entry["video_path"]) == old_path]
+            for entry in moved:
+                entry["video_path"] = new_path
+            if moved:
+                self._save_index()
+            return len(moved)
+
+    def get_or_run(self, fingerprint, render):
+        """Retourne le résultat en cache, attend un rendu identique en cours, ou lance `render()`."""
+        cached = self.lookup(fingerprint)
+        if cached is not None:
+            self._count_saved(cached, "hits")
+            print(f"[INFO] Publicité déjà générée, réutilisation de {cached['video_path']}.")
+            return dict(cached, cached="hit")
+
+        with self._lock:
+            inflight = self._inflight.get(fingerprint)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[fingerprint] = _InFlight()
+                self.misses += 1
+
+        if not owner:
+            print("[INFO] Rendu identique déjà en cours, en attente de son résultat.")
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            self._count_saved(inflight.result, "attached")
+            return dict(inflight.result, cached="attached")
+
+        try:
+            result = render()
+            inflight.result = result
+            self.store(fingerprint, result)
+            return dict(result, cached=False)
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[fingerprint]
+            inflight.done.set()
+
+    def _count_saved(self, result, counter):
+        try:
+            size = os.path.getsize(result["video_path"])
+        except OSError:
+            size = 0
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.bytes_saved += size
+
+    def stats(self):
+        with self._lock:
+            requests_seen = self.hits + self.attached + self.misses
+            return {
+                "hits": self.hits,
+                "attached": self.attached,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.attached) / requests_seen if requests_seen else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "in_flight": len(self._inflight),
+                "entries": len(self._index),
+            }
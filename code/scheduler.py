@@ -0,0 +1,90 @@
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_probe import probe_audio
+from progress import emit_progress, monotonic_progress, scaled_progress
+from telemetry import propagate
+from workspace import Workspace
+
+
+class PipelineScheduler:
+    """Ordonnance les étapes d'une génération publicitaire.
+
+    La diffusion image → vidéo ne dépend ni du script ni de l'audio : elle démarre
+    immédiatement, pendant que l'appel Gemini puis gTTS (limités par le réseau)
+    tournent dans un thread à part. Les deux branches se rejoignent à l'assemblage,
+    ce qui retire la latence texte/audio du chemin critique.
+
+    Tous les fichiers intermédiaires vivent dans un Workspace propre à la
+    génération, supprimé à la fin du rendu (succès ou échec).
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def narrate(self, description, langue, workspace, progress=None):
+        """Branche texte/audio : script Gemini puis synthèse vocale."""
+        start = time.perf_counter()
+        emit_progress(progress, "script", 0.0)
+        script = self.generator.write_script(description, langue)
+        emit_progress(progress, "audio", 0.0)
+        audio_path, audio = self.generator.text_to_speech(
+            script, langue, output_file=workspace.file(f"narration.{self.generator.narrator.backend.ext}")
+        )
+        workspace.check()
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] Script et audio prêts en {elapsed:.1f}s (en parallèle de la diffusion).")
+        return script, audio_path, audio
+
+    def run(self, description, langue, image_paths, output_path=None, title=None,
+            call_to_action=None, progress=None, engine=None, render=None, narration=None,
+            keep_narration=False):
+        """Rend la publicité ; `narration=(script, audio_path)` réutilise un script et un audio
+        existants (ceux d'un aperçu validé) au lieu de repasser par Gemini et la synthèse vocale.
+        `keep_narration` copie l'audio à côté de la vidéo pour une réutilisation ultérieure ;
+        seul cet audio conservé est rapporté (clé "audio_path") et donc mis en cache."""
+        engine = engine or self.generator.select_motion_engine()
+        render = render or {}
+        progress = monotonic_progress(progress)
+        plan = self.generator.plan_images(image_paths)
+        kept_narration = None
+        with Workspace() as workspace:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="narration") as pool:
+                if narration is not None:
+                    script, audio_path = narration
+                    pending = pool.submit(lambda: (script, audio_path, probe_audio(audio_path)))
+                else:
+                    pending = pool.submit(propagate(self.narrate), description, langue, workspace, progress)
+                try:
+                    clips = self.generator.generate_clips(
+                        image_paths, engine, progress=scaled_progress(progress, 0.0, 0.8), plan=plan
+                    )
+                except Exception:
+                    pending.cancel()
+                    raise
+                # Point de jonction : l'assemblage a besoin de l'audio
+                script, audio_path, audio = pending.result()
+
+            video_path = self.generator.assemble_ad_video(
+                clips, image_paths, audio_path, output_path, title, call_to_action,
+                progress=scaled_progress(progress, 0.8, 1.0), clip_fps=engine.fps, workspace=workspace,
+                audio_duration=audio.duration, **render
+            )
+            if keep_narration and os.path.dirname(audio_path) == workspace.path:
+                kept = f"{os.path.splitext(video_path)[0]}_narration{os.path.splitext(audio_path)[1]}"
+                shutil.copyfile(audio_path, kept)
+                kept_narration = kept
+        # Sinon la narration disparaît avec l'espace de travail (ou appartient à l'appelant, qui
+        # peut la supprimer après le rendu) : seule la vidéo finale est conservée
+        result = {
+            "video_path": video_path,
+            "script": script,
+            "audio_duration": audio.duration,
+            "audio": audio._asdict(),
+            "dedup": plan.report(),
+        }
+        if kept_narration is not None:
+            result["audio_path"] = kept_narration
+        return result
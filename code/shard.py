@@ -0,0 +1,405 @@
+"""Render sharding: spread per-image animation tasks over processes or hosts.
+
+Each image of an ad is animated independently, so the tasks can run on
+several devices at once. A task is a small dict:
+
+    {'task_id': str, 'index': int, 'engine': str, 'image': <file bytes>}
+
+and its result is ``{'clip': ..., 'params': {...}}``: the clip's frames
+(N x H x W x 3 uint8), either as an in-memory buffer or as the path of a
+.npy clip file, and the generation parameters the worker actually used
+(memory plan included, see MotionEngine.clip_params), which the caller keys
+its clip cache on. Two backends are available:
+
+- local: a pool of worker processes on this machine, each with its own
+  AdGenerator. With GPUs, each worker is pinned to one of them
+  (CUDA_VISIBLE_DEVICES) and there are at most as many workers as GPUs;
+  without, every worker loads a full pipeline in host memory, so N is
+  bounded by RAM;
+- http: remote render hosts started with `python shard.py serve`.
+
+Tasks are handed to whichever worker is free, so a 10-image ad on four
+workers takes about as long as the three slowest rounds instead of the sum
+of ten images. A failed task is retried, on another host when possible.
+
+Configuration comes from the environment: RENDER_SHARDS ('local:4' or a
+comma-separated list of http://host:port URLs), RENDER_SHARD_RETRIES and,
+for local workers, RENDER_SHARD_CLIP_DIR (return clip files written there
+instead of pickled frames).
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from telemetry import METRICS, propagate, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 2
+HTTP_TIMEOUT = 600
+# A host failing this many tasks in a row is rested for QUARANTINE_SECONDS
+QUARANTINE_AFTER = 3
+QUARANTINE_SECONDS = 30
+
+
+class ShardError(Exception):
+    """Raised when a task fails on a worker, or still fails after all its retries."""
+
+    def __init__(self, message, host=None):
+        super().__init__(message)
+        self.host = host
+
+
+def make_task(index, engine, image_bytes):
+    return {'task_id': str(uuid.uuid4()), 'index': index, 'engine': engine, 'image': image_bytes}
+
+
+def encode_frames(frames):
+    buffer = io.BytesIO()
+    np.save(buffer, frames, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_frames(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def load_result(result):
+    """Frames of a task result, whether returned as a buffer or as a .npy clip file.
+
+    A clip file is read into memory and deleted: it only carries one result.
+    """
+    clip = result['clip']
+    if isinstance(clip, str):
+        frames = np.load(clip, allow_pickle=False)
+        os.remove(clip)
+        return frames
+    return clip
+
+
+def render_task(generator, task, clip_dir=None):
+    """Run one task with `generator`; frames in memory, or a .npy path when clip_dir is set."""
+    from PIL import Image
+    from ingest import decode
+
+    pixels = decode(task['image'])[0]
+    engine = generator.motion_engines[task['engine']]
+    frames = generator.animate_image(Image.fromarray(pixels), engine, index=task['index'])
+    frames = frames.to_array() if hasattr(frames, 'to_array') else np.asarray(frames)
+    # Read after rendering: an out-of-memory retry may have degraded the worker's plan
+    params = engine.clip_params()
+    if clip_dir is None:
+        return {'clip': frames, 'params': params}
+    path = os.path.join(clip_dir, f"{task['task_id']}.npy")
+    np.save(path, frames, allow_pickle=False)
+    return {'clip': path, 'params': params}
+
+
+# Local backend ----------------------------------------------------------
+
+_worker_generator = None
+
+
+def visible_gpus():
+    """Ids of the GPUs local workers can be pinned to: CUDA_VISIBLE_DEVICES, else all detected."""
+    env = os.environ.get('CUDA_VISIBLE_DEVICES')
+    if env is not None:
+        return [device.strip() for device in env.split(',') if device.strip() and device.strip() != '-1']
+    from model_manager import cuda_available
+    if not cuda_available():
+        return []
+    import torch
+    return [str(i) for i in range(torch.cuda.device_count())]
+
+
+def _init_local_worker(counter, devices):
+    global _worker_generator
+    if devices:
+        # Before torch is imported: the worker only ever sees its own GPU, as cuda:0
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        os.environ['CUDA_VISIBLE_DEVICES'] = devices[index % len(devices)]
+    from ad_generator import AdGenerator
+    _worker_generator = AdGenerator()
+
+
+def _run_local_task(task, clip_dir):
+    return render_task(_worker_generator, task, clip_dir)
+
+
+class LocalBackend:
+    """Worker processes on this machine, each holding its own AdGenerator.
+
+    With `clip_dir` the workers write .npy clip files there and only paths
+    cross the process boundary; otherwise frames are pickled back. Each worker
+    gets its own GPU: two SVD pipelines do not fit on one device, so the pool
+    is capped at the number of GPUs.
+    """
+
+    def __init__(self, workers=2, clip_dir=None):
+        self.workers = workers
+        self.clip_dir = clip_dir
+        if clip_dir is not None:
+            os.makedirs(clip_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._devices = None
+
+    def _plan(self):
+        """(GPU ids, worker count) for the pool, computed once: workers are capped by GPUs."""
+        if self._devices is None:
+            self._devices = visible_gpus()
+            if self._devices and self.workers > len(self._devices):
+                logger.warning(f'{self.workers} local render workers requested for {len(self._devices)} '
+                               f'GPU(s): starting {len(self._devices)}')
+        workers = min(self.workers, len(self._devices)) if self._devices else self.workers
+        return self._devices, workers
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                devices, workers = self._plan()
+                context = multiprocessing.get_context('spawn')
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=context,
+                    initializer=_init_local_worker,
+                    initargs=(context.Value('i', 0), devices),
+                )
+            return self._pool
+
+    def run(self, task, exclude=None):
+        try:
+            result = self._executor().submit(_run_local_task, task, self.clip_dir).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): start a fresh pool for the retry
+            with self._lock:
+                self._pool = None
+            raise
+        return 'local', result
+
+    @property
+    def concurrency(self):
+        with self._lock:
+            return self._plan()[1]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# HTTP backend -----------------------------------------------------------
+
+class HTTPBackend:
+    """Remote render hosts (`python shard.py serve`), one task at a time per host."""
+
+    def __init__(self, hosts, timeout=HTTP_TIMEOUT):
+        self.hosts = list(hosts)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._failures = {host: 0 for host in self.hosts}
+        # Free hosts are shared by all dispatch threads: a waiting thread holds none of them
+        self._free = list(self.hosts)
+        self._cond = threading.Condition()
+
+    def _take(self, exclude):
+        """Next free host that has not failed this task yet; any free host once all have."""
+        with self._cond:
+            while True:
+                for host in self._free:
+                    if host not in exclude:
+                        break
+                else:
+                    host = self._free[0] if self._free and set(self.hosts) <= exclude else None
+                if host is not None:
+                    self._free.remove(host)
+                    return host
+                self._cond.wait()
+
+    def _put(self, host):
+        with self._cond:
+            self._free.append(host)
+            self._cond.notify_all()
+
+    def _release(self, host, ok):
+        with self._cond:
+            failures = self._failures[host] = 0 if ok else self._failures[host] + 1
+            quarantine = failures >= QUARANTINE_AFTER and len(self.hosts) > 1
+            if quarantine:
+                self._failures[host] = 0
+        if quarantine:
+            logger.warning(f'Render host {host} failed {failures} tasks in a row, '
+                           f'resting it for {QUARANTINE_SECONDS}s')
+            timer = threading.Timer(QUARANTINE_SECONDS, self._put, args=(host,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._put(host)
+
+    def run(self, task, exclude=None):
+        host = self._take(exclude or set())
+        ok = False
+        try:
+            payload = dict(task, image=base64.b64encode(task['image']).decode('ascii'))
+            resp = self.session.post(f'{host}/render', json=payload, timeout=self.timeout)
+            if resp.status_code != 200:
+                raise ShardError(f'{host} answered HTTP {resp.status_code}: {resp.text[:200]}', host)
+            result = {'clip': decode_frames(resp.content),
+                      'params': json.loads(resp.headers.get('X-Clip-Params', '{}'))}
+            ok = True
+            return host, result
+        except requests.RequestException as e:
+            raise ShardError(f'{host} unreachable: {e}', host) from e
+        finally:
+            self._release(host, ok)
+
+    @property
+    def concurrency(self):
+        return len(self.hosts)
+
+    def close(self):
+        self.session.close()
+
+
+class ShardedRenderer:
+    """Dispatch tasks to a backend, retrying failed ones, and gather results in order."""
+
+    def __init__(self, backend, retries=None):
+        self.backend = backend
+        self.retries = retries if retries is not None else int(os.environ.get('RENDER_SHARD_RETRIES',
+                                                                              DEFAULT_RETRIES))
+        # Sized on first use: counting local GPUs imports torch, which the web tier avoids at startup
+        self._dispatch = None
+        self._lock = threading.Lock()
+
+    def _dispatcher(self):
+        with self._lock:
+            if self._dispatch is None:
+                self._dispatch = ThreadPoolExecutor(max_workers=self.backend.concurrency,
+                                                    thread_name_prefix='shard')
+            return self._dispatch
+
+    def _run_with_retries(self, task):
+        failed_on = set()
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                with span('shard.task', index=task['index'], attempt=attempt + 1):
+                    worker, result = self.backend.run(task, exclude=failed_on)
+                logger.info(f"Shard task {task['index']} done on {worker}")
+                return result
+            except Exception as e:
+                failed_on.add(getattr(e, 'host', None))
+                METRICS.inc('shard_task_failures_total')
+                logger.warning(f"Shard task {task['index']} failed (attempt {attempt + 1}): {e}")
+                last_error = e
+        raise ShardError(f"Task {task['index']} failed after {self.retries + 1} attempts: {last_error}")
+
+    def render(self, tasks, on_done=None):
+        """Run all tasks; returns their results (see load_result) in task order.
+
+        `on_done(done_count, task)` is called as each task completes.
+        """
+        futures = {self._dispatcher().submit(propagate(self._run_with_retries), task): n for n, task in enumerate(tasks)}
+        results = [None] * len(tasks)
+        for done, future in enumerate(as_completed(futures), start=1):
+            n = futures[future]
+            results[n] = future.result()
+            if on_done is not None:
+                on_done(done, tasks[n])
+        return results
+
+    def close(self):
+        if self._dispatch is not None:
+            self._dispatch.shutdown(wait=False)
+        self.backend.close()
+
+
+def create_renderer(spec=None):
+    """ShardedRenderer for RENDER_SHARDS ('local:N' or comma-separated URLs); None if unset."""
+    spec = spec if spec is not None else os.environ.get('RENDER_SHARDS', '')
+    spec = spec.strip()
+    if not spec:
+        return None
+    if spec.startswith('local'):
+        _, _, count = spec.partition(':')
+        return ShardedRenderer(LocalBackend(workers=int(count or 2),
+                                            clip_dir=os.environ.get('RENDER_SHARD_CLIP_DIR') or None))
+    return ShardedRenderer(HTTPBackend(url.strip().rstrip('/') for url in spec.split(',') if url.strip()))
+
+
+# Render host ------------------------------------------------------------
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """/healthz (liveness) and /readyz (503 until the requested warm-up is done)."""
+        if self.path not in ('/healthz', '/readyz'):
+            self.send_error(404)
+            return
+        health = self.server.generator.health()
+        status = 503 if self.path == '/readyz' and not health['ready'] else 200
+        self._reply(status, json.dumps(health).encode('utf-8'), 'application/json')
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.send_error(404)
+            return
+        try:
+            task = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            task['image'] = base64.b64decode(task['image'])
+            result = render_task(self.server.generator, task)
+        except Exception as e:
+            logger.exception(f'Render task failed: {e}')
+            self._reply(500, str(e).encode('utf-8'), 'text/plain; charset=utf-8')
+            return
+        self._reply(200, encode_frames(result['clip']), 'application/octet-stream',
+                    {'X-Clip-Params': json.dumps(result['params'], default=str)})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _reply(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host, port):
+    from ad_generator import AdGenerator
+
+    server = ThreadingHTTPServer((host, port), _RenderHandler)
+    server.generator = AdGenerator()
+    logger.info(f'Render host listening on http://{host}:{port}')
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve image-to-video render tasks for sharded generation.')
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""Instrumentation: timed spans, Prometheus-style metrics and per-job Chrome traces.
+
+A span times one stage of the pipeline:
+
+    with span('gemini'):
+        ...
+
+and records, under the stage's name, a duration histogram, a call counter, a
+failure counter when the block raises, and the peak resident memory (and
+GPU memory once torch is loaded) seen while it was open. `@timed(name)`
+runs a whole function inside a span.
+
+The process-wide registry `METRICS` also holds ad-hoc counters and
+histograms, plus collectors that turn the caches' stats() into metrics at
+scrape time; `METRICS.render()` produces the Prometheus text format served
+on /metrics.
+
+When TRACE_DIR is set, `trace_job(job_id)` collects every span of a job,
+across the threads it hands work to via `propagate()`, into
+<TRACE_DIR>/<job_id>.trace.json, which chrome://tracing and Perfetto open.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Registry:
+    """Thread-safe store of labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text, buckets=None):
+        with self._lock:
+            self._meta[name] = (kind, help_text, tuple(buckets or DEFAULT_BUCKETS))
+
+    def _kind(self, name, kind):
+        if name not in self._meta:
+            self._meta[name] = (kind, name.replace('_', ' '), DEFAULT_BUCKETS)
+        return self._meta[name]
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._kind(name, COUNTER)
+            key = (name, _labels_key(labels))
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._kind(name, GAUGE)
+            self._values[(name, _labels_key(labels))] = value
+
+    def set_max(self, name, value, **labels):
+        with self._lock:
+            self._kind(name, GAUGE)
+            key = (name, _labels_key(labels))
+            self._values[key] = max(self._values.get(key, value), value)
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            buckets = self._kind(name, HISTOGRAM)[2]
+            key = (name, _labels_key(labels))
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def histogram_totals(self, name):
+        """(sum, count) of every series of histogram `name`, keyed by its sorted (label, value) pairs."""
+        with self._lock:
+            return {key: (entry[1], entry[2]) for (metric, key), entry in self._histograms.items()
+                    if metric == name}
+
+    def register_collector(self, collector):
+        """`collector()` yields (name, kind, help, labels, value) tuples at every scrape."""
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        collected = []
+        for collector in self._collectors:
+            try:
+                collected.extend(collector())
+            except Exception as e:
+                logger.warning(f'Metrics collector {collector!r} failed: {e}')
+        with self._lock:
+            meta = dict(self._meta)
+            values = dict(self._values)
+            histograms = {key: (list(e[0]), e[1], e[2]) for key, e in self._histograms.items()}
+        for name, kind, help_text, labels, value in collected:
+            meta.setdefault(name, (kind, help_text, DEFAULT_BUCKETS))
+            values[(name, _labels_key(labels))] = value
+
+        lines = []
+        for name in sorted(meta):
+            kind, help_text, buckets = meta[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == HISTOGRAM:
+                for (metric, key), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, n in zip(buckets, counts):
+                        lines.append(f'{name}_bucket{_format_labels(key, [("le", repr(float(bound)))])} {n}')
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", "+Inf")])} {count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {total}')
+                    lines.append(f'{name}_count{_format_labels(key)} {count}')
+            else:
+                for (metric, key), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Registry()
+METRICS.describe('stage_duration_seconds', HISTOGRAM, 'Wall time of pipeline stages')
+METRICS.describe('stage_calls_total', COUNTER, 'Pipeline stages entered')
+METRICS.describe('stage_failures_total', COUNTER, 'Pipeline stages that raised')
+METRICS.describe('stage_peak_rss_bytes', GAUGE, 'Highest process RSS observed while a stage was running')
+METRICS.describe('stage_peak_gpu_bytes', GAUGE, 'Highest CUDA memory allocated while a stage was running')
+
+
+# Memory sampling ---------------------------------------------------------
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def gpu_bytes():
+    """CUDA memory allocated by this process, or None if torch is not in use."""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return None
+    try:
+        return torch.cuda.memory_allocated() if torch.cuda.is_available() else None
+    except Exception:
+        return None
+
+
+class _Span:
+    __slots__ = ('name', 'attrs', 'start', 'peak_rss', 'peak_gpu')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.peak_rss = 0
+        self.peak_gpu = None
+
+    def sample(self, rss, gpu):
+        self.peak_rss = max(self.peak_rss, rss)
+        if gpu is not None:
+            self.peak_gpu = max(self.peak_gpu or 0, gpu)
+
+
+class _MemorySampler:
+    """Background thread updating the memory peaks of the open spans every 50 ms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = set()
+        self._thread = None
+
+    def add(self, s):
+        s.sample(rss_bytes(), gpu_bytes())
+        with self._lock:
+            self._open.add(s)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='telemetry-memory', daemon=True)
+                self._thread.start()
+
+    def remove(self, s):
+        with self._lock:
+            self._open.discard(s)
+        s.sample(rss_bytes(), gpu_bytes())
+
+    def _run(self):
+        while True:
+            time.sleep(MEMORY_SAMPLE_INTERVAL)
+            with self._lock:
+                spans = list(self._open)
+            if spans:
+                rss, gpu = rss_bytes(), gpu_bytes()
+                for s in spans:
+                    s.sample(rss, gpu)
+
+
+_sampler = _MemorySampler()
+
+
+# Traces ------------------------------------------------------------------
+
+_current_trace = contextvars.ContextVar('telemetry_trace', default=None)
+
+
+class Trace:
+    """Spans of one job, in the Chrome trace event format."""
+
+    def __init__(self, name):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, attrs):
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self.events.append({
+                'name': name, 'cat': 'stage', 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1),
+                'args': {k: v if isinstance(v, (int, float, bool)) or v is None else str(v)
+                         for k, v in attrs.items()},
+            })
+
+    def dump(self, path):
+        with self._lock:
+            events = list(self.events)
+            names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident, 'args': {'name': name}}
+                     for ident, name in self._threads.items()]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': names + events, 'displayTimeUnit': 'ms', 'otherData': {'job': self.name}}, f)
+        return path
+
+
+@contextmanager
+def trace_job(job_id, directory=None):
+    """Collect the spans of a job into <directory or TRACE_DIR>/<job_id>.trace.json."""
+    directory = directory or os.environ.get('TRACE_DIR')
+    if not directory:
+        with span('job'):
+            yield None
+        return
+    trace = Trace(job_id)
+    token = _current_trace.set(trace)
+    try:
+        with span('job', job_id=job_id):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        try:
+            trace.dump(os.path.join(directory, f'{job_id}.trace.json'))
+        except OSError as e:
+            logger.warning(f'Could not write the trace of job {job_id}: {e}')
+
+
+def propagate(fn):
+    """Wrap `fn` so that spans it opens in another thread join the caller's trace."""
+    trace = _current_trace.get()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return run
+
+
+# Spans -------------------------------------------------------------------
+
+def record_span(name, start, end, status='ok', **attrs):
+    """Record an interval measured elsewhere (perf_counter timestamps) as a stage."""
+    METRICS.observe('stage_duration_seconds', end - start, stage=name)
+    METRICS.inc('stage_calls_total', stage=name)
+    if status != 'ok':
+        METRICS.inc('stage_failures_total', stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, end, dict(attrs, status=status) if status != 'ok' else attrs)
+
+
+@contextmanager
+def span(name, **attrs):
+    s = _Span(name, attrs)
+    _sampler.add(s)
+    status = 'ok'
+    try:
+        yield s
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        _sampler.remove(s)
+        METRICS.set_max('stage_peak_rss_bytes', s.peak_rss, stage=name)
+        if s.peak_gpu is not None:
+            METRICS.set_max('stage_peak_gpu_bytes', s.peak_gpu, stage=name)
+        attrs['peak_rss_mb'] = round(s.peak_rss / 1024 ** 2, 1)
+        record_span(name, s.start, time.perf_counter(), status, **attrs)
+
+
+def timed(name):
+    """Decorator running the function inside `span(name)`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
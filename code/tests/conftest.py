@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de l'application sont importés comme depuis code/ (python app.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
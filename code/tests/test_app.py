@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+from jobs import DONE
+from motion import TIER_PREVIEW
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    """Application sans worker de rendu : les jobs restent en file, les tests les terminent eux-mêmes."""
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ.pop("SVD_WARMUP", None)
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    sys.modules.pop("app", None)
+    import app
+    app.SSE_KEEPALIVE = 0.05
+    yield app
+    os.chdir(cwd)
+
+
+def upload(client, tier=None):
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 180), (30, 60, 90)).save(buffer, "JPEG")
+    data = {"description": "Montre connectée", "language": "fr",
+            "images": [(io.BytesIO(buffer.getvalue()), "photo.jpg")]}
+    if tier:
+        data["tier"] = tier
+    response = client.post("/upload", data=data, content_type="multipart/form-data")
+    assert response.status_code == 302
+
+
+def submit(web, tier=None):
+    client = web.app.test_client()
+    upload(client, tier)
+    response = client.post("/process-generation")
+    assert response.status_code == 202
+    return client, response.get_json()
+
+
+def test_event_stream_ends_when_the_job_store_reports_the_end(web):
+    # Cas d'un worker externe (python jobs.py worker) : la fin n'est visible que dans le magasin de jobs
+    client, links = submit(web)
+    web.job_queue.store.update(links["job_id"], status=DONE, result={"video_path": "static/results/x.mp4"})
+    body = client.get(links["events_url"]).get_data(as_text=True)
+    assert '"stage": "queued"' in body
+    assert '"stage": "done"' in body
+
+
+def test_jobs_are_only_visible_to_the_session_that_submitted_them(web):
+    owner, links = submit(web)
+    web.job_queue.store.update(links["job_id"], status=DONE, result={"video_path": "static/results/x.mp4"})
+    stranger, _ = submit(web)
+    for url in (links["status_url"], links["result_url"], links["events_url"]):
+        assert stranger.get(url).status_code == 404
+        assert owner.get(url).status_code == 200
+    assert stranger.post(f"/jobs/{links['job_id']}/approve").status_code == 404
+
+
+def test_approved_preview_is_rendered_after_new_submissions(web):
+    store = web.job_queue.store
+    while store.claim(timeout=0) is not None:
+        pass
+    client, links = submit(web, TIER_PREVIEW)
+    store.claim(timeout=0)
+    # Seul un aperçu terminé peut être validé
+    assert client.post(f"/jobs/{links['job_id']}/approve").status_code == 409
+    store.update(links["job_id"], status=DONE, result={"video_path": "static/results/p.mp4",
+                                                       "script": "Texte", "audio_path": "out/p.wav"})
+    response = client.post(f"/jobs/{links['job_id']}/approve")
+    assert response.status_code == 202
+    full = response.get_json()["job_id"]
+    _, newer = submit(web)
+    assert store.claim(timeout=0)["id"] == newer["job_id"]
+    job = store.claim(timeout=0)
+    assert job["id"] == full
+    assert job["params"]["tier"] is None
+    assert job["params"]["output_path"].endswith("_video.mp4")
+    assert job["params"]["narration"] == ["Texte", "out/p.wav"]
@@ -0,0 +1,70 @@
+import shutil
+import subprocess
+
+import pytest
+
+from audio_probe import parse_frame_header, probe_audio, probe_mp3
+
+# MPEG-1 couche III, 128 kbit/s, 44,1 kHz, stéréo, sans remplissage : trames de 417 octets
+HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_BYTES = 417
+FRAME_SAMPLES = 1152
+
+
+def id3_tag(payload=b"\0" * 20):
+    size = len(payload)
+    return b"ID3\x03\x00\x00" + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + payload
+
+
+def info_frame(delay, padding):
+    # Étiquette Xing "Info" avec le seul champ "nombre de trames", suivie de l'étiquette LAME
+    body = b"\0" * 32 + b"Info" + (1).to_bytes(4, "big") + (0).to_bytes(4, "big") + b"\0" * 21
+    body += bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+    return HEADER + body + b"\0" * (FRAME_BYTES - 4 - len(body))
+
+
+def mp3(frames, delay=0, padding=0, tagged=True):
+    data = id3_tag() if tagged else b""
+    if delay or padding:
+        data += info_frame(delay, padding)
+    return data + (HEADER + b"\0" * (FRAME_BYTES - 4)) * frames
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_frame_header_is_parsed():
+    assert parse_frame_header(HEADER) == (FRAME_BYTES, FRAME_SAMPLES, 44100, 2)
+    assert parse_frame_header(bytes([0xFF, 0xFB, 0x90, 0xC0]))[3] == 1
+    assert parse_frame_header(b"\0\0\0\0") is None
+    # Index de débit réservé
+    assert parse_frame_header(bytes([0xFF, 0xFB, 0xF0, 0x00])) is None
+
+
+def test_mp3_duration_skips_tags_and_trims_encoder_delay(tmp_path):
+    info = probe_mp3(write(tmp_path / "a.mp3", mp3(10, delay=576, padding=1000)))
+    assert info.duration == pytest.approx((10 * FRAME_SAMPLES - 1576) / 44100)
+    assert (info.sample_rate, info.channels, info.method) == (44100, 2, "frames")
+
+
+def test_mp3_probe_resynchronises_after_garbage(tmp_path):
+    data = mp3(2) + b"\x00\xff\x12junk" + mp3(3, tagged=False) + b"TAG" + b"\0" * 125
+    assert probe_mp3(write(tmp_path / "a.mp3", data)).duration == pytest.approx(5 * FRAME_SAMPLES / 44100)
+
+
+def test_unreadable_mp3_falls_back_to_ffprobe(tmp_path, monkeypatch):
+    import audio_probe
+
+    monkeypatch.setattr(audio_probe, "probe_ffprobe", lambda path: "ffprobe")
+    assert probe_audio(write(tmp_path / "a.mp3", b"not an mp3")) == "ffprobe"
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg absent")
+def test_mp3_duration_matches_the_encoded_audio(tmp_path):
+    path = str(tmp_path / "tone.mp3")
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=1.3:sample_rate=44100",
+                    "-c:a", "libmp3lame", "-b:a", "64k", path], check=True)
+    # Le délai et le remplissage de l'étiquette LAME retirés, il reste exactement la source
+    assert probe_mp3(path).duration == pytest.approx(1.3, abs=1e-4)
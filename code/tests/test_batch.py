@@ -0,0 +1,103 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from batch import DONE, FAILED, SKIPPED, BatchRunner, load_manifest
+
+
+def write_manifest(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_json_and_csv_manifests_are_normalised(tmp_path):
+    items = [{"description": " Montre ", "images": ["a.jpg", "/abs/b.jpg"], "language": "en"}]
+    from_json = load_manifest(write_manifest(tmp_path, "m.json", json.dumps({"items": items})), "out")
+    from_csv = load_manifest(write_manifest(tmp_path, "m.csv", "description,images,language\n"
+                                                               " Montre ,a.jpg; /abs/b.jpg,en\n"), "out")
+    assert from_json == from_csv
+    item = from_json[0]
+    assert item["description"] == "Montre" and item["langue"] == "en"
+    assert item["images"] == [str(tmp_path / "a.jpg"), "/abs/b.jpg"]
+    # Identifiant dérivé du contenu : stable d'une exécution à l'autre
+    assert len(item["id"]) == 12 and item["output"] == os.path.join("out", f"{item['id']}.mp4")
+
+
+def test_invalid_manifests_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        load_manifest(write_manifest(tmp_path, "m.json", json.dumps([{"description": "x"}])), "out")
+    duplicate = [{"id": "a", "description": "x", "images": ["1.jpg"]}] * 2
+    with pytest.raises(ValueError):
+        load_manifest(write_manifest(tmp_path, "m.json", json.dumps(duplicate)), "out")
+
+
+class FakeGenerator:
+    def __init__(self, failing=()):
+        self.narrator = SimpleNamespace(backend=SimpleNamespace(ext="wav"))
+        self.ingestor = SimpleNamespace(submit=lambda paths: None)
+        self.result_cache = SimpleNamespace(relocate=lambda old, new: self.relocated.append((old, new)))
+        self.failing = set(failing)
+        self.scripts = []
+        self.rendered = []
+        self.relocated = []
+
+    def write_script(self, description, langue):
+        self.scripts.append(description)
+        return f"Script : {description}"
+
+    def text_to_speech(self, script, langue, output_file):
+        open(output_file, "wb").close()
+        return output_file, None
+
+    def generate_ad(self, description, langue, images, output_path, title=None, call_to_action=None,
+                    tier=None, narration=None):
+        self.rendered.append((description, narration[0]))
+        if description in self.failing:
+            raise RuntimeError("rendu impossible")
+        open(output_path, "wb").close()
+        return {"video_path": output_path, "audio_duration": 1.0, "dedup": {"runs_saved": 0}}
+
+
+def items(tmp_path, *descriptions):
+    manifest = [{"id": d, "description": d, "images": ["a.jpg"]} for d in descriptions]
+    return load_manifest(write_manifest(tmp_path, "m.json", json.dumps(manifest)), str(tmp_path / "out"))
+
+
+def test_batch_renders_every_item_in_order(tmp_path):
+    generator = FakeGenerator()
+    report = BatchRunner(generator, str(tmp_path / "out"), prefetch=1).run(items(tmp_path, "a", "b", "c"))
+    assert report["counts"] == {DONE: 3, FAILED: 0, SKIPPED: 0}
+    assert generator.rendered == [("a", "Script : a"), ("b", "Script : b"), ("c", "Script : c")]
+    assert sorted(os.listdir(tmp_path / "out")) == [".narration", "a.mp4", "b.mp4", "batch_journal.jsonl", "c.mp4"]
+    # Les narrations préparées d'avance sont supprimées une fois l'élément rendu
+    assert os.listdir(tmp_path / "out" / ".narration") == []
+    assert generator.relocated[0] == (str(tmp_path / "out" / "a.partial.mp4"), str(tmp_path / "out" / "a.mp4"))
+
+
+def test_rerun_resumes_after_failures(tmp_path):
+    out = str(tmp_path / "out")
+    batch = items(tmp_path, "a", "b")
+    first = FakeGenerator(failing={"b"})
+    report = BatchRunner(first, out).run(batch)
+    assert [r["status"] for r in report["items"]] == [DONE, FAILED]
+    assert report["items"][1]["error"] == "RuntimeError: rendu impossible"
+    assert not os.path.exists(os.path.join(out, "b.partial.mp4"))
+
+    second = FakeGenerator()
+    report = BatchRunner(second, out).run(batch)
+    assert [r["status"] for r in report["items"]] == [SKIPPED, DONE]
+    assert report["items"][1]["attempt"] == 2
+    # La narration de l'élément en échec est restée sur disque : ni Gemini ni TTS à nouveau
+    assert second.scripts == [] and second.rendered == [("b", "Script : b")]
+
+
+def test_force_renders_existing_outputs_again(tmp_path):
+    out = str(tmp_path / "out")
+    batch = items(tmp_path, "a")
+    BatchRunner(FakeGenerator(), out).run(batch)
+    generator = FakeGenerator()
+    assert BatchRunner(generator, out, force=True).run(batch)["counts"][DONE] == 1
+    assert generator.rendered == [("a", "Script : a")]
@@ -0,0 +1,72 @@
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from clip_cache import STALE_TMP_SECONDS, ClipCache
+
+
+def frames(value, n=2):
+    return np.full((n, 4, 4, 3), value, dtype=np.uint8)
+
+
+def test_key_depends_on_pixels_and_params_only():
+    pixels = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+    key = ClipCache.key(pixels, engine="svd", steps=25)
+    # Même visuel sous une autre forme (PIL), paramètres dans un autre ordre
+    assert ClipCache.key(Image.fromarray(pixels), steps=25, engine="svd") == key
+    assert ClipCache.key(pixels, engine="svd", steps=20) != key
+    assert ClipCache.key(pixels[::-1], engine="svd", steps=25) != key
+    assert ClipCache.key(pixels.reshape(2, 8, 3), engine="svd", steps=25) != key
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=10 ** 6)
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, frames(7))
+    assert "ab" * 32 in cache
+    np.testing.assert_array_equal(cache.get("ab" * 32), frames(7))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"], stats["entries"]) == (1, 1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    probe = ClipCache(str(tmp_path / "probe"), max_bytes=10 ** 6)
+    probe.put("00" * 32, frames(0))
+    entry_bytes = probe.stats()["bytes"]
+
+    cache = ClipCache(str(tmp_path / "cache"), max_bytes=2 * entry_bytes)
+    cache.put("aa" * 32, frames(1))
+    cache.put("bb" * 32, frames(2))
+    old = time.time() - 100
+    os.utime(cache._path("aa" * 32), (old, old))
+    os.utime(cache._path("bb" * 32), (old - 10, old - 10))
+    # Une lecture rafraîchit l'entrée : c'est "aa" qui devient la plus ancienne
+    cache.get("bb" * 32)
+    cache.put("cc" * 32, frames(3))
+    assert "aa" * 32 not in cache
+    assert "bb" * 32 in cache and "cc" * 32 in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stale_temporary_files_are_removed(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=10 ** 6)
+    stale = tmp_path / "ab" / ".dead.tmp"
+    fresh = tmp_path / "ab" / ".writing.tmp"
+    stale.parent.mkdir()
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    old = time.time() - STALE_TMP_SECONDS - 1
+    os.utime(stale, (old, old))
+    assert cache.stats()["entries"] == 0
+    assert not stale.exists() and fresh.exists()
+
+
+def test_zero_max_bytes_disables_the_cache(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=0)
+    cache.put("ab" * 32, frames(1))
+    assert "ab" * 32 not in cache
+    assert cache.get("ab" * 32) is None
+    assert cache.stats()["writes"] == 0
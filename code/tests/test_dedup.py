@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from dedup import OffsetClip, dhash, hamming_matrix, plan_dedup
+
+
+def gradient(width=64, height=48, flip=False):
+    ramp = np.linspace(0, 255, width, dtype=np.float32)
+    if flip:
+        ramp = ramp[::-1]
+    image = np.repeat(ramp[None, :], height, axis=0)
+    image[: height // 2] *= 0.5
+    return np.stack([image] * 3, axis=-1).astype(np.uint8)
+
+
+def checker(size=64, cell=8):
+    grid = (np.indices((size, size)) // cell).sum(axis=0) % 2
+    return np.stack([grid * 255] * 3, axis=-1).astype(np.uint8)
+
+
+def test_near_duplicates_share_a_hash():
+    image = gradient()
+    recompressed = np.clip(image.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+    distances = hamming_matrix([dhash(image), dhash(recompressed), dhash(gradient(flip=True))])
+    assert distances[0, 1] == 0
+    assert distances[0, 2] > 32
+    assert (distances == distances.T).all() and (np.diag(distances) == 0).all()
+
+
+def test_duplicates_reuse_one_clip_with_staggered_offsets():
+    images = [gradient(), checker(), gradient(), gradient(flip=True), gradient()]
+    plan = plan_dedup(images, threshold=6)
+    assert plan.representative == [0, 1, 0, 3, 0]
+    assert plan.offset == pytest.approx([0.0, 0.0, 1 / 3, 0.0, 2 / 3])
+    assert plan.saved == 2
+    report = plan.report()
+    assert report["groups"] == [[0, 2, 4]]
+    assert (report["images"], report["runs"], report["runs_saved"]) == (5, 3, 2)
+
+
+def test_negative_threshold_disables_dedup(monkeypatch):
+    monkeypatch.setenv("DEDUP_THRESHOLD", "-1")
+    plan = plan_dedup([gradient(), gradient()])
+    assert plan.representative == [0, 1]
+    assert plan.saved == 0
+
+
+def test_offset_clip_rotates_frames_without_copying():
+    frames = np.arange(5)[:, None, None, None] * np.ones((5, 2, 2, 3), dtype=np.uint8)
+    clip = OffsetClip(frames, 0.4)
+    assert len(clip) == 5 and clip.shape == frames.shape
+    assert [int(clip[n][0, 0, 0]) for n in range(5)] == [2, 3, 4, 0, 1]
+    assert int(clip[-1][0, 0, 0]) == 1
+    np.testing.assert_array_equal(np.asarray(clip), np.roll(frames, -2, axis=0))
+    with pytest.raises(IndexError):
+        clip[5]
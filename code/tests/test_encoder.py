@@ -0,0 +1,67 @@
+import re
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from encoder import StreamingEncoder
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg absent")
+
+
+def decoded_seconds(path, stream):
+    """Durée d'un flux ("v" ou "a") telle que la voit FFmpeg en le décodant."""
+    proc = subprocess.run(["ffmpeg", "-hide_banner", "-i", path, "-map", f"0:{stream}", "-f", "null", "-"],
+                          stderr=subprocess.PIPE, text=True, check=True)
+    hours, minutes, seconds = re.findall(r"time=(\d+):(\d+):([\d.]+)", proc.stderr)[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def tone(path, seconds, rate=16000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        t = np.arange(int(seconds * rate)) / rate
+        w.writeframes((np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16).tobytes())
+    return str(path)
+
+
+def encode(path, n_frames, fps=10, **kwargs):
+    with StreamingEncoder(str(path), 32, 16, fps, preset="ultrafast", **kwargs) as encoder:
+        for n in range(n_frames):
+            encoder.write(np.full((16, 32, 3), n * 8, np.uint8))
+    return encoder
+
+
+def test_every_frame_is_encoded(tmp_path):
+    encoder = encode(tmp_path / "out.mp4", 7)
+    assert encoder.frames_written == 7
+    assert decoded_seconds(str(tmp_path / "out.mp4"), "v") == pytest.approx(0.7)
+
+
+def test_short_narration_is_padded_to_the_video_length(tmp_path):
+    out = str(tmp_path / "out.mp4")
+    encode(out, 30, audio_path=tone(tmp_path / "n.wav", 0.4), duration=3.0)
+    assert decoded_seconds(out, "v") == pytest.approx(3.0)
+    assert decoded_seconds(out, "a") == pytest.approx(3.0, abs=0.1)
+
+
+def test_long_narration_is_cut_at_the_video_length(tmp_path):
+    out = str(tmp_path / "out.mp4")
+    encode(out, 20, audio_path=tone(tmp_path / "n.wav", 5.0), duration=2.0)
+    assert decoded_seconds(out, "a") == pytest.approx(2.0, abs=0.15)
+
+
+def test_frames_of_the_wrong_size_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        with StreamingEncoder(str(tmp_path / "out.mp4"), 32, 16, 10) as encoder:
+            encoder.write(np.zeros((32, 16, 3), np.uint8))
+    assert encoder.frames_written == 0
+
+
+def test_ffmpeg_failures_are_reported(tmp_path):
+    with pytest.raises(RuntimeError):
+        encode(tmp_path / "out.mp4", 3, audio_path=str(tmp_path / "missing.wav"))
@@ -0,0 +1,124 @@
+import pytest
+import requests
+
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient, GeminiError, TTLCache
+
+
+def response(status, body=None, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = requests.compat.json.dumps(body if body is not None else {}).encode()
+    resp.headers.update(headers or {})
+    return resp
+
+
+def reply(text):
+    return response(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+
+class ScriptedSession:
+    """Session dont les réponses successives sont fixées à l'avance (une exception est levée)."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.posts = 0
+
+    def post(self, url, params=None, json=None, timeout=None):
+        self.posts += 1
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def close(self):
+        pass
+
+
+def client(*answers, **kwargs):
+    options = dict(api_key="key", api_url="http://gemini.test", retries=2, backoff=0,
+                   breaker_threshold=2, breaker_reset=60, cache_size=16, cache_ttl=60)
+    options.update(kwargs)
+    c = GeminiClient(**options)
+    c.session = ScriptedSession(*answers)
+    return c
+
+
+def test_transient_errors_are_retried():
+    c = client(response(503), requests.ConnectionError("reset"), reply(" Bonjour "))
+    assert c.generate("{}", "texte") == "Bonjour"
+    stats = c.stats()
+    assert (stats["calls"], stats["successes"], stats["retried"], stats["failures"]) == (3, 1, 2, 0)
+
+
+def test_responses_are_cached():
+    c = client(reply("Bonjour"))
+    assert c.generate("{}", "texte") == c.generate("{}", "texte")
+    assert c.session.posts == 1
+    assert c.stats()["cache_hits"] == 1
+
+
+def test_client_errors_fail_at_once_without_opening_the_breaker():
+    c = client(response(400, {"error": "invalid argument"}))
+    for _ in range(5):
+        with pytest.raises(GeminiError) as error:
+            c.generate("{}", "prompt refusé")
+        assert not isinstance(error.value, CircuitOpenError)
+    assert c.session.posts == 5
+    assert c.stats()["breaker"] == CircuitBreaker.CLOSED
+
+
+def test_blocked_answers_do_not_open_the_breaker():
+    # Réponse bloquée par les filtres de sécurité : pas de contenu dans le candidat
+    c = client(response(200, {"candidates": [{"finishReason": "SAFETY"}]}))
+    for _ in range(3):
+        with pytest.raises(GeminiError):
+            c.generate("{}", "texte")
+    assert c.stats()["breaker"] == CircuitBreaker.CLOSED
+
+
+def test_transient_failures_open_the_breaker():
+    c = client(response(503), retries=0)
+    for _ in range(2):
+        with pytest.raises(GeminiError):
+            c.generate("{}", "texte")
+    with pytest.raises(CircuitOpenError):
+        c.generate("{}", "autre texte")
+    assert c.session.posts == 2
+    assert c.stats()["rejected"] == 1
+
+
+def test_missing_api_key_is_reported():
+    with pytest.raises(GeminiError):
+        client(reply("x"), api_key="").generate("{}", "texte")
+
+
+def test_breaker_allows_one_trial_after_the_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("gemini_client.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.failure()
+    assert not breaker.allow()
+    now[0] += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_retry_after_is_respected():
+    c = client(reply("x"))
+    assert c._delay(1, response(429, headers={"Retry-After": "2"})) == 2.0
+    assert c._delay(1, response(429, headers={"Retry-After": "3600"})) == c.timeout[1]
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("gemini_client.time.monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ingest import TARGET_SIZE, ImageIngestor, ImageStore, decode
+
+
+def write_jpeg(path, size=(1600, 900), value=90):
+    Image.new("RGB", size, (value, 2 * value % 256, 40)).save(path, "JPEG", quality=90)
+    return str(path)
+
+
+def test_decode_normalises_to_the_target_size():
+    buffer = io.BytesIO()
+    Image.new("RGB", (3000, 2000), (200, 10, 10)).save(buffer, "JPEG")
+    pixels, original_size = decode(buffer.getvalue())
+    assert pixels.shape == (TARGET_SIZE[1], TARGET_SIZE[0], 3)
+    assert pixels.dtype == np.uint8
+    assert original_size == (3000, 2000)
+
+
+def test_decode_rejects_oversized_images(monkeypatch):
+    monkeypatch.setenv("INGEST_MAX_PIXELS", "100")
+    buffer = io.BytesIO()
+    Image.new("RGB", (20, 20)).save(buffer, "PNG")
+    with pytest.raises(ValueError):
+        decode(buffer.getvalue())
+
+
+def test_each_file_is_decoded_once(tmp_path):
+    ingestor = ImageIngestor(store=ImageStore(), workers=2)
+    paths = [write_jpeg(tmp_path / f"{i}.jpg", value=10 * i) for i in range(3)]
+    first = ingestor.ingest(paths)
+    again = ingestor.ingest(paths)
+    assert [entry.path for entry in first] == paths
+    assert all(a is b for a, b in zip(first, again))
+    assert ingestor.store.stats()["hits"] == 3
+
+
+def test_identical_bytes_share_a_hash(tmp_path):
+    ingestor = ImageIngestor(store=ImageStore(), workers=1)
+    a = write_jpeg(tmp_path / "a.jpg")
+    b = tmp_path / "b.jpg"
+    b.write_bytes(open(a, "rb").read())
+    assert ingestor.get(a).sha256 == ingestor.get(str(b)).sha256
+
+
+def test_store_evicts_least_recently_used_entries(tmp_path):
+    ingestor = ImageIngestor(store=ImageStore(max_bytes=2 * 1024 * 576 * 3), workers=1)
+    a, b, c = (write_jpeg(tmp_path / f"{n}.jpg", value=v) for n, v in (("a", 1), ("b", 2), ("c", 3)))
+    ingestor.get(a)
+    ingestor.get(b)
+    ingestor.get(a)
+    ingestor.get(c)
+    store = ingestor.store
+    assert store.stats()["entries"] == 2
+    assert store.get(b) is None
+    assert store.get(a) is not None
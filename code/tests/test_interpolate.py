@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from interpolate import FLOW, LINEAR, NONE, InterpolatedClip, blend_frames, interpolate_frames, opencv
+
+
+def frames(count=3, height=16, width=24, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (count, height, width, 3), dtype=np.uint8)
+
+
+def test_output_length_follows_frame_rate():
+    clip = InterpolatedClip(frames(14), 7, 24)
+    # 13 intervalles de 1/7 s à 24 fps : 13 * 24 / 7 = 44,57 -> 45 frames
+    assert len(clip) == 45
+    assert clip.shape == (45, 16, 24, 3)
+
+
+def test_source_frames_are_kept_exactly():
+    source = frames()
+    clip = InterpolatedClip(source, 7, 14)
+    assert np.array_equal(clip[0], source[0])
+    assert np.array_equal(clip[2], source[1])
+    assert np.array_equal(clip[len(clip) - 1], source[-1])
+
+
+def test_blend_frames_endpoints_and_midpoint():
+    a = np.full((2, 2, 3), 10, dtype=np.uint8)
+    b = np.full((2, 2, 3), 200, dtype=np.uint8)
+    assert np.array_equal(blend_frames(a, b, 0.0), a)
+    assert np.array_equal(blend_frames(a, b, 1.0), b)
+    assert (blend_frames(a, b, 0.5) == 105).all()
+
+
+@pytest.mark.parametrize("dst_fps", [24, 30])
+def test_to_array_matches_indexing(dst_fps):
+    clip = InterpolatedClip(frames(5), 7, dst_fps, LINEAR)
+    expected = np.stack([clip[n] for n in range(len(clip))])
+    assert np.array_equal(clip.to_array(), expected)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        InterpolatedClip(frames(), 7, 24, "cubic")
+
+
+def test_none_mode_and_lower_rate_return_the_clip_unchanged():
+    source = frames()
+    assert interpolate_frames(source, 7, 24, NONE) is source
+    assert interpolate_frames(source, 24, 7, LINEAR) is source
+
+
+@pytest.mark.skipif(opencv() is None, reason="OpenCV absent")
+def test_flow_mode_renders_two_frames():
+    # Régression : sous NumPy 2, un poids float64 donnait des cartes float64 refusées par cv2.remap
+    source = frames(2, 32, 48)
+    clip = InterpolatedClip(source, 7, 24, FLOW)
+    assert clip.mode == FLOW
+    out = clip.to_array()
+    assert out.shape == (len(clip), 32, 48, 3)
+    assert out.dtype == np.uint8
+    assert np.array_equal(out[0], source[0])
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from jobs import (DONE, FAILED, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, QUEUED, RUNNING, JobQueue,
+                  MemoryJobStore, QueueFullError, SQLiteJobStore, create_store, make_generation_handler)
+from progress import ProgressBus
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore(max_queue=3)
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), max_queue=3)
+
+
+def test_jobs_are_claimed_by_priority_then_age(store):
+    low = store.add({"n": 1}, PRIORITY_LOW)["id"]
+    first = store.add({"n": 2}, PRIORITY_NORMAL)["id"]
+    second = store.add({"n": 3}, PRIORITY_NORMAL)["id"]
+    claimed = [store.claim(timeout=0)["id"] for _ in range(3)]
+    assert claimed == [first, second, low]
+    assert store.claim(timeout=0) is None
+
+
+def test_claim_marks_the_job_running(store):
+    job_id = store.add({"description": "x"})["id"]
+    assert store.get(job_id)["status"] == QUEUED
+    job = store.claim(timeout=0)
+    assert job["status"] == RUNNING and job["params"] == {"description": "x"}
+    assert store.get(job_id)["started_at"] is not None
+
+
+def test_full_queue_applies_backpressure(store):
+    for n in range(3):
+        store.add({"n": n})
+    with pytest.raises(QueueFullError):
+        store.add({"n": 3}, PRIORITY_HIGH)
+    store.claim(timeout=0)
+    store.add({"n": 3})
+    assert store.count_queued() == 3
+
+
+def test_results_round_trip(store):
+    job_id = store.add({})["id"]
+    store.update(job_id, status=DONE, result={"video_path": "a.mp4"}, finished_at=1.0)
+    job = store.get(job_id)
+    assert (job["status"], job["result"]) == (DONE, {"video_path": "a.mp4"})
+    assert store.get("missing") is None
+
+
+def test_sqlite_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_id = SQLiteJobStore(path, 8).add({"n": 1})["id"]
+    SQLiteJobStore(path, 8).claim(timeout=0)
+    # Worker mort en cours de rendu : le job repart en file au démarrage suivant
+    restarted = SQLiteJobStore(path, 8)
+    restarted.requeue_stale()
+    assert restarted.claim(timeout=0)["id"] == job_id
+
+
+def test_queue_runs_jobs_and_records_failures():
+    done = threading.Event()
+
+    def handler(params, job_id):
+        if params.get("fail"):
+            raise RuntimeError("boom")
+        done.set()
+        return {"video_path": params["out"]}
+
+    queue = JobQueue(handler, store=MemoryJobStore(8), workers=1)
+    failing = queue.submit({"fail": True})
+    ok = queue.submit({"out": "a.mp4"})
+    queue.start()
+    try:
+        assert done.wait(5)
+        for _ in range(100):
+            if queue.status(ok)["status"] == DONE:
+                break
+            threading.Event().wait(0.01)
+    finally:
+        queue.stop(timeout=5)
+    assert queue.status(ok)["result"] == {"video_path": "a.mp4"}
+    failed = queue.status(failing)
+    assert (failed["status"], failed["error"]) == (FAILED, "boom")
+    assert queue.status("missing") is None
+
+
+class FakeGenerator:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def generate_ad(self, description, language, image_paths, output_path, title, call_to_action,
+                    progress=None, tier=None, narration=None):
+        progress({'stage': 'video', 'fraction': 0.5})
+        if self.fail:
+            raise RuntimeError("GPU indisponible")
+        return {'video_path': output_path, 'script': description, 'audio_path': None, 'extra': 1}
+
+
+PARAMS = {'description': "d", 'image_paths': [], 'output_path': "out.mp4"}
+
+
+def test_generation_handler_publishes_progress_and_done():
+    bus = ProgressBus()
+    result = make_generation_handler(FakeGenerator(), bus)(PARAMS, "job")
+    assert result == {'video_path': "out.mp4", 'script': "d", 'audio_path': None}
+    events, _ = bus.wait("job", timeout=0)
+    assert [event['stage'] for event in events] == ['video', 'done']
+
+
+def test_generation_handler_publishes_errors():
+    bus = ProgressBus()
+    handler = make_generation_handler(lambda: FakeGenerator(fail=True), bus)
+    with pytest.raises(RuntimeError):
+        handler(PARAMS, "job")
+    event = bus.latest("job")
+    assert (event['stage'], event['message']) == ('error', "GPU indisponible")
+
+
+def test_create_store_rejects_unknown_backends():
+    with pytest.raises(ValueError):
+        create_store("redis", 8)
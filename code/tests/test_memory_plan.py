@@ -0,0 +1,68 @@
+import pytest
+
+from memory_plan import GB, SAFETY_MARGIN, estimate_bytes, is_out_of_memory, plan_memory, smaller_plan
+
+
+@pytest.fixture(autouse=True)
+def no_forced_dtype(monkeypatch):
+    monkeypatch.delenv("SVD_DTYPE", raising=False)
+    monkeypatch.delenv("SVD_MEMORY_BUDGET_GB", raising=False)
+
+
+def test_a_large_gpu_keeps_everything_on_the_device():
+    plan = plan_memory("cuda", free_bytes=80 * GB)
+    assert (plan.dtype, plan.offload, plan.decode_chunk_size, plan.level) == ("float16", "none", 8, 0)
+
+
+def test_the_chosen_plan_fits_the_budget():
+    for free_gb in (4, 8, 12, 16, 24):
+        plan = plan_memory("cuda", free_bytes=free_gb * GB)
+        assert estimate_bytes(plan) <= free_gb * GB * SAFETY_MARGIN
+        # Le cran précédent, plus confortable, n'aurait pas tenu
+        if plan.level:
+            bigger = plan_memory("cuda", free_bytes=10 ** 6 * GB)
+            while bigger.level < plan.level - 1:
+                bigger = smaller_plan(bigger)
+            assert estimate_bytes(bigger) > free_gb * GB * SAFETY_MARGIN
+
+
+def test_smaller_frames_need_less_memory():
+    plan = plan_memory("cuda", free_bytes=80 * GB)
+    assert estimate_bytes(plan, num_frames=7, width=512, height=288) < estimate_bytes(plan)
+
+
+def test_without_enough_memory_the_most_frugal_plan_is_used():
+    plan = plan_memory("cuda", free_bytes=GB // 2)
+    assert plan.offload == "sequential" and smaller_plan(plan) is None
+
+
+def test_cpu_prefers_float32_then_bfloat16():
+    assert plan_memory("cpu", free_bytes=80 * GB).dtype == "float32"
+    assert plan_memory("cpu", free_bytes=12 * GB).dtype == "bfloat16"
+
+
+def test_forced_dtype_limits_the_ladder(monkeypatch):
+    monkeypatch.setenv("SVD_DTYPE", "bfloat16")
+    plan = plan_memory("cpu", free_bytes=80 * GB)
+    levels = []
+    while plan is not None:
+        assert plan.dtype == "bfloat16"
+        levels.append(plan.level)
+        plan = smaller_plan(plan)
+    assert levels == [3, 4, 5]
+    monkeypatch.setenv("SVD_DTYPE", "float64")
+    with pytest.raises(ValueError):
+        plan_memory("cpu", free_bytes=80 * GB)
+
+
+def test_budget_variable_overrides_the_measure(monkeypatch):
+    monkeypatch.setenv("SVD_MEMORY_BUDGET_GB", "80")
+    assert plan_memory("cuda").level == 0
+
+
+def test_out_of_memory_errors_are_recognised():
+    assert is_out_of_memory(MemoryError())
+    assert is_out_of_memory(RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB"))
+    assert is_out_of_memory(RuntimeError("DefaultCPUAllocator: can't allocate memory"))
+    assert not is_out_of_memory(RuntimeError("shape mismatch"))
+    assert not is_out_of_memory(ValueError("out of memory"))
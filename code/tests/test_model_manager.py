@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from memory_plan import plan_memory
+from model_manager import COLD, READY, ModelManager
+
+
+class FakeManager(ModelManager):
+    """ModelManager sans torch : le « pipeline » est un objet, chargé selon le plan courant."""
+
+    @property
+    def device(self):
+        return "cpu"
+
+    def _load(self):
+        if self.plan is None:
+            self.plan = plan_memory(self.device, free_bytes=None)
+        self._pipe = {"dtype": self.plan.dtype, "offload": self.plan.offload}
+        self.load_count += 1
+        self._last_used = time.monotonic()
+        return self._pipe
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.delenv("SVD_DTYPE", raising=False)
+    monkeypatch.setenv("SVD_MEMORY_BUDGET_GB", "1000")
+    return FakeManager(idle_timeout=0)
+
+
+def test_pipeline_is_loaded_once_and_reused(manager):
+    assert manager.state == COLD
+    with manager.pipeline() as first:
+        pass
+    with manager.pipeline() as second:
+        pass
+    assert first is second
+    assert manager.load_count == 1
+    assert manager.reuse_count == 1
+    assert manager.state == READY
+
+
+def test_degrade_reloads_with_the_smaller_plan(manager):
+    manager.load()
+    assert manager.plan.dtype == "float32"
+    # float32/8 -> float32/4 : seul le découpage du décodage change, le pipeline est gardé
+    assert manager.degrade()
+    assert manager.is_loaded and manager.plan.decode_chunk_size == 4
+    # -> float32/2 avec forward chunking : rechargement nécessaire
+    assert manager.degrade()
+    assert not manager.is_loaded
+    manager.load()
+    assert manager.plan.forward_chunking
+    assert manager.load_count == 2
+
+
+def test_degrade_while_leased_waits_for_the_next_load(manager):
+    manager.degrade()
+    manager.degrade()
+    with manager.pipeline() as pipe:
+        assert manager.degrade()
+        # Le pipeline résident est toujours en float32 : le plan annoncé doit le rester
+        assert pipe["dtype"] == "float32"
+        assert manager.current_plan().dtype == "float32"
+        assert manager.stats()["memory_plan"]["dtype"] == "float32"
+        assert manager.pending_plan.dtype == "bfloat16"
+    # Fin de l'inférence : le pipeline est libéré puis rechargé avec le plan en attente
+    assert not manager.is_loaded
+    with manager.pipeline() as pipe:
+        assert pipe["dtype"] == "bfloat16"
+    assert manager.current_plan().dtype == "bfloat16"
+    assert manager.pending_plan is None
+
+
+def test_degrade_fails_at_the_bottom_of_the_ladder(manager):
+    while manager.degrade():
+        pass
+    assert manager.current_plan().decode_chunk_size == 1
+    assert manager.oom_count == 6
+
+
+def test_unload_is_refused_while_leased(manager):
+    with manager.pipeline():
+        assert not manager.unload()
+    assert manager.unload()
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from memory_plan import plan_memory, smaller_plan
+from motion import KenBurnsEngine, SVDEngine
+
+
+def photo(width=64, height=36):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    pixels = np.stack([np.tile(x, (height, 1)), np.tile(x[::-1], (height, 1)), np.full((height, width), 90, np.uint8)],
+                      axis=-1)
+    return Image.fromarray(pixels)
+
+
+def test_kenburns_clip_length_and_shape():
+    events = []
+    clip = KenBurnsEngine(fps=10, duration=1.2, size=(32, 18)).animate(photo(), progress=events.append)
+    assert len(clip) == 12 and clip.shape == (12, 18, 32, 3)
+    assert clip[0].shape == (18, 32, 3) and clip[0].dtype == np.uint8
+    np.testing.assert_array_equal(clip.to_array()[-1], clip[-1])
+    with pytest.raises(IndexError):
+        clip[12]
+    assert events[-1]["stage"] == "motion" and events[-1]["motion"] == "zoom_in"
+
+
+def test_zoom_in_starts_on_the_full_image_and_moves():
+    image = photo()
+    clip = KenBurnsEngine(fps=10, duration=1.0, crossfade=0).animate(image)
+    np.testing.assert_array_equal(clip[0], np.asarray(image))
+    assert not np.array_equal(clip[5], clip[0])
+
+
+def test_motions_cycle_with_the_image_index():
+    engine = KenBurnsEngine()
+    assert [engine.animate(photo(), index=i).motion for i in range(5)] == [
+        "zoom_in", "pan_right", "zoom_out", "pan_left", "zoom_in"]
+
+
+def test_clip_end_fades_into_its_first_frame():
+    clip = KenBurnsEngine(fps=10, duration=1.0, crossfade=0.3).animate(photo(), index=1)
+    first = clip[0].astype(int)
+    gaps = [np.abs(clip[n].astype(int) - first).mean() for n in (6, 7, 8, 9)]
+    assert gaps[1] > gaps[2] > gaps[3]
+
+
+class FakeModelManager:
+    model_id = "svd-xt"
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.plan = plan_memory("cuda", free_bytes=10 ** 12)
+        self.calls = []
+
+    def current_plan(self):
+        return self.plan
+
+    def degrade(self):
+        self.plan = smaller_plan(self.plan)
+        return self.plan is not None
+
+    def seeded_generator(self, seed):
+        return seed
+
+    @contextmanager
+    def pipeline(self):
+        def pipe(image, **kwargs):
+            self.calls.append(kwargs["decode_chunk_size"])
+            kwargs["callback_on_step_end"](None, 0, 0, {})
+            if self.failures:
+                raise self.failures.pop(0)
+            frame = np.zeros((4, 4, 3), np.uint8)
+            return SimpleNamespace(frames=[[frame] * kwargs["num_frames"]])
+        yield pipe
+
+
+SVD_PARAMS = {"num_frames": 3, "num_inference_steps": 1, "decode_chunk_size": 8, "seed": 0}
+
+
+def test_svd_retries_with_a_smaller_plan_after_out_of_memory():
+    manager = FakeModelManager([RuntimeError("CUDA out of memory"), RuntimeError("CUDA out of memory")])
+    engine = SVDEngine(manager, SVD_PARAMS)
+    assert engine.animate(photo()).shape == (3, 4, 4, 3)
+    assert manager.calls == [8, 8, 4]
+    assert engine.clip_params()["decode_chunk_size"] == 4
+
+
+def test_svd_does_not_retry_other_errors():
+    manager = FakeModelManager([ValueError("image invalide")])
+    with pytest.raises(ValueError):
+        SVDEngine(manager, SVD_PARAMS).animate(photo())
+    assert manager.calls == [8]
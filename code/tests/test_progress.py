@@ -0,0 +1,69 @@
+import threading
+
+from progress import ProgressBus, emit_progress, format_sse, monotonic_progress, scaled_progress
+
+
+def test_wait_returns_events_newer_than_last_id():
+    bus = ProgressBus()
+    bus.publish("job", {"stage": "script", "fraction": 0.1})
+    bus.publish("job", {"stage": "audio", "fraction": 0.2})
+    events, finished = bus.wait("job", last_id=1, timeout=0)
+    assert [e["stage"] for e in events] == ["audio"]
+    assert not finished
+    assert bus.latest("job")["stage"] == "audio"
+
+
+def test_wait_wakes_up_on_publish():
+    bus = ProgressBus()
+    timer = threading.Timer(0.05, bus.publish, args=("job", {"stage": "image", "fraction": 0.5}))
+    timer.start()
+    events, _ = bus.wait("job", timeout=5)
+    timer.join()
+    assert events[0]["stage"] == "image"
+
+
+def test_terminal_event_closes_the_channel():
+    bus = ProgressBus()
+    bus.publish("job", {"stage": "done", "fraction": 1.0})
+    events, finished = bus.wait("job", timeout=5)
+    assert finished and events[-1]["stage"] == "done"
+
+
+def test_finish_publishes_a_single_terminal_event():
+    bus = ProgressBus()
+    assert bus.finish("job", {"stage": "done", "fraction": 1.0})
+    assert not bus.finish("job", {"stage": "error", "fraction": 1.0})
+    events, finished = bus.wait("job", timeout=0)
+    assert finished and [e["stage"] for e in events] == ["done"]
+
+
+def test_history_is_bounded():
+    bus = ProgressBus(history=3)
+    for i in range(10):
+        bus.publish("job", {"stage": "image", "fraction": i / 10})
+    events, _ = bus.wait("job", timeout=0)
+    assert [e["id"] for e in events] == [8, 9, 10]
+
+
+def test_scaled_and_monotonic_progress():
+    seen = []
+    progress = monotonic_progress(seen.append)
+    scaled_progress(progress, 0.5, 1.0, image=2)({"stage": "diffusion", "fraction": 0.5})
+    # Une étape concurrente qui rapporte une fraction plus basse ne fait pas reculer la barre
+    scaled_progress(progress, 0.0, 0.5)({"stage": "audio", "fraction": 0.2})
+    assert [(e["stage"], e["fraction"]) for e in seen] == [("diffusion", 0.75), ("audio", 0.75)]
+    assert seen[0]["image"] == 2
+
+
+def test_emit_progress_clamps_and_survives_broken_callbacks():
+    seen = []
+    emit_progress(seen.append, "encode", 1.5, message="ok", image=1)
+    assert seen == [{"stage": "encode", "fraction": 1.0, "message": "ok", "image": 1}]
+    emit_progress(lambda event: 1 / 0, "encode", 0.5)
+    emit_progress(None, "encode", 0.5)
+
+
+def test_format_sse():
+    text = format_sse({"id": 3, "stage": "done"})
+    assert text.startswith("id: 3\nevent: progress\ndata: {")
+    assert text.endswith("\n\n")
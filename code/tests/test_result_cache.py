@@ -0,0 +1,103 @@
+import os
+import threading
+
+import pytest
+
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(index_path=str(tmp_path / "cache" / "results.json"))
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"image_{i}.jpg"
+        path.write_bytes(bytes([i]) * 100)
+        paths.append(str(path))
+    return paths
+
+
+def video(tmp_path, name="ad.mp4"):
+    path = tmp_path / name
+    path.write_bytes(b"\x00" * 10)
+    return str(path)
+
+
+def test_fingerprint_is_canonical(tmp_path, images):
+    a = ResultCache.fingerprint("Sac  à dos\n léger", "FR", images, engine="svd")
+    assert a == ResultCache.fingerprint(" Sac à dos léger ", "fr", images, engine="svd")
+    assert a != ResultCache.fingerprint("Sac à dos léger", "fr", images[::-1], engine="svd")
+    assert a != ResultCache.fingerprint("Sac à dos léger", "fr", images, engine="kenburns")
+
+
+def test_second_request_reuses_the_render(tmp_path, cache):
+    calls = []
+
+    def render():
+        calls.append(1)
+        return {"video_path": video(tmp_path)}
+
+    assert cache.get_or_run("f", render)["cached"] is False
+    assert cache.get_or_run("f", render)["cached"] == "hit"
+    assert len(calls) == 1
+    # Un autre processus relit l'index sur disque
+    assert ResultCache(index_path=cache.index_path).lookup("f")["video_path"] == video(tmp_path)
+
+
+def test_identical_concurrent_requests_attach_to_one_render(tmp_path, cache):
+    started, release = threading.Event(), threading.Event()
+
+    def render():
+        started.set()
+        release.wait(5)
+        return {"video_path": video(tmp_path)}
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_run("f", render)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_run("f", render)))
+    waiter.start()
+    release.set()
+    owner.join()
+    waiter.join()
+    assert sorted(str(r["cached"]) for r in results) == ["False", "attached"]
+
+
+def test_entries_whose_video_was_deleted_are_dropped(tmp_path, cache):
+    path = video(tmp_path)
+    cache.store("f", {"video_path": path})
+    os.remove(path)
+    assert cache.lookup("f") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_deleted_narration_is_not_returned(tmp_path, cache):
+    narration = tmp_path / "narration.mp3"
+    narration.write_bytes(b"ID3")
+    cache.store("f", {"video_path": video(tmp_path), "audio_path": str(narration)})
+    assert cache.lookup("f")["audio_path"] == str(narration)
+    os.remove(narration)
+    assert "audio_path" not in cache.lookup("f")
+
+
+def test_relocate_follows_a_renamed_video(tmp_path, cache):
+    partial = video(tmp_path, "ad.partial.mp4")
+    cache.store("f", {"video_path": partial})
+    final = str(tmp_path / "ad.mp4")
+    os.replace(partial, final)
+    assert cache.relocate(partial, final) == 1
+    assert cache.lookup("f")["video_path"] == final
+
+
+def test_index_is_capped(tmp_path):
+    cache = ResultCache(index_path=str(tmp_path / "results.json"), max_entries=2)
+    path = video(tmp_path)
+    for name in "abc":
+        cache.store(name, {"video_path": path})
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") and cache.lookup("c")
@@ -0,0 +1,99 @@
+import os
+import threading
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+from audio_probe import probe_audio
+from dedup import plan_dedup
+from scheduler import PipelineScheduler
+
+
+def silence(path, seconds=0.5, rate=8000):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(seconds * rate))
+    return path
+
+
+class FakeGenerator:
+    """Générateur dont la diffusion attend la fin du script : elle doit tourner en parallèle."""
+
+    def __init__(self, fail_clips=False):
+        self.narrator = SimpleNamespace(backend=SimpleNamespace(ext="wav"))
+        self.script_written = threading.Event()
+        self.fail_clips = fail_clips
+        self.assembled = None
+
+    def select_motion_engine(self):
+        return SimpleNamespace(fps=7)
+
+    def plan_images(self, image_paths):
+        return plan_dedup([])
+
+    def write_script(self, description, langue):
+        self.script_written.set()
+        return f"Script : {description}"
+
+    def text_to_speech(self, script, langue, output_file):
+        silence(output_file)
+        return output_file, probe_audio(output_file)
+
+    def generate_clips(self, image_paths, engine, progress=None, plan=None):
+        if self.fail_clips:
+            raise RuntimeError("diffusion impossible")
+        assert self.script_written.wait(5)
+        return ["clip"] * len(image_paths)
+
+    def assemble_ad_video(self, clips, image_paths, audio_path, output_path, title, call_to_action,
+                          progress=None, clip_fps=None, workspace=None, audio_duration=None, **render):
+        self.assembled = {"audio_path": audio_path, "workspace": workspace.path, "audio_duration": audio_duration,
+                          "clip_fps": clip_fps, "render": render}
+        open(output_path, "wb").close()
+        return output_path
+
+
+@pytest.fixture(autouse=True)
+def workspace_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE_ROOT", str(tmp_path / "ws"))
+
+
+def test_narration_overlaps_diffusion_and_the_workspace_is_removed(tmp_path):
+    generator = FakeGenerator()
+    result = PipelineScheduler(generator).run("montre", "fr", ["a.jpg"], str(tmp_path / "ad.mp4"),
+                                              render={"width": 512})
+    assert result["script"] == "Script : montre"
+    assert result["audio_duration"] == pytest.approx(0.5)
+    assert "audio_path" not in result
+    assert generator.assembled["clip_fps"] == 7 and generator.assembled["render"] == {"width": 512}
+    assert os.path.dirname(generator.assembled["audio_path"]) == generator.assembled["workspace"]
+    assert os.listdir(tmp_path / "ws") == []
+
+
+def test_kept_narration_is_copied_next_to_the_video(tmp_path):
+    result = PipelineScheduler(FakeGenerator()).run("montre", "fr", ["a.jpg"], str(tmp_path / "ad.mp4"),
+                                                    keep_narration=True)
+    assert result["audio_path"] == str(tmp_path / "ad_narration.wav")
+    assert probe_audio(result["audio_path"]).duration == pytest.approx(0.5)
+
+
+def test_existing_narration_skips_script_and_speech(tmp_path):
+    generator = FakeGenerator()
+    generator.script_written.set()
+    generator.write_script = None
+    audio = silence(str(tmp_path / "preview.wav"), seconds=1.0)
+    result = PipelineScheduler(generator).run("montre", "fr", ["a.jpg"], str(tmp_path / "ad.mp4"),
+                                              narration=("Script validé", audio), keep_narration=True)
+    assert result["script"] == "Script validé"
+    assert result["audio_duration"] == pytest.approx(1.0)
+    # La narration appartient à l'appelant : ni copiée ni rapportée
+    assert generator.assembled["audio_path"] == audio and "audio_path" not in result
+
+
+def test_diffusion_errors_propagate_and_clean_up(tmp_path):
+    with pytest.raises(RuntimeError, match="diffusion impossible"):
+        PipelineScheduler(FakeGenerator(fail_clips=True)).run("montre", "fr", ["a.jpg"], str(tmp_path / "ad.mp4"))
+    assert os.listdir(tmp_path / "ws") == []
@@ -0,0 +1,171 @@
+import io
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+from PIL import Image
+
+import shard
+from shard import (HTTPBackend, LocalBackend, ShardError, ShardedRenderer, create_renderer, encode_frames,
+                   load_result, make_task, render_task)
+
+
+def jpeg_bytes(value=128):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 36), (value, value, value)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FakeEngine:
+    name = "svd"
+
+    def __init__(self):
+        self.dtype = "float16"
+
+    def clip_params(self):
+        return {"num_frames": 2, "dtype": self.dtype}
+
+
+class FakeGenerator:
+    """Anime en renvoyant deux frames constantes ; simule une dégradation du plan pendant le rendu."""
+
+    def __init__(self, degrade=False):
+        self.engine = FakeEngine()
+        self.motion_engines = {"svd": self.engine}
+        self.degrade = degrade
+
+    def health(self):
+        return {"state": "cold", "ready": False}
+
+    def animate_image(self, image, engine, index=0, progress=None):
+        if self.degrade:
+            engine.dtype = "bfloat16"
+        return np.full((2, 4, 4, 3), index, dtype=np.uint8)
+
+
+def test_render_task_reports_the_plan_used_after_rendering():
+    result = render_task(FakeGenerator(degrade=True), make_task(3, "svd", jpeg_bytes()))
+    assert result["params"] == {"num_frames": 2, "dtype": "bfloat16"}
+    assert (load_result(result) == 3).all()
+
+
+def test_clip_file_results_are_loaded_then_removed(tmp_path):
+    result = render_task(FakeGenerator(), make_task(1, "svd", jpeg_bytes()), clip_dir=str(tmp_path))
+    assert isinstance(result["clip"], str) and os.path.exists(result["clip"])
+    assert load_result(result).shape == (2, 4, 4, 3)
+    assert not os.listdir(tmp_path)
+
+
+def test_create_renderer_wires_the_clip_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("RENDER_SHARD_CLIP_DIR", str(tmp_path / "clips"))
+    renderer = create_renderer("local:2")
+    assert renderer.backend.clip_dir == str(tmp_path / "clips")
+    assert os.path.isdir(renderer.backend.clip_dir)
+    assert create_renderer("") is None
+
+
+def test_local_concurrency_is_capped_by_visible_gpus(monkeypatch):
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "3,5")
+    assert LocalBackend(workers=4).concurrency == 2
+    assert LocalBackend(workers=1).concurrency == 1
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+    monkeypatch.setattr(shard, "visible_gpus", lambda: [])
+    assert LocalBackend(workers=4).concurrency == 4
+
+
+class FlakyBackend:
+    """Échoue `failures` fois par tâche, en désignant l'hôte fautif, puis réussit."""
+
+    concurrency = 2
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = {}
+        self.excluded = []
+        self._lock = threading.Lock()
+
+    def run(self, task, exclude=None):
+        with self._lock:
+            count = self.calls[task["index"]] = self.calls.get(task["index"], 0) + 1
+            self.excluded.append(set(exclude))
+        if count <= self.failures:
+            raise ShardError("boom", host=f"host{count}")
+        return "host", {"clip": task["index"], "params": {}}
+
+    def close(self):
+        pass
+
+
+def test_failed_tasks_are_retried_on_other_hosts():
+    backend = FlakyBackend(failures=2)
+    renderer = ShardedRenderer(backend, retries=2)
+    results = renderer.render([make_task(i, "svd", b"") for i in range(3)])
+    assert [r["clip"] for r in results] == [0, 1, 2]
+    assert {"host1", "host2"} in backend.excluded
+
+
+def test_task_fails_after_its_retries():
+    renderer = ShardedRenderer(FlakyBackend(failures=5), retries=1)
+    with pytest.raises(ShardError):
+        renderer.render([make_task(0, "svd", b"")])
+
+
+class FakeSession:
+    """Session HTTP dont certains hôtes sont injoignables."""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        host = url.rsplit("/", 1)[0]
+        self.posts.append(host)
+        if host in self.down:
+            raise requests.ConnectionError("refused")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = encode_frames(np.zeros((1, 2, 2, 3), dtype=np.uint8))
+        response.headers["X-Clip-Params"] = '{"dtype": "float16"}'
+        return response
+
+    def close(self):
+        pass
+
+
+def test_http_backend_quarantines_a_failing_host(monkeypatch):
+    monkeypatch.setattr(shard, "QUARANTINE_SECONDS", 60)
+    backend = HTTPBackend(["http://a", "http://b"])
+    backend.session = FakeSession(down={"http://a"})
+    for _ in range(shard.QUARANTINE_AFTER):
+        with pytest.raises(ShardError):
+            backend.run(make_task(0, "svd", b""), exclude={"http://b"})
+    assert backend._free == ["http://b"]
+    host, result = backend.run(make_task(0, "svd", b""))
+    assert host == "http://b"
+    assert result["params"] == {"dtype": "float16"}
+
+
+def test_http_backend_falls_back_to_an_excluded_host_when_all_failed():
+    backend = HTTPBackend(["http://a"])
+    backend.session = FakeSession()
+    host, _ = backend.run(make_task(0, "svd", b""), exclude={"http://a"})
+    assert host == "http://a"
+
+
+def test_render_host_round_trip():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), shard._RenderHandler)
+    server.generator = FakeGenerator(degrade=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = HTTPBackend([f"http://127.0.0.1:{server.server_port}"])
+        _, result = backend.run(make_task(7, "svd", jpeg_bytes()))
+        assert (load_result(result) == 7).all()
+        assert result["params"] == {"num_frames": 2, "dtype": "bfloat16"}
+        base = f"http://127.0.0.1:{server.server_port}"
+        assert requests.get(f"{base}/healthz", timeout=5).json() == {"state": "cold", "ready": False}
+        assert requests.get(f"{base}/readyz", timeout=5).status_code == 503
+    finally:
+        server.shutdown()
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from telemetry import HISTOGRAM, METRICS, Registry, propagate, span, timed, trace_job
+
+
+def test_registry_renders_the_prometheus_text_format():
+    registry = Registry()
+    registry.describe("latency_seconds", HISTOGRAM, "Latence", buckets=(0.1, 1))
+    registry.observe("latency_seconds", 0.05, route="/a")
+    registry.observe("latency_seconds", 0.5, route="/a")
+    registry.inc("requests_total", route="/a")
+    registry.inc("requests_total", 2, route="/a")
+    registry.set_max("peak_bytes", 10)
+    registry.set_max("peak_bytes", 5)
+    registry.register_collector(lambda: [("cache_entries", "gauge", "Entrées", {}, 3)])
+    registry.register_collector(lambda: 1 / 0)
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    # Les compteurs de buckets sont cumulatifs
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{route="/a"} 2' in lines
+    assert 'requests_total{route="/a"} 3' in lines
+    assert "peak_bytes 10" in lines
+    assert "cache_entries 3" in lines
+    assert registry.histogram_totals("latency_seconds") == {(("route", "/a"),): (0.55, 2)}
+
+
+def stage_totals(name):
+    return METRICS.histogram_totals("stage_duration_seconds").get((("stage", name),), (0.0, 0))
+
+
+def test_spans_count_calls_and_failures():
+    calls = stage_totals("test.span")[1]
+
+    @timed("test.span")
+    def stage(fail):
+        if fail:
+            raise ValueError("échec")
+
+    stage(False)
+    with pytest.raises(ValueError):
+        stage(True)
+    assert stage_totals("test.span")[1] == calls + 2
+    rendered = METRICS.render()
+    assert 'stage_failures_total{stage="test.span"} 1' in rendered
+    assert 'stage_peak_rss_bytes{stage="test.span"}' in rendered
+
+
+def test_job_trace_collects_spans_from_helper_threads(tmp_path):
+    def narrate():
+        with span("test.narration", backend="fake"):
+            pass
+
+    with trace_job("job1", directory=str(tmp_path)):
+        with span("test.diffusion"):
+            worker = threading.Thread(target=propagate(narrate), name="narration")
+            worker.start()
+            worker.join()
+        # Un thread non propagé n'appartient pas à la trace
+        orphan = threading.Thread(target=narrate)
+        orphan.start()
+        orphan.join()
+
+    trace = json.loads((tmp_path / "job1.trace.json").read_text())
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert sorted(event["name"] for event in spans) == ["job", "test.diffusion", "test.narration"]
+    narration = next(event for event in spans if event["name"] == "test.narration")
+    assert narration["args"]["backend"] == "fake"
+    threads = {event["tid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert threads[narration["tid"]] == "narration"
+    assert trace["otherData"] == {"job": "job1"}
+
+
+def test_without_trace_dir_nothing_is_written(tmp_path, monkeypatch):
+    monkeypatch.delenv("TRACE_DIR", raising=False)
+    with trace_job("job2") as trace:
+        assert trace is None
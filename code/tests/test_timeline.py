@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from timeline import LOOP, PINGPONG, build_timeline
+
+
+def clips_of(lengths):
+    """Clips dont chaque frame contient (numéro du clip, numéro de la frame)."""
+    return [[(c, f) for f in range(length)] for c, length in enumerate(lengths)]
+
+
+def test_timeline_covers_the_narration_with_equal_shares():
+    timeline = build_timeline([14, 14, 14], 6.0, 7, 24)
+    assert len(timeline) == 144
+    assert timeline.duration == pytest.approx(6.0)
+    assert timeline.segments() == [(0, 48), (48, 96), (96, 144)]
+
+
+def test_loop_replays_short_clips():
+    timeline = build_timeline([3], 1.0, 3, 3, mode=LOOP)
+    assert timeline.frame_index.tolist() == [0, 1, 2]
+    timeline = build_timeline([3], 2.0, 3, 3, mode=LOOP)
+    assert timeline.frame_index.tolist() == [0, 1, 2, 0, 1, 2]
+
+
+def test_pingpong_plays_back_and_forth():
+    timeline = build_timeline([3], 2.0, 3, 3, mode=PINGPONG)
+    assert timeline.frame_index.tolist() == [0, 1, 2, 1, 0, 1]
+
+
+def test_source_frames_follow_the_source_rate():
+    timeline = build_timeline([14], 2.0, 7, 14)
+    assert timeline.frame_index.tolist()[:6] == [0, 0, 1, 1, 2, 2]
+
+
+def test_every_clip_gets_a_frame_when_the_narration_is_too_short():
+    timeline = build_timeline([14] * 5, 0.1, 7, 24)
+    assert len(timeline) == 5
+    assert len(timeline.segments()) == 5
+    assert sorted(set(timeline.clip_index.tolist())) == [0, 1, 2, 3, 4]
+
+
+def test_render_and_frame_at_read_the_table():
+    clips = clips_of([2, 2])
+    timeline = build_timeline([2, 2], 2.0, 2, 2)
+    assert list(timeline.render(clips)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    # t = i / fps ne doit jamais retomber sur la frame i - 1
+    fps = 30
+    timeline = build_timeline([300], 10.0, fps, fps)
+    frames = clips_of([300])
+    assert all(timeline.frame_at(frames, i / fps) == (0, i) for i in range(300))
+    assert timeline.frame(frames, 10_000) == (0, 299)
+
+
+def test_invalid_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        build_timeline([14], 1.0, 7, 24, mode="shuffle")
+    with pytest.raises(ValueError):
+        build_timeline([], 1.0, 7, 24)
+    with pytest.raises(ValueError):
+        build_timeline([14, 0], 1.0, 7, 24)
+
+
+def test_indices_are_compact():
+    timeline = build_timeline([14] * 10, 60.0, 24, 24)
+    assert timeline.clip_index.dtype == np.int32
+    assert timeline.frame_index.max() < 14
@@ -0,0 +1,76 @@
+import wave
+
+import numpy as np
+import pytest
+
+from audio_probe import probe_audio, probe_mp3
+from tts import Narrator, PhraseCache, TTSBackend, join_audio, mp3_payload, split_sentences
+from test_audio_probe import FRAME_SAMPLES, mp3, write
+
+
+def test_joined_mp3_is_one_stream_without_per_fragment_info(tmp_path):
+    first = write(tmp_path / "1.mp3", mp3(4, delay=576, padding=300))
+    second = write(tmp_path / "2.mp3", mp3(6, delay=576, padding=300))
+    assert mp3_payload(open(first, "rb").read()) == mp3(4, tagged=False)
+    joined = join_audio([first, second], str(tmp_path / "joined.mp3"), "mp3")
+    assert probe_mp3(joined).duration == pytest.approx(10 * FRAME_SAMPLES / 44100)
+
+
+def write_wav(path, samples, rate=16000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+    return str(path)
+
+
+def test_joined_wav_keeps_every_sample(tmp_path):
+    parts = [write_wav(tmp_path / "1.wav", np.arange(100)), write_wav(tmp_path / "2.wav", np.arange(100, 250))]
+    joined = join_audio(parts, str(tmp_path / "joined.wav"), "wav")
+    with wave.open(joined, "rb") as w:
+        assert np.array_equal(np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16), np.arange(250))
+    assert probe_audio(joined).duration == pytest.approx(250 / 16000)
+    write_wav(tmp_path / "3.wav", np.arange(10), rate=8000)
+    with pytest.raises(ValueError):
+        join_audio(parts + [str(tmp_path / "3.wav")], str(tmp_path / "bad.wav"), "wav")
+
+
+class CountingBackend(TTSBackend):
+    name = "fake"
+    ext = "wav"
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize(self, text, langue, path):
+        self.calls.append(text)
+        write_wav(path, np.full(len(text), len(self.calls)))
+
+
+def test_split_sentences_keeps_decimals_together():
+    assert split_sentences("Prix : 9.99 €. Livraison offerte ! Et ensuite ?  ") == [
+        "Prix : 9.99 €.", "Livraison offerte !", "Et ensuite ?"]
+
+
+def test_narrator_synthesises_each_new_sentence_once(tmp_path):
+    backend = CountingBackend()
+    narrator = Narrator(backend, PhraseCache(str(tmp_path / "cache"), max_bytes=10 ** 6), workers=2)
+    assert narrator.synthesize("Bonjour. Achetez maintenant !", "fr", str(tmp_path / "a.wav")) == 2
+    assert sorted(backend.calls) == ["Achetez maintenant !", "Bonjour."]
+    narrator.synthesize("Bonjour.  Nouveau produit.", "fr", str(tmp_path / "b.wav"))
+    assert backend.calls[2:] == ["Nouveau produit."]
+    assert narrator.cache.stats()["hits"] == 1
+    assert probe_audio(str(tmp_path / "b.wav")).duration == pytest.approx(len("Bonjour.Nouveau produit.") / 16000)
+    assert not (tmp_path / "b.wav.parts").exists()
+
+
+def test_phrase_cache_is_keyed_by_backend_language_and_text(tmp_path):
+    key = PhraseCache.key("gtts", "fr", "Bonjour  le monde")
+    assert key == PhraseCache.key("gtts", "fr", " Bonjour le monde ")
+    assert key != PhraseCache.key("gtts", "en", "Bonjour le monde")
+    assert key != PhraseCache.key("espeak", "fr", "Bonjour le monde")
+    disabled = PhraseCache(str(tmp_path), max_bytes=0)
+    source = write_wav(tmp_path / "s.wav", np.arange(4))
+    assert disabled.put(key, "wav", source) == source
+    assert disabled.get(key, "wav") is None
@@ -0,0 +1,68 @@
+import os
+import time
+
+import pytest
+
+from workspace import PREFIX, STALE_SECONDS, Workspace, WorkspaceFullError, default_root, scratch
+
+
+def test_each_generation_gets_its_own_directory_removed_on_exit(tmp_path):
+    with Workspace("job", root=str(tmp_path)) as first, Workspace("job", root=str(tmp_path)) as second:
+        assert first.path != second.path
+        assert os.path.basename(first.path).startswith(f"{PREFIX}job_")
+        open(first.file("narration.wav"), "wb").close()
+        path = first.path
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_workspace_is_removed_when_the_render_fails(tmp_path):
+    with pytest.raises(RuntimeError):
+        with Workspace(root=str(tmp_path)) as ws:
+            path = ws.path
+            raise RuntimeError("rendu interrompu")
+    assert not os.path.exists(path)
+
+
+def test_file_requires_a_created_workspace(tmp_path):
+    with pytest.raises(RuntimeError):
+        Workspace(root=str(tmp_path)).file("video.mp4")
+
+
+def test_quota_is_enforced(tmp_path):
+    with Workspace(root=str(tmp_path), max_bytes=100) as ws:
+        with open(ws.file("a.bin"), "wb") as f:
+            f.write(b"x" * 60)
+        assert ws.check() == 60
+        with open(ws.file("b.bin"), "wb") as f:
+            f.write(b"x" * 60)
+        with pytest.raises(WorkspaceFullError):
+            ws.check()
+
+
+def test_abandoned_workspaces_are_swept(tmp_path):
+    stale = tmp_path / f"{PREFIX}dead_1"
+    recent = tmp_path / f"{PREFIX}alive_1"
+    other = tmp_path / "not_ours"
+    for directory in (stale, recent, other):
+        directory.mkdir()
+    old = time.time() - STALE_SECONDS - 1
+    os.utime(stale, (old, old))
+    os.utime(other, (old, old))
+    with Workspace(root=str(tmp_path)):
+        pass
+    assert not stale.exists()
+    assert recent.exists() and other.exists()
+
+
+def test_scratch_reuses_a_given_workspace(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE_ROOT", str(tmp_path))
+    assert default_root() == str(tmp_path)
+    with Workspace() as ws:
+        with scratch(ws) as reused:
+            assert reused is ws
+        assert os.path.isdir(ws.path)
+    with scratch() as owned:
+        path = owned.path
+        assert os.path.dirname(path) == str(tmp_path)
+    assert not os.path.exists(path)
@@ -0,0 +1,93 @@
+import numpy as np
+
+LOOP = "loop"
+PINGPONG = "pingpong"
+MODES = (LOOP, PINGPONG)
+
+
+class Timeline:
+    """Table de correspondance frame de sortie → (clip source, frame source).
+
+    La table est calculée une fois avec NumPy ; le rendu d'une frame est ensuite un
+    simple accès par indice, quel que soit le nombre de clips ou de répétitions.
+    """
+
+    def __init__(self, clip_index, frame_index, fps):
+        self.clip_index = clip_index
+        self.frame_index = frame_index
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.clip_index)
+
+    @property
+    def duration(self):
+        return len(self) / self.fps
+
+    def frame(self, clips, n):
+        """Frame de sortie n (bornée à la dernière frame)."""
+        n = min(max(n, 0), len(self) - 1)
+        return clips[self.clip_index[n]][self.frame_index[n]]
+
+    def frame_at(self, clips, t):
+        """Frame affichée au temps t (secondes), pour les consommateurs type MoviePy."""
+        # MoviePy demande t = i / fps : (i / fps) * fps vaut parfois i - 1 + 0.999..., d'où la marge
+        return self.frame(clips, int(t * self.fps + 1e-6))
+
+    def render(self, clips, start=0, stop=None):
+        """Itère sur les frames de sortie [start, stop)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for n in range(start, stop):
+            yield clips[self.clip_index[n]][self.frame_index[n]]
+
+    def segments(self):
+        """Bornes [début, fin) de chaque clip dans la sortie, dans l'ordre."""
+        if not len(self):
+            return []
+        changes = np.flatnonzero(np.diff(self.clip_index)) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(self)]))
+        return list(zip(starts.tolist(), ends.tolist()))
+
+
+def build_timeline(clip_lengths, total_duration, src_fps, out_fps, mode=LOOP):
+    """Construit la table d'indices pour caler les clips sur `total_duration` secondes.
+
+    Chaque clip reçoit une part égale de la durée ; s'il est plus court que sa part,
+    il est rejoué en boucle (`loop`) ou en aller-retour (`pingpong`). Chaque clip
+    reçoit au moins une frame : une narration trop courte pour toutes les images
+    allonge la timeline plutôt que d'en faire disparaître.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode de timeline inconnu : {mode} (attendu : {', '.join(MODES)})")
+    lengths = np.asarray(clip_lengths, dtype=np.int64)
+    if len(lengths) == 0:
+        raise ValueError("Aucun clip à placer sur la timeline")
+    if np.any(lengths <= 0):
+        raise ValueError("Chaque clip doit contenir au moins une frame")
+
+    n_clips = len(lengths)
+    n_out = int(round(total_duration * out_fps))
+    if n_out < n_clips:
+        print(f"[WARNING] Narration de {total_duration:.2f}s trop courte pour {n_clips} clips à {out_fps} fps : "
+              f"timeline allongée à {n_clips} frames ({n_clips / out_fps:.2f}s).")
+        n_out = n_clips
+    out = np.arange(n_out, dtype=np.int64)
+
+    # Frame de sortie où commence chaque clip ; la dernière borne vaut n_out
+    bounds = np.round(np.arange(n_clips + 1) * (n_out / n_clips)).astype(np.int64)
+    clip_index = np.searchsorted(bounds[1:], out, side="right")
+    local = out - bounds[clip_index]
+
+    # Position dans le clip source à sa cadence propre, puis repliement
+    position = np.floor(local * (src_fps / out_fps) + 1e-9).astype(np.int64)
+    clip_lengths_out = lengths[clip_index]
+    if mode == LOOP:
+        frame_index = position % clip_lengths_out
+    else:
+        period = np.maximum(2 * clip_lengths_out - 2, 1)
+        folded = position % period
+        frame_index = np.where(folded < clip_lengths_out, folded, period - folded)
+        frame_index = np.minimum(frame_index, clip_lengths_out - 1)
+
+    return Timeline(clip_index.astype(np.int32), frame_index.astype(np.int32), out_fps)
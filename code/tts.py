@@ -0,0 +1,246 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_probe import id3v2_size, is_info_frame, parse_frame_header
+from telemetry import propagate, span
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "tts")
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_WORKERS = 4
+
+# Fin de phrase : ponctuation forte suivie d'un espace (les nombres décimaux restent entiers)
+_SENTENCE_END = re.compile(r"(?<=[.!?…。！？])\s+")
+
+
+def split_sentences(text):
+    """Découpe un script en phrases non vides, dans l'ordre."""
+    return [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+
+
+class TTSBackend:
+    """Moteur de synthèse vocale : écrit l'audio d'un texte dans un fichier.
+
+    Tous les fragments d'une narration viennent du même moteur, donc du même format
+    (`ext`), ce qui permet de les concaténer sans réencodage.
+    """
+
+    name = None
+    ext = None
+
+    def synthesize(self, text, langue, path):
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Text-to-Speech (réseau), sortie MP3."""
+
+    name = "gtts"
+    ext = "mp3"
+
+    def synthesize(self, text, langue, path):
+        from gtts import gTTS
+
+        gTTS(text=text, lang=langue, slow=False).save(path)
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng, local et hors ligne, sortie WAV."""
+
+    name = "espeak"
+    ext = "wav"
+
+    def __init__(self, binary=None):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak") or "espeak-ng"
+
+    def synthesize(self, text, langue, path):
+        proc = subprocess.run([self.binary, "-v", langue, "-w", path, text],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"espeak a échoué : {proc.stderr.strip()}")
+
+
+BACKENDS = {backend.name: backend for backend in (GTTSBackend, EspeakBackend)}
+
+
+def create_backend(name=None):
+    """Moteur désigné par `name` ou TTS_BACKEND (gtts par défaut)."""
+    name = name or os.getenv("TTS_BACKEND", GTTSBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur TTS inconnu : {name} (attendu : {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+class PhraseCache:
+    """Cache disque de l'audio par phrase, adressé par (moteur, langue, phrase).
+
+    Les accroches et appels à l'action reviennent d'une campagne à l'autre : seules
+    les phrases jamais prononcées repassent par le moteur. Même schéma que ClipCache :
+    écriture atomique par renommage et éviction LRU (mtime) au-delà de `max_bytes`.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or os.getenv("TTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("TTS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(backend, langue, sentence):
+        normalized = re.sub(r"\s+", " ", sentence).strip()
+        return hashlib.sha256(f"{backend}\0{langue}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def get(self, key, ext):
+        """Chemin du fichier en cache, ou None."""
+        if not self.enabled:
+            return None
+        path = self.path(key, ext)
+        try:
+            os.utime(path)  # rafraîchit la date LRU
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key, ext, source):
+        """Copie atomiquement `source` dans le cache et retourne le chemin de l'entrée."""
+        if not self.enabled:
+            return source
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                full = os.path.join(directory, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def mp3_payload(data):
+    """Trames audio d'un fichier MP3, sans étiquettes ID3 ni trame d'info Xing/LAME.
+
+    La trame d'info décrit la durée du seul fragment : laissée dans un flux joint,
+    elle ferait croire aux lecteurs que la narration s'arrête après la première phrase.
+    """
+    start = id3v2_size(data)
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frame = parse_frame_header(data[start:start + 4])
+    if frame is not None and is_info_frame(data, start):
+        start += frame[0]
+    return data[start:end]
+
+
+def join_audio(paths, output_file, ext):
+    """Concatène des fragments de même format sans silence ajouté ni réencodage.
+
+    WAV : les échantillons PCM sont recopiés bout à bout sous un seul en-tête.
+    MP3 : les trames MPEG sont juxtaposées après retrait des étiquettes ID3, ce qui
+    donne un flux MP3 valide lisible d'un trait.
+    """
+    if ext == "wav":
+        with wave.open(paths[0], "rb") as first:
+            params = first.getparams()
+        with wave.open(output_file, "wb") as out:
+            out.setparams(params)
+            for path in paths:
+                with wave.open(path, "rb") as chunk:
+                    if chunk.getparams()[:3] != params[:3]:
+                        raise ValueError(f"Format WAV incompatible : {path}")
+                    out.writeframes(chunk.readframes(chunk.getnframes()))
+        return output_file
+    with open(output_file, "wb") as out:
+        for path in paths:
+            with open(path, "rb") as chunk:
+                out.write(mp3_payload(chunk.read()))
+    return output_file
+
+
+class Narrator:
+    """Synthèse d'un script phrase par phrase, en parallèle et avec cache.
+
+    Les phrases absentes du cache sont envoyées au moteur simultanément (les allers-
+    retours réseau de gTTS se recouvrent), puis tous les fragments sont joints dans
+    l'ordre en un seul fichier de narration.
+    """
+
+    def __init__(self, backend=None, cache=None, workers=None):
+        self.backend = backend or create_backend()
+        self.cache = cache or PhraseCache()
+        self.workers = workers or int(os.getenv("TTS_WORKERS", DEFAULT_WORKERS))
+
+    def _fragment(self, sentence, langue, scratch_dir):
+        key = self.cache.key(self.backend.name, langue, sentence)
+        cached = self.cache.get(key, self.backend.ext)
+        if cached is not None:
+            return cached
+        path = os.path.join(scratch_dir, f"{key}.{self.backend.ext}")
+        with span("tts.sentence", backend=self.backend.name):
+            self.backend.synthesize(sentence, langue, path)
+        return self.cache.put(key, self.backend.ext, path)
+
+    def synthesize(self, text, langue, output_file):
+        """Écrit la narration de `text` dans `output_file` et retourne le nombre de phrases."""
+        sentences = split_sentences(text) or [text]
+        scratch_dir = f"{output_file}.parts"
+        os.makedirs(scratch_dir, exist_ok=True)
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(sentences)),
+                                    thread_name_prefix="tts") as pool:
+                fragment = propagate(lambda s: self._fragment(s, langue, scratch_dir))
+                fragments = list(pool.map(fragment, sentences))
+            join_audio(fragments, output_file, self.backend.ext)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        return len(sentences)
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+# tmpfs (RAM) si disponible : les fichiers de travail (narration, vidéo muette) ne touchent pas le disque
+TMPFS_ROOT = "/dev/shm"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+PREFIX = "adgen_"
+# Un espace de travail plus vieux que ça appartient à un processus mort sans nettoyer
+STALE_SECONDS = 6 * 3600
+
+
+class WorkspaceFullError(OSError):
+    """Levée quand un espace de travail dépasse son quota disque."""
+
+
+def default_root(max_bytes=DEFAULT_MAX_BYTES):
+    """Répertoire parent des espaces de travail : WORKSPACE_ROOT, sinon tmpfs s'il a la
+    place pour un espace plein, sinon le répertoire temporaire du système."""
+    root = os.getenv("WORKSPACE_ROOT")
+    if root:
+        return root
+    try:
+        if os.access(TMPFS_ROOT, os.W_OK) and shutil.disk_usage(TMPFS_ROOT).free >= max_bytes:
+            return TMPFS_ROOT
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+
+def directory_bytes(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass  # supprimé entre le listing et le stat
+    return total
+
+
+class Workspace:
+    """Répertoire de travail propre à une génération.
+
+    Chaque job écrit ses fichiers intermédiaires dans son propre dossier au lieu de
+    noms fixes partagés dans output/ : deux rendus simultanés ne peuvent plus
+    s'écraser. Le dossier est supprimé en sortie du bloc `with`, que le rendu ait
+    réussi ou non ; les restes d'un processus tué sont balayés à la création suivante.
+    `check()` fait respecter un quota (WORKSPACE_MAX_BYTES) aux étapes qui écrivent.
+    """
+
+    def __init__(self, job_id=None, root=None, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv("WORKSPACE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.root = root or default_root(max_bytes)
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.path = None
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+    def create(self):
+        os.makedirs(self.root, exist_ok=True)
+        self.sweep_stale(self.root)
+        self.path = tempfile.mkdtemp(prefix=f"{PREFIX}{self.job_id}_", dir=self.root)
+        print(f"[DEBUG] Espace de travail : {self.path}")
+        return self
+
+    def file(self, name):
+        """Chemin d'un fichier de travail dans cet espace."""
+        if self.path is None:
+            raise RuntimeError("Espace de travail non créé (utiliser `with Workspace() as ws`)")
+        return os.path.join(self.path, name)
+
+    def usage(self):
+        return directory_bytes(self.path) if self.path else 0
+
+    def check(self):
+        """Lève WorkspaceFullError si le quota de l'espace est dépassé."""
+        used = self.usage()
+        if self.max_bytes > 0 and used > self.max_bytes:
+            raise WorkspaceFullError(
+                f"Espace de travail {self.path} : {used / 1e6:.1f} Mo utilisés, "
+                f"quota {self.max_bytes / 1e6:.1f} Mo"
+            )
+        return used
+
+    def cleanup(self):
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    @staticmethod
+    def sweep_stale(root, max_age=STALE_SECONDS):
+        """Supprime les espaces de travail abandonnés (processus tué avant son nettoyage)."""
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.startswith(PREFIX) and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+
+
+@contextmanager
+def scratch(workspace=None):
+    """Réutilise `workspace` s'il est fourni, sinon crée un espace temporaire pour le bloc."""
+    if workspace is not None:
+        yield workspace
+        return
+    with Workspace() as owned:
+        yield owned